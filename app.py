@@ -1,55 +1,954 @@
 import os
 os.environ['FLASK_SKIP_DOTENV'] = '1'
 
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, Response, g, jsonify, request, render_template
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import yfinance as yf
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import requests
+from providers import UpstreamFetchError, create_provider, preload_data_stack
+from history_store import HistoryStore
+from private_files import check_owned, user_temp_directory
+from symbol_directory import SymbolDirectory
+from price_history import PriceHistory
+from indicators import latest_indicators
+from llm_client import OpenRouterClient
+from intent_router import IntentRouter, render_response
+from circuit_breaker import CircuitBreaker
+from json_response import EncodedPayload, compress_response, dumps as dumps_json, payload_response
+from metrics import REGISTRY
+from profiler import SamplingProfiler
+from quote_stream import FakeTicker, QuoteHub, SubscriberLimitError
+import hashlib
+import json
 import logging
+import re
+import sqlite3
+import sys
 import time
+import random
+import threading
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Simple in-memory cache to reduce API calls
+# Metrics served at /metrics; upstream call timings are recorded by providers and llm_client
+HTTP_SECONDS = REGISTRY.histogram(
+    'macra_http_request_duration_seconds',
+    'Time to produce a response (to first byte for streamed ones)',
+    ('route', 'method', 'status')
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge('macra_http_requests_in_flight', 'Requests currently being handled', ('route',))
+CACHE_LOOKUPS = REGISTRY.counter('macra_cache_lookups_total', 'Cache lookups by key namespace and result', ('namespace', 'result'))
+CACHE_EVICTIONS = REGISTRY.counter('macra_cache_evictions_total', 'Entries dropped to stay within the cache bounds', ('namespace',))
+CACHE_EXPIRATIONS = REGISTRY.counter('macra_cache_expirations_total', 'Entries swept after their stale window', ('namespace',))
+STOCK_FETCH_SECONDS = REGISTRY.histogram(
+    'macra_stock_fetch_duration_seconds',
+    'Time spent fetching a quote on a cache miss, retries and backoff included',
+    ('outcome',)
+)
+STOCK_FETCH_RETRIES = REGISTRY.counter('macra_stock_fetch_retries_total', 'Quote fetch attempts retried after a retryable error')
+STOCK_FETCH_BACKOFF_SECONDS = REGISTRY.counter('macra_stock_fetch_backoff_seconds_total', 'Time quote fetches spent sleeping between retries')
+SYMBOL_REJECTIONS = REGISTRY.counter('macra_symbol_rejections_total', 'Quote requests for symbols missing from the symbol directory, answered without going upstream')
+
+# Cache windows per key namespace (the key prefix before the symbol). Entries are
+# fresh for `fresh`, then servable as stale for another `stale` while they are
+# refreshed in the background, and hard-expired after that.
+CACHE_NAMESPACE_WINDOWS = {
+    'stock_data': {'fresh': timedelta(minutes=15), 'stale': timedelta(hours=1)},
+    'history': {'fresh': timedelta(minutes=60), 'stale': timedelta(hours=6)},
+    'news_data': {'fresh': timedelta(minutes=30), 'stale': timedelta(minutes=30)},
+    'ai_reply': {'fresh': timedelta(minutes=10), 'stale': timedelta(0)},
+    # Negative cache: symbols Yahoo says do not exist
+    'not_found': {'fresh': timedelta(minutes=10), 'stale': timedelta(0)}
+}
+
+def parse_cache_windows(spec):
+    """Parse "stock_data=900:3600,news_data=1800:0" (seconds) into cache windows"""
+    windows = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        namespace, _, seconds = item.partition('=')
+        fresh, _, stale = seconds.partition(':')
+        windows[namespace.strip()] = {
+            'fresh': timedelta(seconds=float(fresh)),
+            'stale': timedelta(seconds=float(stale or 0))
+        }
+    return windows
+
+def estimate_size(obj, _depth=0):
+    """Cheap recursive estimate of the memory held by a cached value"""
+    size = sys.getsizeof(obj)
+    if _depth > 4:
+        return size
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += estimate_size(key, _depth + 1) + estimate_size(value, _depth + 1)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            size += estimate_size(item, _depth + 1)
+    elif isinstance(obj, PriceHistory):
+        size += obj.nbytes
+    return size
+
+def _l2_default(obj):
+    """JSON fallback for cached values: PriceHistory is tagged so it decodes back to one"""
+    if isinstance(obj, PriceHistory):
+        return {'__price_history__': obj.to_columns()}
+    tolist = getattr(obj, 'tolist', None)  # numpy scalars and arrays
+    if tolist is not None:
+        return tolist()
+    raise TypeError(f"{type(obj).__name__} cannot be stored in the shared cache")
+
+def _l2_object(obj):
+    if len(obj) == 1 and '__price_history__' in obj:
+        return PriceHistory.from_columns(obj['__price_history__'])
+    return obj
+
+def encode_l2_value(data):
+    return json.dumps(data, default=_l2_default, separators=(',', ':')).encode('utf-8')
+
+def decode_l2_value(value):
+    return json.loads(value, object_hook=_l2_object)
+
+# Host-wide second cache tier shared by every worker process via SQLite in WAL mode.
+# Values are stored as JSON, so a tampered row can at worst be a wrong answer, never code.
+class SQLiteCacheTier:
+    def __init__(self, path, max_entries=20000):
+        self.path = path
+        self.max_entries = max_entries
+        self.local = threading.local()
+        self.errors = 0
+        check_owned(path, path + '-wal', path + '-shm')
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "stored_at REAL NOT NULL, expires_at REAL NOT NULL, purge_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_purge_at ON cache (purge_at)")
+        os.chmod(path, 0o600)
+    
+    def _connect(self):
+        # sqlite3 connections cannot be shared across threads, so keep one per thread
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+    
+    def get(self, key):
+        """Return (data, stored_at, expires_at) for key, expired or not, or None"""
+        try:
+            row = self._connect().execute(
+                "SELECT value, stored_at, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"L2 cache read failed for {key}: {str(e)}")
+            return None
+        try:
+            return decode_l2_value(row[0]), row[1], row[2]
+        except (ValueError, KeyError, TypeError) as e:
+            # Corrupt, or written by an older pickle-based release: drop it and treat as a miss
+            self.errors += 1
+            logger.warning(f"L2 cache row for {key} is unreadable, dropping it: {str(e)}")
+            self.delete(key)
+            return None
+    
+    def set(self, key, data, stored_at, expires_at, purge_at):
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO cache (key, value, stored_at, expires_at, purge_at) VALUES (?, ?, ?, ?, ?)",
+                (key, encode_l2_value(data), stored_at, expires_at, purge_at)
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"L2 cache write failed for {key}: {str(e)}")
+    
+    def delete(self, key):
+        try:
+            self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"L2 cache delete failed for {key}: {str(e)}")
+    
+    def clear(self):
+        self._connect().execute("DELETE FROM cache")
+    
+    def sweep(self, now=None):
+        """Drop rows past their stale window, then trim the oldest rows over the bound"""
+        now = time.time() if now is None else now
+        try:
+            conn = self._connect()
+            removed = conn.execute("DELETE FROM cache WHERE purge_at <= ?", (now,)).rowcount
+            removed += conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            return removed
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"L2 cache sweep failed: {str(e)}")
+            return 0
+    
+    def stats(self):
+        try:
+            entries = self._connect().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        except Exception:
+            entries = None
+        return {
+            'path': self.path,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'errors': self.errors
+        }
+
+# Bounded, thread-safe in-memory cache with LRU eviction and per-namespace windows,
+# optionally backed by a shared second tier (l2) such as SQLiteCacheTier
 class DataCache:
-    def __init__(self, cache_duration_minutes=15):
-        self.cache = {}
+    def __init__(self, cache_duration_minutes=15, max_entries=2048, max_bytes=64 * 1024 * 1024,
+                 namespace_windows=None, sweep_interval_seconds=60, l2=None):
+        self.cache = OrderedDict()  # key -> (data, stored_at, expires_at, size)
+        self.encoded = {}  # key -> {variant: EncodedPayload} for the L1 entry's data
         self.cache_duration = timedelta(minutes=cache_duration_minutes)
+        self.namespace_windows = dict(CACHE_NAMESPACE_WINDOWS)
+        self.namespace_windows.update(namespace_windows or {})
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.l2 = l2
+        self.sweep_interval = sweep_interval_seconds
+        self.next_sweep = time.monotonic() + sweep_interval_seconds
+        self.lock = threading.RLock()
+        self.bytes = 0
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.encoded_hits = 0
+        self.encoded_misses = 0
+    
+    def namespace(self, key):
+        """Longest configured prefix of the key, e.g. stock_data_AAPL -> stock_data"""
+        matches = [ns for ns in self.namespace_windows if key.startswith(ns + '_')]
+        return max(matches, key=len) if matches else 'default'
+    
+    def ttl(self, key):
+        """Seconds an entry stays fresh"""
+        window = self.namespace_windows.get(self.namespace(key))
+        return (window['fresh'] if window else self.cache_duration).total_seconds()
+    
+    def stale_window(self, key):
+        """Seconds past freshness during which an entry may still be served as stale"""
+        window = self.namespace_windows.get(self.namespace(key))
+        return (window['stale'] if window else self.cache_duration).total_seconds()
     
     def get(self, key):
-        if key in self.cache:
-            data, timestamp = self.cache[key]
-            if datetime.now() - timestamp < self.cache_duration:
-                logger.info(f"Cache hit for {key}")
-                return data
+        """Return fresh data for key, or None"""
+        data, _, status = self.lookup(key)
+        return data if status == 'fresh' else None
+    
+    def lookup(self, key):
+        """Return (data, age_seconds, status) where status is 'fresh', 'stale' or None"""
+        now = time.time()
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None and now < entry[2]:
+                self.cache.move_to_end(key)
+                self.l1_hits += 1
+                CACHE_LOOKUPS.inc(namespace=self.namespace(key), result='l1_hit')
+                logger.debug(f"Cache hit for {key}")
+                return entry[0], now - entry[1], 'fresh'
+        candidate = entry
+        
+        # Fall through to the shared tier outside the lock; it does file I/O
+        if self.l2 is not None:
+            row = self.l2.get(key)
+            if row is not None and now < row[2]:
+                with self.lock:
+                    self._store(key, row[0], row[1], row[2])
+                    self.l2_hits += 1
+                CACHE_LOOKUPS.inc(namespace=self.namespace(key), result='l2_hit')
+                logger.debug(f"L2 cache hit for {key}")
+                return row[0], now - row[1], 'fresh'
+            if row is not None and (candidate is None or row[1] > candidate[1]):
+                candidate = row
+        
+        # Past freshness but inside the stale window: usable while a refresh runs
+        if candidate is not None and now < candidate[2] + self.stale_window(key):
+            with self.lock:
+                self.stale_hits += 1
+            CACHE_LOOKUPS.inc(namespace=self.namespace(key), result='stale')
+            return candidate[0], now - candidate[1], 'stale'
+        
+        with self.lock:
+            self.misses += 1
+        CACHE_LOOKUPS.inc(namespace=self.namespace(key), result='miss')
+        return None, None, None
+    
+    def peek(self, key, local_only=False, stale=False):
+        """Fresh data for key (with stale=True, also data inside its stale window), or None.
+        
+        Counts no hit or miss and leaves LRU order alone. local_only skips L2,
+        so the check never does file I/O.
+        """
+        now = time.time()
+        grace = self.stale_window(key) if stale else 0.0
+        with self.lock:
+            entry = self.cache.get(key)
+        if (entry is None or now >= entry[2] + grace) and self.l2 is not None and not local_only:
+            entry = self.l2.get(key)
+        return entry[0] if entry is not None and now < entry[2] + grace else None
+    
+    def get_stale(self, key):
+        """Return cached data and its age in seconds, ignoring expiry"""
+        with self.lock:
+            entry = self.cache.get(key)
+        if entry is None and self.l2 is not None:
+            entry = self.l2.get(key)
+        if entry is None:
+            return None, None
+        return entry[0], time.time() - entry[1]
+    
+    def set(self, key, data):
+        now = time.time()
+        expires_at = now + self.ttl(key)
+        with self.lock:
+            self._store(key, data, now, expires_at)
+            self._maybe_sweep()
+        if self.l2 is not None:
+            self.l2.set(key, data, now, expires_at, expires_at + self.stale_window(key))
+        logger.debug(f"Cached data for {key}")
+    
+    def delete(self, key):
+        with self.lock:
+            self._remove(key)
+        if self.l2 is not None:
+            self.l2.delete(key)
+    
+    def encode(self, key, data, variant, encode):
+        """Return encode(data), reusing the result while data is still the L1 entry for key.
+        
+        Hot entries are then serialized (and compressed) once per store instead
+        of once per hit. Anything else, e.g. a stale copy or an error, is encoded
+        fresh and not kept.
+        """
+        with self.lock:
+            entry = self.cache.get(key)
+            cacheable = entry is not None and entry[0] is data
+            payload = self.encoded.get(key, {}).get(variant) if cacheable else None
+            if payload is not None:
+                self.encoded_hits += 1
+                return payload
+            self.encoded_misses += 1
+        
+        payload = encode(data)
+        if cacheable:
+            with self.lock:
+                entry = self.cache.get(key)
+                # The entry may have been replaced while we were encoding
+                if entry is not None and entry[0] is data and variant not in self.encoded.get(key, {}):
+                    self.encoded.setdefault(key, {})[variant] = payload
+                    self.bytes += payload.nbytes
+                    self._evict()
+        return payload
+    
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.encoded.clear()
+            self.bytes = 0
+        if self.l2 is not None:
+            self.l2.clear()
+    
+    def _store(self, key, data, stored_at, expires_at):
+        size = estimate_size(data)
+        self._remove(key)
+        self.cache[key] = (data, stored_at, expires_at, size)
+        self.bytes += size
+        self._evict()
+    
+    def _remove(self, key):
+        entry = self.cache.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[3] + self._drop_encoded(key)
+    
+    def _drop_encoded(self, key):
+        """Forget serialized forms of key; return the bytes they held"""
+        payloads = self.encoded.pop(key, None)
+        return sum(payload.nbytes for payload in payloads.values()) if payloads else 0
+    
+    def _evict(self):
+        # Drop least recently used entries until both bounds hold (always keep the newest)
+        while len(self.cache) > 1 and (len(self.cache) > self.max_entries or self.bytes > self.max_bytes):
+            key, entry = self.cache.popitem(last=False)
+            self.bytes -= entry[3] + self._drop_encoded(key)
+            self.evictions += 1
+            CACHE_EVICTIONS.inc(namespace=self.namespace(key))
+    
+    def _maybe_sweep(self):
+        # Amortized sweep: piggyback on writes instead of running a background thread
+        now = time.monotonic()
+        if now < self.next_sweep:
+            return
+        self.next_sweep = now + self.sweep_interval
+        self.sweep()
+    
+    def sweep(self, now=None):
+        """Drop entries that are past their stale window (hard-expired)"""
+        now = time.time() if now is None else now
+        with self.lock:
+            expired = [key for key, entry in self.cache.items()
+                       if now >= entry[2] + self.stale_window(key)]
+            for key in expired:
+                self._remove(key)
+                CACHE_EXPIRATIONS.inc(namespace=self.namespace(key))
+            self.expirations += len(expired)
+        if self.l2 is not None:
+            self.l2.sweep(now)
+        return len(expired)
+    
+    def stats(self):
+        with self.lock:
+            lookups = self.l1_hits + self.l2_hits + self.stale_hits + self.misses
+            l2_lookups = self.l2_hits + self.stale_hits + self.misses
+            stats = {
+                'entries': len(self.cache),
+                'bytes': self.bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.l1_hits + self.l2_hits,
+                'l1_hits': self.l1_hits,
+                'l2_hits': self.l2_hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.l1_hits + self.l2_hits) / lookups, 4) if lookups else 0.0,
+                'l1_hit_ratio': round(self.l1_hits / lookups, 4) if lookups else 0.0,
+                'l2_hit_ratio': round(self.l2_hits / l2_lookups, 4) if l2_lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'encoded_hits': self.encoded_hits,
+                'encoded_misses': self.encoded_misses
+            }
+        if self.l2 is not None:
+            stats['l2'] = self.l2.stats()
+        return stats
+
+# Coalesce concurrent cache misses so one upstream fetch serves every waiter
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.originating = 0
+        self.coalesced = 0
+    
+    def do(self, key, fn):
+        """Run fn once per key; concurrent callers share its result or error"""
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = {'event': threading.Event(), 'result': None, 'error': None}
+                self.calls[key] = call
+                self.originating += 1
+                leader = True
             else:
-                # Remove expired cache entry
-                del self.cache[key]
+                self.coalesced += 1
+                leader = False
+        
+        if not leader:
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+        
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call['event'].set()
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'originating': self.originating,
+                'coalesced': self.coalesced,
+                'in_flight': len(self.calls)
+            }
+
+# Runs cache refreshes off the request path, at most one pending refresh per key
+class BackgroundRefresher:
+    def __init__(self, max_workers=2):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cache-refresh')
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.scheduled = 0
+        self.deduplicated = 0
+        self.failed = 0
+    
+    def submit(self, key, fn):
+        """Schedule fn unless a refresh for key is already queued or running"""
+        with self.lock:
+            if key in self.pending:
+                self.deduplicated += 1
+                return False
+            self.pending.add(key)
+            self.scheduled += 1
+        self.executor.submit(self._run, key, fn)
+        return True
+    
+    def _run(self, key, fn):
+        try:
+            fn()
+        except Exception as e:
+            with self.lock:
+                self.failed += 1
+            logger.warning(f"Background refresh failed for {key}: {str(e)}")
+        finally:
+            with self.lock:
+                self.pending.discard(key)
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'pending': len(self.pending),
+                'scheduled': self.scheduled,
+                'deduplicated': self.deduplicated,
+                'failed': self.failed
+            }
+
+# Rate limiting and backoff for a single upstream host
+class UpstreamScheduler:
+    def __init__(self, host, rate_per_second=2.0, burst=5, base_delay=0.5, max_delay=60.0):
+        self.host = host
+        self.rate = rate_per_second
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failures = 0
+        self.blocked_until = 0.0
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+        self.rejected = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+    
+    def _refill(self, now):
+        elapsed = now - self.last_refill
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.last_refill = now
+    
+    def try_acquire(self):
+        """Take a token without waiting; False means the caller is over budget"""
+        return self.acquire(0.0)
+    
+    def acquire(self, timeout, reserve=0):
+        """Take a token, waiting up to timeout seconds for one; False means over budget.
+        
+        A caller that has to wait reserves the next token before sleeping, so
+        waiters are admitted in arrival order at the bucket's rate. `reserve`
+        tokens are left in the bucket for other callers, which lets background
+        work yield to interactive requests.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            needed = 1 + reserve
+            wait = max(self.blocked_until - now, 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate)
+            if wait > timeout:
+                self.rejected += 1
+                return False
+            self.tokens -= 1
+            if wait > 0:
+                self.waited += 1
+                self.wait_seconds += wait
+        if wait > 0:
+            time.sleep(wait)
+        return True
+    
+    def retry_after(self):
+        """Seconds until the next call is likely to be admitted"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait_backoff = max(0.0, self.blocked_until - now)
+            wait_tokens = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            return round(max(wait_backoff, wait_tokens), 2)
+    
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+    
+    def record_failure(self):
+        """Register a retryable failure and return the jittered backoff delay"""
+        with self.lock:
+            self.failures += 1
+            ceiling = min(self.max_delay, self.base_delay * (2 ** (self.failures - 1)))
+            delay = random.uniform(ceiling / 2, ceiling)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            return delay
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'host': self.host,
+                'tokens': round(self.tokens, 2),
+                'consecutive_failures': self.failures,
+                'blocked_for': round(max(0.0, self.blocked_until - time.monotonic()), 2),
+                'rejected': self.rejected,
+                'waited': self.waited,
+                'wait_seconds': round(self.wait_seconds, 2)
+            }
+
+def is_retryable_error(error):
+    """Rate limits and timeouts are worth retrying; anything else is not"""
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError, UpstreamFetchError)):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in ['429', 'too many requests', 'rate limit', 'timed out', 'timeout'])
+
+# Longest backoff we are willing to wait inside a request before answering "retry later"
+MAX_INLINE_RETRY_DELAY = float(os.environ.get('MAX_INLINE_RETRY_DELAY', 1.0))
+
+# Longest a request waits for a Yahoo token before answering from stale data or "retry later"
+YAHOO_MAX_WAIT_SECONDS = float(os.environ.get('YAHOO_MAX_WAIT_SECONDS', 2.0))
+# Tokens background refreshes and live-quote polls leave in the bucket for interactive requests
+YAHOO_BACKGROUND_RESERVE = int(os.environ.get('YAHOO_BACKGROUND_RESERVE', 2))
+
+# Words that carry no meaning for matching paraphrased chat questions
+CHAT_STOPWORDS = frozenset([
+    'a', 'an', 'the', 'is', 'are', 'was', 'be', 'do', 'does', 'i', 'me', 'my', 'you', 'your',
+    'what', 'whats', 's', 'for', 'of', 'to', 'in', 'on', 'it', 'its', 'this', 'that', 'please',
+    'can', 'could', 'would', 'tell', 'about', 'and', 'or', 'so'
+])
+
+# Words that flip the meaning of an otherwise similar question
+CHAT_DIRECTION_WORDS = frozenset([
+    'buy', 'sell', 'hold', 'long', 'short', 'up', 'down', 'rise', 'rising', 'fall', 'falling',
+    'bullish', 'bearish', 'above', 'below', 'over', 'under', 'higher', 'lower', 'more', 'less',
+    'gain', 'gains', 'loss', 'losses', 'increase', 'decrease', 'before', 'after',
+    'not', 'no', 'never', 'dont', 'shouldnt', 'cant', 'wont', 'isnt'
+])
+
+def normalize_chat_message(message):
+    """Lower-case, drop punctuation (keeping P/E-style slashes) and collapse whitespace"""
+    message = message.lower().replace("'", '')
+    return ' '.join(re.sub(r'[^a-z0-9/$%.]+', ' ', message).replace('. ', ' ').split()).strip(' .')
+
+def chat_anchors(message, tokens):
+    """Tokens a paraphrase must repeat exactly: tickers, numbers and direction or negation words"""
+    capitalized = {word.lower() for word in re.findall(r'\b[A-Z][A-Z.-]*\b', message)}
+    return frozenset(
+        token for token in tokens
+        if token in CHAT_DIRECTION_WORDS or token in capitalized or token.startswith('$')
+        or any(c.isdigit() for c in token)
+        or (symbol_directory is not None and token in symbol_directory)
+    )
+
+# Answer cache for /api/chat keyed on normalized prompt, stock context and model,
+# with an optional token-set similarity lookup so common paraphrases also hit.
+# Similarity is off by default: "should I buy AAPL" and "should I sell AAPL"
+# share most of their words, so a paraphrase must also agree on every anchor.
+class ChatAnswerCache:
+    def __init__(self, ttl_seconds=600, max_entries=1000, similarity_threshold=0.0, l2=None):
+        self.store = DataCache(
+            max_entries=max_entries,
+            namespace_windows={'ai_reply': {'fresh': timedelta(seconds=ttl_seconds), 'stale': timedelta(0)}},
+            l2=l2
+        )
+        self.similarity_threshold = similarity_threshold
+        self.lock = threading.Lock()
+        self.index = OrderedDict()  # key -> (bucket, tokens, anchors), bounded like the store
+        self.max_entries = max_entries
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+    
+    @staticmethod
+    def _bucket(stock_context, model):
+        return hashlib.sha1(f"{model}\n{stock_context or ''}".encode('utf-8')).hexdigest()[:16]
+    
+    def _key(self, normalized, bucket):
+        return f"ai_reply_{bucket}_{hashlib.sha1(normalized.encode('utf-8')).hexdigest()}"
+    
+    @staticmethod
+    def _tokens(normalized):
+        return frozenset(token for token in normalized.split() if token not in CHAT_STOPWORDS)
+    
+    def get(self, user_message, stock_context, model):
+        """Return a cached answer for this question (or a close paraphrase), or None"""
+        normalized = normalize_chat_message(user_message)
+        bucket = self._bucket(stock_context, model)
+        entry = self.store.get(self._key(normalized, bucket))
+        if entry is not None:
+            return self._hit(entry, exact=True)
+        
+        if self.similarity_threshold:
+            tokens = self._tokens(normalized)
+            key = self._most_similar(tokens, chat_anchors(user_message, tokens), bucket)
+            entry = self.store.get(key) if key else None
+            if entry is not None:
+                return self._hit(entry, exact=False)
+        
+        with self.lock:
+            self.misses += 1
         return None
     
-    def set(self, key, data):
-        self.cache[key] = (data, datetime.now())
-        logger.info(f"Cached data for {key}")
+    def _hit(self, entry, exact):
+        with self.lock:
+            if exact:
+                self.exact_hits += 1
+            else:
+                self.near_hits += 1
+            self.saved_seconds += entry['upstream_seconds']
+        return entry['answer']
+    
+    def _most_similar(self, tokens, anchors, bucket):
+        """Key of the indexed question with the same anchors and the highest Jaccard similarity above the threshold"""
+        if not tokens:
+            return None
+        best_key, best_score = None, self.similarity_threshold
+        with self.lock:
+            candidates = list(self.index.items())
+        for key, (entry_bucket, entry_tokens, entry_anchors) in candidates:
+            if entry_bucket != bucket or entry_anchors != anchors:
+                continue
+            score = len(tokens & entry_tokens) / len(tokens | entry_tokens)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+    
+    def set(self, user_message, stock_context, model, answer, upstream_seconds):
+        normalized = normalize_chat_message(user_message)
+        bucket = self._bucket(stock_context, model)
+        key = self._key(normalized, bucket)
+        self.store.set(key, {'answer': answer, 'upstream_seconds': upstream_seconds})
+        with self.lock:
+            self.index.pop(key, None)
+            tokens = self._tokens(normalized)
+            self.index[key] = (bucket, tokens, chat_anchors(user_message, tokens))
+            while len(self.index) > self.max_entries:
+                self.index.popitem(last=False)
+    
+    def stats(self):
+        with self.lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            return {
+                'entries': len(self.index),
+                'exact_hits': self.exact_hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.exact_hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+                'saved_upstream_seconds': round(self.saved_seconds, 2)
+            }
+
+def create_l2_cache():
+    """Build the shared cache tier; set CACHE_L2_PATH to an empty string to disable it.
+    
+    The default lives in a per-user 0700 directory under the temp dir, so other
+    local users can neither read the cache nor plant a file for us to open.
+    """
+    path = os.environ.get('CACHE_L2_PATH')
+    if path == '':
+        return None
+    try:
+        if path is None:
+            path = os.path.join(user_temp_directory(), 'cache.sqlite3')
+        return SQLiteCacheTier(path, max_entries=int(os.environ.get('CACHE_L2_MAX_ENTRIES', 20000)))
+    except Exception as e:
+        logger.warning(f"Shared cache tier unavailable, using in-process cache only: {str(e)}")
+        return None
 
 # Global cache instance
-cache = DataCache()
+cache = DataCache(
+    max_entries=int(os.environ.get('CACHE_MAX_ENTRIES', 2048)),
+    max_bytes=int(os.environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    namespace_windows=parse_cache_windows(os.environ.get('CACHE_WINDOWS', '')),
+    l2=create_l2_cache()
+)
+chat_cache = ChatAnswerCache(
+    ttl_seconds=float(os.environ.get('CHAT_CACHE_TTL_SECONDS', 600)),
+    max_entries=int(os.environ.get('CHAT_CACHE_MAX_ENTRIES', 1000)),
+    similarity_threshold=float(os.environ.get('CHAT_CACHE_SIMILARITY', 0)),
+    l2=cache.l2
+)
+inflight = SingleFlight()
+refresher = BackgroundRefresher(max_workers=int(os.environ.get('CACHE_REFRESH_WORKERS', 2)))
+yahoo_scheduler = UpstreamScheduler(
+    'query1.finance.yahoo.com',
+    rate_per_second=float(os.environ.get('YAHOO_RATE_PER_SECOND', 2.0)),
+    burst=int(os.environ.get('YAHOO_BURST', 5))
+)
+
+def create_history_store():
+    """Build the on-disk bar store; set HISTORY_STORE_PATH to an empty string to disable it.
+    
+    Like the shared cache, the default sits in the per-user 0700 temp directory,
+    and HistoryStore refuses a directory other local users could write to.
+    """
+    path = os.environ.get('HISTORY_STORE_PATH')
+    if path == '':
+        return None
+    try:
+        return HistoryStore(
+            path if path is not None else user_temp_directory('history'),
+            max_rows=int(os.environ.get('HISTORY_STORE_MAX_ROWS', 1260)),
+            refresh_seconds=float(os.environ.get('HISTORY_STORE_REFRESH_SECONDS', 900))
+        )
+    except Exception as e:
+        logger.warning(f"History store unavailable, downloading full history on every miss: {str(e)}")
+        return None
+
+history_store = create_history_store()
+
+def create_symbol_directory():
+    """Load the ticker/name/exchange listing; set SYMBOL_DIRECTORY_PATH to an empty string to disable it"""
+    path = os.environ.get('SYMBOL_DIRECTORY_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'symbols.csv'))
+    if not path:
+        return None
+    try:
+        return SymbolDirectory.load(path)
+    except Exception as e:
+        logger.warning(f"Symbol directory unavailable, search is disabled and every symbol goes upstream: {str(e)}")
+        return None
+
+symbol_directory = create_symbol_directory()
+# Directories at least this big are treated as a full exchange listing (NASDAQ + NYSE is about 8,000)
+SYMBOL_DIRECTORY_FULL_LISTING = int(os.environ.get('SYMBOL_DIRECTORY_FULL_LISTING', 5000))
+
+def strict_symbol_checking(setting):
+    """SYMBOL_DIRECTORY_STRICT: 1 or 0 force it; auto (the default) turns it on only for a full listing.
+    
+    Rejecting unlisted symbols is only safe when the directory has every
+    ticker. The bundled symbols.csv (about 260 large caps and ETFs) would
+    turn away valid symbols, so with it "auto" stays off, and deploying a
+    full listing through SYMBOL_DIRECTORY_PATH switches rejection on.
+    """
+    setting = setting.lower()
+    if setting == 'auto':
+        return symbol_directory is not None and len(symbol_directory) >= SYMBOL_DIRECTORY_FULL_LISTING
+    return setting in ('1', 'true', 'yes')
+
+SYMBOL_DIRECTORY_STRICT = strict_symbol_checking(os.environ.get('SYMBOL_DIRECTORY_STRICT', 'auto'))
+
+def is_unlisted(symbol):
+    """True if strict symbol checking is on and symbol is not in the directory"""
+    return SYMBOL_DIRECTORY_STRICT and symbol_directory is not None and symbol not in symbol_directory
 
-# Create templates directory if it doesn't exist
-os.makedirs('templates', exist_ok=True)
+def unlisted_symbol_error(symbol):
+    """Error for a symbol missing from the directory, with the closest listed ones as suggestions"""
+    suggestions = [entry['symbol'] for entry in symbol_directory.search(symbol, limit=5)]
+    error = f'Stock symbol {symbol.upper()} not found.'
+    if suggestions:
+        error += f" Did you mean {', '.join(suggestions)}?"
+    return {'error': error, 'suggestions': suggestions}
+
+def create_breaker(name, env_prefix):
+    """Circuit breaker configured from <env_prefix>_BREAKER_* environment variables"""
+    return CircuitBreaker(
+        name,
+        failure_threshold=float(os.environ.get(f'{env_prefix}_BREAKER_THRESHOLD', 0.5)),
+        min_calls=int(os.environ.get(f'{env_prefix}_BREAKER_MIN_CALLS', 5)),
+        window_seconds=float(os.environ.get(f'{env_prefix}_BREAKER_WINDOW_SECONDS', 60)),
+        cooldown_seconds=float(os.environ.get(f'{env_prefix}_BREAKER_COOLDOWN_SECONDS', 30))
+    )
+
+yahoo_breaker = create_breaker('yahoo', 'YAHOO')
+openrouter_breaker = create_breaker('openrouter', 'OPENROUTER')
+
+# jsonify through the fast encoder; PriceHistory, numpy values and datetimes encode natively
+class MarketJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        return dumps_json(obj).decode('utf-8')
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_json(obj), mimetype=self.mimetype)
 
 app = Flask(__name__)
+app.json = MarketJSONProvider(app)
 CORS(app)
 
+# ?profile=1 returns a sampled call tree instead of the response; off unless enabled
+PROFILING_ENABLED = os.environ.get('ENABLE_PROFILING', '').lower() in ('1', 'true', 'yes')
+PROFILE_INTERVAL_SECONDS = float(os.environ.get('PROFILE_INTERVAL_MS', 1)) / 1000
+
+def route_label():
+    """The matched URL rule, so per-symbol paths share one series"""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.route_label = route_label()
+    HTTP_IN_FLIGHT.inc(route=g.route_label)
+    if PROFILING_ENABLED and request.args.get('profile') == '1':
+        g.profiler = SamplingProfiler(interval=PROFILE_INTERVAL_SECONDS).start()
+
+@app.after_request
+def record_request_metrics(response):
+    HTTP_SECONDS.observe(time.perf_counter() - g.request_started, route=g.route_label,
+                         method=request.method, status=str(response.status_code))
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.stop()
+    return jsonify({
+        'route': g.route_label,
+        'status': response.status_code,
+        'wall_ms': round(profiler.elapsed * 1000, 2),
+        'interval_ms': PROFILE_INTERVAL_SECONDS * 1000,
+        'samples': profiler.samples,
+        'call_tree': profiler.call_tree()
+    })
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    if 'route_label' in g:
+        HTTP_IN_FLIGHT.dec(route=g.route_label)
+
+@app.after_request
+def compress_large_responses(response):
+    """gzip/br-compress buffered JSON and HTML the client accepts; cached payloads arrive precompressed"""
+    return compress_response(response, request.accept_encodings)
+
+# Only the most recent bars are returned, so only fetch a window that covers them
+HISTORY_PERIOD = os.environ.get('HISTORY_PERIOD', '3mo')
+HISTORY_ROWS = 30
+
 class StockAnalyzer:
-    def __init__(self):
+    def __init__(self, provider=None, llm=None):
+        self.provider = provider or create_provider()
+        self.intent_router = IntentRouter()
         self.news_api_key = 'demo_key'
         # Use environment variable for API key in production
         self.openai_api_key = os.environ.get('OPENAI_API_KEY', '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')
+        self.llm = llm or OpenRouterClient(
+            self.openai_api_key,
+            base_url=os.environ.get('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1'),
+            timeout=float(os.environ.get('LLM_TIMEOUT_SECONDS', 15)),
+            pool_size=int(os.environ.get('LLM_POOL_SIZE', 10)),
+            async_pool_size=int(os.environ.get('LLM_ASYNC_POOL_SIZE', 100)),
+            headers={
+                'HTTP-Referer': 'https://macra-ai-analyzer.com',
+                'X-Title': 'MACRA Market Analyzer'
+            },
+            breaker=openrouter_breaker
+        )
         
         # Mock data for when Yahoo Finance is unavailable
         self.mock_data = {
@@ -107,54 +1006,149 @@ class StockAnalyzer:
                 'pe_ratio': 35.2,
                 'dividend_yield': 0.72,
                 'historical_data': []
+            },
+            'META': {
+                'symbol': 'META',
+                'name': 'Meta Platforms Inc',
+                'current_price': 563.33,
+                'change': 0.9,
+                'volume': 12345678,
+                'market_cap': 1420000000000,
+                'pe_ratio': 28.6,
+                'dividend_yield': 0.36,
+                'historical_data': []
+            },
+            'NVDA': {
+                'symbol': 'NVDA',
+                'name': 'NVIDIA Corporation',
+                'current_price': 135.40,
+                'change': 1.9,
+                'volume': 245678901,
+                'market_cap': 3320000000000,
+                'pe_ratio': 53.1,
+                'dividend_yield': 0.03,
+                'historical_data': []
             }
         }
     
     # ... rest of your existing code stays the same ...
-    def get_stock_data(self, symbol):
-        """Get stock data with caching and improved error handling"""
+    def get_stock_data(self, symbol, max_wait=None):
+        """Get stock data with caching and improved error handling.
+        
+        A cache miss waits up to max_wait seconds (YAHOO_MAX_WAIT_SECONDS by
+        default) for a Yahoo token.
+        """
+        if not symbol or len(symbol) > 10:
+            return {'error': 'Invalid stock symbol'}
+        
+        # Typos and unlisted tickers are answered from the directory without a Yahoo round trip
+        if is_unlisted(symbol):
+            SYMBOL_REJECTIONS.inc()
+            return unlisted_symbol_error(symbol)
+        
+        # Check cache first
+        cache_key = f"stock_data_{symbol.upper()}"
+        cached_data, age, status = cache.lookup(cache_key)
+        if status == 'fresh':
+            return cached_data
+        if status == 'stale':
+            # Serve the stale copy right away and refresh it off the request path
+            refresher.submit(cache_key, lambda: inflight.do(
+                cache_key, lambda: self._fetch_stock_data(symbol, cache_key, background=True)))
+            stale_result = dict(cached_data)
+            stale_result['stale'] = True
+            stale_result['age_seconds'] = int(age)
+            return stale_result
+        
+        # Symbols Yahoo recently said do not exist are answered without asking again
+        not_found_error = cache.peek(f"not_found_{symbol.upper()}")
+        if not_found_error:
+            return not_found_error
+        
+        # Concurrent misses for the same symbol wait on a single upstream fetch
+        result = inflight.do(cache_key, lambda: self._fetch_stock_data(symbol, cache_key, max_wait=max_wait))
+        if result is None:
+            # We coalesced onto a background refresh that gave up
+            return self._over_budget_response(symbol, cache_key)
+        return result
+    
+    def refresh_stock_data(self, symbol):
+        """Fetch a quote upstream even if the cached one is fresh, updating the cache; None on failure"""
+        cache_key = f"stock_data_{symbol.upper()}"
+        return inflight.do(cache_key, lambda: self._fetch_stock_data(symbol, cache_key, background=True, use_cache=False))
+    
+    def _fetch_stock_data(self, symbol, cache_key, background=False, use_cache=True, max_wait=None):
+        """Fetch stock data, timing the whole attempt by how it ended"""
+        started = time.perf_counter()
+        result = self._fetch_from_upstream(symbol, cache_key, background, use_cache, max_wait)
+        if result is None:
+            outcome = 'gave_up'
+        elif 'error' in result:
+            outcome = 'error'
+        elif result.get('demo_mode'):
+            outcome = 'demo'
+        elif result.get('stale'):
+            outcome = 'stale'
+        else:
+            outcome = 'ok'
+        STOCK_FETCH_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+        return result
+    
+    def _fetch_from_upstream(self, symbol, cache_key, background=False, use_cache=True, max_wait=None):
+        """Fetch stock data from Yahoo Finance, falling back to mock data.
+        
+        Background refreshes never wait for a token and return None on failure
+        instead of replacing the stale entry with demo data or an error.
+        """
+        if background:
+            max_wait = 0.0
+        elif max_wait is None:
+            max_wait = YAHOO_MAX_WAIT_SECONDS
         try:
-            if not symbol or len(symbol) > 10:
-                return {'error': 'Invalid stock symbol'}
-            
-            # Check cache first
-            cache_key = f"stock_data_{symbol.upper()}"
-            cached_data = cache.get(cache_key)
+            # Another caller may have filled the cache while we queued for the fetch
+            cached_data = cache.get(cache_key) if use_cache else None
             if cached_data:
                 return cached_data
                 
+            # Yahoo is failing; don't queue more requests behind it until the cooldown is over
+            if not yahoo_breaker.allow():
+                return None if background else self._over_budget_response(symbol, cache_key, breaker_open=True, allow_demo=True)
+            
             logger.info(f"Fetching fresh data for {symbol}")
             
-            # Retry logic with exponential backoff
+            # Retry only retryable failures, with jittered exponential backoff
             max_retries = 3
             for attempt in range(max_retries):
+                # Our own budget is spent: Yahoo is fine, so this answer must not look like an outage
+                if not yahoo_scheduler.acquire(max_wait, reserve=YAHOO_BACKGROUND_RESERVE if background else 0):
+                    # If allow() made this the half-open probe, let the next caller probe instead
+                    yahoo_breaker.release()
+                    return None if background else self._over_budget_response(symbol, cache_key)
+                
                 try:
-                    # Add progressive delay to avoid rate limiting
-                    delay = 2.0 * (attempt + 1)  # 2, 4, 6 seconds
-                    time.sleep(delay)
-                    
-                    stock = yf.Ticker(symbol)
-                    hist = stock.history(period="1y")
-                    info = stock.info
+                    hist = self._get_history(symbol)
+                    info = self.provider.get_info(symbol)
+                    yahoo_scheduler.record_success()
+                    # Yahoo answered, even if the symbol turns out not to exist
+                    yahoo_breaker.record_success()
                     
-                    if not info:
-                        if attempt < max_retries - 1:
-                            logger.warning(f"No data for {symbol}, retrying attempt {attempt + 2}")
-                            continue
-                        else:
-                            error_msg = f'No data found for symbol {symbol}. Please verify the symbol and try again in a few minutes.'
-                            return {'error': error_msg}
+                    # Unknown symbols come back with no history and an info dict without a price
+                    if not info or (len(hist) == 0 and not any(key in info for key in ('currentPrice', 'regularMarketPrice'))):
+                        error_msg = f'No data found for symbol {symbol}. Please verify the symbol and try again in a few minutes.'
+                        return self._remember_not_found(symbol, {'error': error_msg})
                     
                     result = {
                         'symbol': symbol,
-                        'name': info.get('longName', info.get('shortName', 'N/A')),
-                        'current_price': info.get('currentPrice', hist['Close'][-1] if len(hist) > 0 else 0),
+                        'name': info.get('longName') or info.get('shortName') or self.listed_name(symbol),
+                        'current_price': info.get('currentPrice', float(hist.close[-1]) if len(hist) > 0 else 0),
                         'change': info.get('regularMarketChangePercent', 0),
                         'volume': info.get('volume', info.get('regularMarketVolume', 0)),
                         'market_cap': info.get('marketCap', 'N/A'),
                         'pe_ratio': info.get('trailingPE', info.get('forwardPE', 'N/A')),
                         'dividend_yield': info.get('dividendYield', 0),
-                        'historical_data': hist.tail(30).to_dict('records') if len(hist) > 0 else []
+                        'historical_data': hist.tail(HISTORY_ROWS),
+                        # Computed once per fetch over the whole window and cached with the quote
+                        'indicators': latest_indicators(hist)
                     }
                     
                     # Cache the successful result
@@ -162,47 +1156,118 @@ class StockAnalyzer:
                     return result
                     
                 except Exception as retry_error:
-                    if attempt < max_retries - 1:
-                        logger.warning(f"Attempt {attempt + 1} failed for {symbol}: {str(retry_error)}")
+                    if not is_retryable_error(retry_error):
+                        raise
+                    delay = yahoo_scheduler.record_failure()
+                    if attempt < max_retries - 1 and delay <= MAX_INLINE_RETRY_DELAY:
+                        logger.warning(f"Attempt {attempt + 1} failed for {symbol}: {str(retry_error)}, retrying in {delay:.2f}s")
+                        STOCK_FETCH_RETRIES.inc()
+                        STOCK_FETCH_BACKOFF_SECONDS.inc(delay)
+                        time.sleep(delay)
                         continue
-                    else:
-                        # Last attempt failed, raise the error
-                        raise retry_error
+                    # Backoff is too long to hold the worker; serve what we have instead
+                    logger.warning(f"Attempt {attempt + 1} failed for {symbol}: {str(retry_error)}, backing off {delay:.2f}s")
+                    yahoo_breaker.record_failure(str(retry_error)[:200])
+                    return None if background else self._over_budget_response(symbol, cache_key, allow_demo=True)
             
         except Exception as e:
             error_msg = str(e)
-            print(f"Error fetching stock data for {symbol}: {error_msg}")
+            logger.warning(f"Error fetching stock data for {symbol}: {error_msg}")
+            symbol_not_found = "404" in error_msg or "not found" in error_msg.lower()
+            if symbol_not_found:
+                yahoo_breaker.record_success()
+            else:
+                yahoo_breaker.record_failure(error_msg[:200])
+            if background:
+                return None
             
             # Check if we have mock data for this symbol
-            symbol_upper = symbol.upper()
-            if symbol_upper in self.mock_data:
-                print(f"Using demo data for {symbol} due to API unavailability")
-                mock_result = self.mock_data[symbol_upper].copy()
-                mock_result['demo_mode'] = True
-                mock_result['demo_message'] = "📊 Demo Mode: Yahoo Finance API is temporarily unavailable. Showing sample data."
-                
-                # Cache the mock data briefly
-                cache_key = f"stock_data_{symbol.upper()}"
-                cache.set(cache_key, mock_result)
+            mock_result = self._get_mock_fallback(symbol, cache_key)
+            if mock_result:
                 return mock_result
             
             # Handle specific error types for unsupported symbols
             if "429" in error_msg or "Too Many Requests" in error_msg:
                 return {'error': f'Rate limit reached for {symbol}. Try waiting 10-15 minutes, or use supported demo symbols: AAPL, AMZN, GOOGL, TSLA, MSFT.'}
-            elif "404" in error_msg or "not found" in error_msg.lower():
-                return {'error': f'Stock symbol {symbol} not found. Try supported symbols: AAPL, AMZN, GOOGL, TSLA, MSFT.'}
+            elif symbol_not_found:
+                return self._remember_not_found(symbol, {'error': f'Stock symbol {symbol} not found. Try supported symbols: AAPL, AMZN, GOOGL, TSLA, MSFT.'})
             else:
                 return {'error': f'Unable to fetch data for {symbol}. API temporarily unavailable. Try: AAPL, AMZN, GOOGL, TSLA, MSFT.'}
     
+    def listed_name(self, symbol):
+        """Company name from the symbol directory, for when Yahoo's info has none"""
+        name = symbol_directory.name(symbol) if symbol_directory is not None else None
+        return name or 'N/A'
+    
+    def _get_history(self, symbol):
+        """HISTORY_PERIOD of daily bars, topped up incrementally from the on-disk store when enabled"""
+        if history_store is None:
+            return PriceHistory.from_dataframe(self.provider.get_history(symbol, HISTORY_PERIOD))
+        return history_store.sync(symbol, HISTORY_PERIOD, lambda period: self.provider.get_history(symbol, period))
+    
+    def _get_mock_fallback(self, symbol, cache_key):
+        """Return demo data for supported symbols.
+        
+        Never cached: under the live key it would be served as a real quote
+        for a full TTL (and from L2 after a restart).
+        """
+        symbol_upper = symbol.upper()
+        if symbol_upper not in self.mock_data:
+            return None
+        
+        logger.warning(f"Using demo data for {symbol} due to API unavailability")
+        mock_result = self.mock_data[symbol_upper].copy()
+        mock_result['demo_mode'] = True
+        mock_result['demo_message'] = "📊 Demo Mode: Yahoo Finance API is temporarily unavailable. Showing sample data."
+        return mock_result
+    
+    def _remember_not_found(self, symbol, error_result):
+        """Negative-cache a not-found answer so repeated lookups skip Yahoo"""
+        cache.set(f"not_found_{symbol.upper()}", error_result)
+        return error_result
+    
+    def _over_budget_response(self, symbol, cache_key, breaker_open=False, allow_demo=False):
+        """Answer without Yahoo: a stale copy, else demo data if Yahoo itself is failing, else retry later.
+        
+        allow_demo is only set when Yahoo failed or its breaker is open. Our own
+        token budget running out is not an outage, so that case gets stale data
+        or an error with retry_after.
+        """
+        retry_after = yahoo_breaker.retry_after() if breaker_open else yahoo_scheduler.retry_after()
+        
+        stale_data, age = cache.get_stale(cache_key)
+        if stale_data:
+            stale_result = dict(stale_data)
+            stale_result['stale'] = True
+            stale_result['age_seconds'] = int(age)
+            return stale_result
+        
+        if allow_demo:
+            mock_result = self._get_mock_fallback(symbol, cache_key)
+            if mock_result:
+                return mock_result
+        
+        if breaker_open:
+            message = f'Market data for {symbol} is temporarily unavailable. Please retry shortly.'
+        else:
+            message = f'Market data for {symbol} is temporarily rate limited. Please retry in a few seconds.'
+        return {
+            'error': message,
+            'retry_after': max(1, int(retry_after + 0.999))
+        }
+    
     def get_mock_data_if_available(self, symbol):
         """Get mock data for supported symbols"""
         return self.mock_data.get(symbol.upper())
     
-    def analyze_stock(self, symbol):
-        stock_data = self.get_stock_data(symbol)
+    def analyze_stock(self, symbol, max_wait=None):
+        stock_data = self.get_stock_data(symbol, max_wait)
         if 'error' in stock_data:
             return stock_data
-            
+        return self.analyze_stock_data(symbol, stock_data)
+    
+    def analyze_stock_data(self, symbol, stock_data):
+        """Score an already fetched quote, so callers holding one don't fetch it again"""
         # Enhanced AI-like analysis
         price = stock_data.get('current_price', 0)
         change = float(stock_data.get('change', 0)) if stock_data.get('change') is not None else 0
@@ -255,6 +1320,44 @@ class StockAnalyzer:
                 score -= 5
                 factors.append("High valuation (expensive)")
         
+        # Technical analysis (only when history was available to compute indicators)
+        indicators = stock_data.get('indicators') or {}
+        sma_20, sma_50 = indicators.get('sma_20'), indicators.get('sma_50')
+        if sma_20 is not None and sma_50 is not None:
+            if sma_20 > sma_50:
+                score += 5
+                factors.append("Uptrend (20-day average above 50-day)")
+            else:
+                score -= 5
+                factors.append("Downtrend (20-day average below 50-day)")
+        
+        rsi = indicators.get('rsi_14')
+        if rsi is not None:
+            if rsi > 70:
+                score -= 5
+                factors.append(f"Overbought (RSI {rsi:.0f})")
+            elif rsi < 30:
+                score += 5
+                factors.append(f"Oversold (RSI {rsi:.0f})")
+        
+        macd_histogram = indicators.get('macd_histogram')
+        if macd_histogram is not None:
+            if macd_histogram > 0:
+                score += 5
+                factors.append("Bullish MACD momentum")
+            else:
+                score -= 3
+                factors.append("Bearish MACD momentum")
+        
+        volatility = indicators.get('volatility_20d')
+        if volatility is not None and volatility > 0.6:
+            score -= 5
+            factors.append(f"High volatility ({volatility:.0%} annualized)")
+        
+        volume_zscore = indicators.get('volume_zscore')
+        if volume_zscore is not None and volume_zscore > 2:
+            factors.append("Unusual volume spike")
+        
         # Risk assessment
         risk_level = 'Low' if score >= 70 else 'Medium' if score >= 50 else 'High'
         
@@ -266,7 +1369,8 @@ class StockAnalyzer:
             'score': max(0, min(100, score)),
             'recommendation': f"Based on comprehensive analysis: {sentiment.split(' ')[1].lower()} recommendation.",
             'confidence': min(95, int(abs(change) * 8 + 65)),
-            'risk_level': risk_level
+            'risk_level': risk_level,
+            'indicators': indicators
         }
     
     def get_news(self, symbol):
@@ -303,22 +1407,10 @@ class StockAnalyzer:
         cache.set(cache_key, news_data)
         return news_data
     
-    def get_ai_response(self, user_message, stock_context=None):
-        """Get AI response using OpenRouter API with fallback"""
-        try:
-            # First, return a smart local response for common queries to avoid API calls
-            if self.should_use_fallback(user_message):
-                return self.get_fallback_response(user_message, stock_context)
-                
-            headers = {
-                'Authorization': f'Bearer {self.openai_api_key}',
-                'Content-Type': 'application/json',
-                'HTTP-Referer': 'https://macra-ai-analyzer.com',
-                'X-Title': 'MACRA Market Analyzer'
-            }
-            
-            # Create context-aware system message
-            system_message = """You are MACRA AI, an expert financial advisor and stock market analyst. You help users understand stock investing, market trends, and financial concepts in simple, beginner-friendly terms. 
+    def build_chat_messages(self, user_message, stock_context=None):
+        """System and user messages for an OpenRouter chat completion"""
+        # Create context-aware system message
+        system_message = """You are MACRA AI, an expert financial advisor and stock market analyst. You help users understand stock investing, market trends, and financial concepts in simple, beginner-friendly terms. 
 
 Key guidelines:
 - Provide clear, educational responses about stocks and investing
@@ -330,213 +1422,361 @@ Key guidelines:
 - If asked about specific stocks, provide educational analysis based on general market principles
 
 You are integrated into the MACRA Market Analyzer platform that provides real-time stock data and AI analysis."""
+        
+        # Add stock context if provided
+        if stock_context:
+            system_message += f"\n\nCurrent stock context: {stock_context}"
+        
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message}
+        ]
+    
+    def get_ai_response(self, user_message, stock_context=None):
+        """Get AI response using OpenRouter API with fallback"""
+        try:
+            # First, return a smart local response for common queries to avoid API calls
+            intent = self.intent_router.route(user_message)
+            if intent.local:
+                return self.get_fallback_response(user_message, stock_context, intent)
             
-            # Add stock context if provided
-            if stock_context:
-                system_message += f"\n\nCurrent stock context: {stock_context}"
-            
-            # Try different model options in case one fails
-            models_to_try = [
-                "meta-llama/llama-3.1-8b-instruct:free",
-                "microsoft/phi-3-mini-128k-instruct:free", 
-                "google/gemma-2-9b-it:free"
-            ]
+            # Same question, context and model answered recently: skip the upstream call
+            model = self.llm.models[0]
+            cached_response = chat_cache.get(user_message, stock_context, model)
+            if cached_response:
+                return cached_response
             
-            for model in models_to_try:
-                try:
-                    data = {
-                        "model": model,
-                        "messages": [
-                            {"role": "system", "content": system_message},
-                            {"role": "user", "content": user_message}
-                        ],
-                        "max_tokens": 400,
-                        "temperature": 0.7
-                    }
-                    
-                    response = requests.post(
-                        'https://openrouter.ai/api/v1/chat/completions',
-                        headers=headers,
-                        json=data,
-                        timeout=15  # Reduced timeout
-                    )
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        if 'choices' in result and len(result['choices']) > 0:
-                            return result['choices'][0]['message']['content']
-                    elif response.status_code == 401:
-                        # API key issue, use fallback immediately
-                        break
-                    elif response.status_code == 429:
-                        continue  # Try next model if rate limited
-                    else:
-                        print(f"API Error {response.status_code}: {response.text}")
-                        continue
-                        
-                except requests.exceptions.RequestException as e:
-                    print(f"Request error with model {model}: {str(e)}")
-                    continue
+            # Pooled client hedges across models and bounds the whole call by one deadline
+            started = time.monotonic()
+            ai_response = self.llm.complete(self.build_chat_messages(user_message, stock_context), max_tokens=400, temperature=0.7)
+            if ai_response:
+                chat_cache.set(user_message, stock_context, model, ai_response, time.monotonic() - started)
+                return ai_response
             
             # If all models fail, return a helpful fallback response
+            return self.get_fallback_response(user_message, stock_context, intent)
+                
+        except Exception as e:
+            logger.warning(f"AI Response Error: {str(e)}")
             return self.get_fallback_response(user_message, stock_context)
+    
+    async def get_ai_response_async(self, user_message, stock_context=None):
+        """get_ai_response for the asyncio serving path; the upstream call is awaited, not blocked on"""
+        try:
+            intent = self.intent_router.route(user_message)
+            if intent.local:
+                return self.get_fallback_response(user_message, stock_context, intent)
+            
+            model = self.llm.models[0]
+            cached_response = chat_cache.get(user_message, stock_context, model)
+            if cached_response:
+                return cached_response
+            
+            started = time.monotonic()
+            ai_response = await self.llm.complete_async(self.build_chat_messages(user_message, stock_context), max_tokens=400, temperature=0.7)
+            if ai_response:
+                chat_cache.set(user_message, stock_context, model, ai_response, time.monotonic() - started)
+                return ai_response
+            
+            return self.get_fallback_response(user_message, stock_context, intent)
                 
         except Exception as e:
-            print(f"AI Response Error: {str(e)}")
+            logger.warning(f"AI Response Error: {str(e)}")
             return self.get_fallback_response(user_message, stock_context)
     
+    def stream_ai_response(self, user_message, stock_context=None):
+        """Yield the AI response in chunks as they become available; same fallbacks as get_ai_response"""
+        intent = self.intent_router.route(user_message)
+        if intent.local:
+            yield from self.get_fallback_response(user_message, stock_context, intent).splitlines(keepends=True)
+            return
+        
+        model = self.llm.models[0]
+        cached_response = chat_cache.get(user_message, stock_context, model)
+        if cached_response:
+            yield cached_response
+            return
+        
+        started = time.monotonic()
+        chunks = []
+        deltas = self.llm.stream(self.build_chat_messages(user_message, stock_context), max_tokens=400, temperature=0.7)
+        try:
+            for text in deltas:
+                chunks.append(text)
+                yield text
+        except Exception as e:
+            logger.warning(f"AI Response Error: {str(e)}")
+            if chunks:
+                # A truncated answer is neither cached nor padded with the fallback;
+                # chat_stream ends it with an error event instead of done
+                raise
+        finally:
+            # Closing our generator (client went away) closes the upstream stream too
+            deltas.close()
+        
+        if chunks:
+            chat_cache.set(user_message, stock_context, model, ''.join(chunks), time.monotonic() - started)
+        else:
+            yield from self.get_fallback_response(user_message, stock_context, intent).splitlines(keepends=True)
+    
     def should_use_fallback(self, user_message):
         """Determine if we should use local fallback instead of API"""
-        message_lower = user_message.lower()
-        # Use fallback for common/simple questions to reduce API calls
-        # Also use fallback for initial empty/minimal messages and stock recommendation questions
-        fallback_triggers = [
-            'hello', 'hi', 'help', 'what can you do', 'how to start', 'beginner', 'hey',
-            'what stock should i buy', 'which stock', 'recommend stock', 'should buy',
-            'good stock to buy', 'best stock'
-        ]
-        return any(trigger in message_lower for trigger in fallback_triggers) or len(message_lower.strip()) < 5
+        # Greetings, help and stock-pick questions are answered locally to reduce API calls
+        return self.intent_router.route(user_message).local
     
-    def get_fallback_response(self, user_message, stock_context=None):
+    def get_fallback_response(self, user_message, stock_context=None, intent=None):
         """Provide intelligent fallback responses when AI API is unavailable"""
-        message_lower = user_message.lower().strip()
-        
-        # Handle greetings and initial chat (including empty or minimal messages)
-        if not message_lower or any(word in message_lower for word in ['hello', 'hi', 'hey', 'start']):
-            return """🤖 Hi! I'm your MACRA AI assistant, here to help you learn about stocks and investing! 
+        return render_response(intent or self.intent_router.route(user_message), stock_context)
 
-💡 **I can help you with:**
-• Understanding stock analysis and metrics
-• Explaining investment concepts for beginners
-• Risk assessment and management strategies
-• Market trends and economic indicators
-
-📈 **Popular Questions:**
-• "How do I start investing?"
-• "What does P/E ratio mean?"
-• "Is [STOCK] a good buy?"
-• "How risky is this investment?"
-
-What would you like to learn about?"""
-
-        # Stock recommendation questions
-        elif any(word in message_lower for word in ['buy', 'sell', 'invest', 'good stock', 'should buy', 'recommend', 'which stock']):
-            return """� **Stock Investment Guidance:**
-
-I can't recommend specific stocks to buy, but I can teach you how to choose wisely! 
-
-🔍 **Research Process:**
-• **Step 1**: Use our analyzer above to check AMZN, AAPL, TSLA, GOOGL, or MSFT
-• **Step 2**: Look for companies with strong financials and reasonable P/E ratios
-• **Step 3**: Consider your risk tolerance and investment timeline
-• **Step 4**: Diversify - don't put all money in one stock!
-
-📊 **Key Metrics to Check:**
-• P/E Ratio (15-25 is often reasonable)
-• Revenue growth over time
-• Market cap and trading volume
-• Industry position and competition
-
-⚠️ **Important**: This is educational guidance, not financial advice. Start with small amounts, learn as you go, and consider consulting a financial advisor!
-
-Try analyzing a stock above to see these principles in action! 📈"""
-
-        # P/E ratio questions
-        elif 'p/e' in message_lower or 'pe ratio' in message_lower or 'price to earnings' in message_lower:
-            return """📊 **P/E Ratio Explained Simply:**
-
-The Price-to-Earnings ratio compares a stock's price to its annual earnings per share.
-
-• **Low P/E (under 15)**: Potentially undervalued, but verify why
-• **Medium P/E (15-25)**: Generally fair valuation  
-• **High P/E (over 25)**: May be overvalued or high-growth company
-
-💡 **Example**: If a stock costs $100 and earns $5 per share annually, P/E = 20
-
-⚠️ **Tip**: Compare P/E ratios within the same industry for better context!"""
-
-        # Risk questions
-        elif any(word in message_lower for word in ['risk', 'safe', 'dangerous']):
-            return """🛡️ **Stock Investment Risks:**
-
-• **Market Risk**: Prices fluctuate with overall market conditions
-• **Company Risk**: Business-specific challenges or failures
-• **Sector Risk**: Industry-wide problems (tech crash, oil prices)
-• **Inflation Risk**: Purchasing power erosion over time
-
-🎯 **Risk Management Tips**:
-• Diversify across different stocks and sectors
-• Only invest money you can afford to lose
-• Start small and learn gradually
-• Consider your time horizon
-
-📊 Our AI analysis includes risk assessment for each stock!"""
-
-        # Beginner questions
-        elif any(word in message_lower for word in ['beginner', 'start', 'how to', 'new']):
-            return """🌟 **Getting Started with Stock Investing:**
+analyzer = StockAnalyzer()
 
-**Step 1**: Learn the basics (you're doing great! 📚)
-**Step 2**: Open a brokerage account with reputable firms
-**Step 3**: Start with index funds or blue-chip stocks
-**Step 4**: Invest regularly, not just once
+# Shared, bounded pool for per-symbol fan-out so one request cannot spawn unbounded threads
+FANOUT_DEADLINE_SECONDS = float(os.environ.get('FANOUT_DEADLINE_SECONDS', 10.0))
+MAX_FANOUT_SYMBOLS = int(os.environ.get('MAX_FANOUT_SYMBOLS', 50))
+fanout_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('FANOUT_WORKERS', 8)),
+    thread_name_prefix='fanout'
+)
 
-💡 **Beginner-Friendly Stocks**: Look for established companies like:
-• Apple (AAPL) • Microsoft (MSFT) • Google (GOOGL)
+def clean_symbol(symbol):
+    """Normalize a user-supplied ticker, or return None if it is not a valid symbol"""
+    if not isinstance(symbol, str) or not symbol.strip():
+        return None
+    symbol = symbol.strip().upper()[:10]
+    if not symbol.replace('.', '').replace('-', '').isalnum():
+        return None
+    return symbol
 
-⚠️ **Golden Rule**: Never invest more than you can afford to lose!
+def dedupe_symbols(symbols):
+    """Clean symbols and drop repeats, keeping first-seen order; invalid ones are returned separately"""
+    seen = []
+    invalid = []
+    for symbol in symbols:
+        cleaned = clean_symbol(symbol)
+        if cleaned is None:
+            invalid.append(symbol)
+        elif cleaned not in seen:
+            seen.append(cleaned)
+    return seen, invalid
 
-🚀 Try analyzing these stocks with our tool above!"""
+def paced_call(fn, symbol, expires):
+    """fn(symbol, max_wait=...), waiting for a Yahoo token no later than expires (a monotonic time)"""
+    return fn(symbol, max_wait=max(0.0, expires - time.monotonic()))
 
-        # Market trend questions  
-        elif any(word in message_lower for word in ['market', 'trend', 'economy']):
-            return """📈 **Understanding Market Trends:**
+def fan_out(fn, symbols, deadline=FANOUT_DEADLINE_SECONDS):
+    """Run fn(symbol, max_wait) concurrently and return {symbol: (status, result)} in input order.
+    
+    Each miss waits for a Yahoo token until the deadline instead of failing
+    once the burst is spent, so the pool's workers go upstream at the
+    scheduler's rate. Status is 'ok', 'error' (result carries the error) or
+    'timeout' when the symbol did not finish before the deadline. Timed-out
+    fetches keep running in the pool and still populate the cache for the
+    next request.
+    """
+    expires = time.monotonic() + deadline
+    futures = {symbol: fanout_executor.submit(paced_call, fn, symbol, expires) for symbol in symbols}
+    wait(futures.values(), timeout=deadline)
+    return collect_fan_out(futures)
 
-• **Bull Market**: Prices rising, investor confidence high 🐂
-• **Bear Market**: Prices falling 20%+ from highs 🐻  
-• **Correction**: 10-20% decline, often healthy
+def collect_fan_out(futures):
+    """{symbol: (status, result)} from futures that have had until the deadline; unfinished ones are cancelled"""
+    results = {}
+    for symbol, future in futures.items():
+        if not future.done():
+            future.cancel()
+            results[symbol] = ('timeout', None)
+            continue
+        try:
+            result = future.result()
+        except Exception as e:
+            results[symbol] = ('error', {'error': str(e)})
+            continue
+        if isinstance(result, dict) and 'error' in result:
+            results[symbol] = ('error', result)
+        else:
+            results[symbol] = ('ok', result)
+    return results
 
-🔍 **Key Indicators to Watch**:
-• Economic data (GDP, employment, inflation)
-• Company earnings reports
-• Federal Reserve policy changes
-• Global events and sentiment
+MAX_BULK_SYMBOLS = int(os.environ.get('MAX_BULK_SYMBOLS', 500))
+BULK_DEADLINE_SECONDS = float(os.environ.get('BULK_DEADLINE_SECONDS', 30.0))
+# Misses each bulk request may have queued on the fan-out pool at once
+BULK_WINDOW = int(os.environ.get('BULK_WINDOW', 16))
 
-💡 **Pro Tip**: Focus on long-term investing rather than trying to time the market!"""
+def quote_is_cached(symbol):
+    """True if get_stock_data can answer without going upstream (cached, known-missing or unlisted).
+    
+    Peeks without counting, so the get_stock_data call that follows is the
+    only lookup recorded for the request.
+    """
+    if is_unlisted(symbol):
+        return True
+    return cache.peek(f"stock_data_{symbol}", stale=True) is not None or cache.peek(f"not_found_{symbol}") is not None
 
-        # Default response with stock context
-        elif stock_context:
-            return f"""🤖 I'm here to help with stock and investing questions! 
+def quote_in_memory(symbol):
+    """True if get_stock_data can answer from the in-process tier alone (fresh L1 entry or unlisted), with no file I/O"""
+    return is_unlisted(symbol) or cache.peek(f"stock_data_{symbol}", local_only=True) is not None
 
-📊 **Current Analysis Context**: {stock_context}
+def iter_quotes(symbols, deadline=BULK_DEADLINE_SECONDS, window=BULK_WINDOW):
+    """Yield (symbol, status, result) for each symbol as soon as it completes.
+    
+    Cache hits are answered inline first; misses are fetched on the fan-out
+    pool with at most `window` in flight, so a long list holds a bounded
+    number of results at a time. Status is 'ok', 'error' or 'timeout', as in fan_out.
+    """
+    expires = time.monotonic() + deadline
+    misses = []
+    for symbol in symbols:
+        if quote_is_cached(symbol):
+            result = analyzer.get_stock_data(symbol)
+            yield symbol, 'error' if 'error' in result else 'ok', result
+        else:
+            misses.append(symbol)
+    
+    pending = {}
+    queued = iter(misses)
+    try:
+        while True:
+            while len(pending) < window:
+                symbol = next(queued, None)
+                if symbol is None:
+                    break
+                pending[fanout_executor.submit(analyzer.get_stock_data, symbol)] = symbol
+            if not pending:
+                return
+            time_left = expires - time.monotonic()
+            done, _ = wait(list(pending), timeout=max(0.0, time_left), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                symbol = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    yield symbol, 'error', {'error': str(e)}
+                    continue
+                yield symbol, 'error' if 'error' in result else 'ok', result
+        # Out of time: in-flight fetches still land in the cache for the next request
+        for symbol in list(pending.values()) + list(queued):
+            yield symbol, 'timeout', None
+    finally:
+        # Also reached when the client disconnects mid-stream
+        for future in pending:
+            future.cancel()
 
-💭 **Ask me about:**
-• How to interpret the analysis results
-• What the risk level means
-• Investment strategies for beginners
-• How to use P/E ratios and other metrics
+# Live quotes: one shared poller per subscribed symbol, pushed over SSE
+QUOTE_STREAM_MAX_SYMBOLS = int(os.environ.get('QUOTE_STREAM_MAX_SYMBOLS', 20))
+QUOTE_STREAM_HEARTBEAT_SECONDS = float(os.environ.get('QUOTE_STREAM_HEARTBEAT_SECONDS', 15))
+quote_hub = QuoteHub(
+    # QUOTE_STREAM_SOURCE=fake ticks offline prices every poll, for testing the push path
+    FakeTicker() if os.environ.get('QUOTE_STREAM_SOURCE', '').lower() == 'fake' else analyzer.refresh_stock_data,
+    interval_seconds=float(os.environ.get('QUOTE_STREAM_INTERVAL_SECONDS', 15)),
+    # Every open stream holds a gthread worker thread (32 in the Procfile) or an ASGI bridge thread
+    max_subscribers=int(os.environ.get('QUOTE_STREAM_MAX_SUBSCRIBERS', 16)),
+    stall_seconds=float(os.environ.get('QUOTE_STREAM_STALL_SECONDS', 60)),
+    max_backoff_seconds=float(os.environ.get('QUOTE_STREAM_MAX_BACKOFF_SECONDS', 300))
+)
 
-🚀 What specific aspect of investing would you like to learn about?"""
+TRENDING_SYMBOLS = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'META', 'NVDA']
+TRENDING_REFRESH_SECONDS = float(os.environ.get('TRENDING_REFRESH_SECONDS', 60))
 
-        # General fallback
-        else:
-            return """🤖 Hi! I'm your MACRA AI assistant, here to help you learn about stocks and investing! 
+# Keeps a pre-serialized /api/trending response current from a background thread
+class TrendingSnapshot:
+    def __init__(self, symbols, refresh_seconds):
+        self.symbols = symbols
+        self.refresh_seconds = refresh_seconds
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.thread = None
+        self.refreshes = 0
+    
+    def refresh(self):
+        """Rebuild the snapshot from the cache-backed stock data"""
+        results = fan_out(analyzer.get_stock_data, self.symbols)
+        trending_data = [data for status, data in results.values() if status == 'ok']
+        payload = EncodedPayload.encode(trending_data)
+        etag = payload.etag
+        
+        with self.lock:
+            # Only move Last-Modified when the payload actually changed
+            unchanged = self.snapshot is not None and self.snapshot['etag'] == etag
+            self.snapshot = {
+                'payload': payload,
+                'etag': etag,
+                'last_modified': self.snapshot['last_modified'] if unchanged else datetime.now(timezone.utc).replace(microsecond=0),
+                'symbol_status': ','.join(f'{symbol}={status}' for symbol, (status, _) in results.items()),
+                'partial': any(status == 'timeout' for status, _ in results.values())
+            }
+            self.refreshes += 1
+            return self.snapshot
+    
+    def get(self):
+        """Return the current snapshot, building it on first use"""
+        self.start()
+        with self.lock:
+            snapshot = self.snapshot
+        return snapshot if snapshot is not None else self.refresh()
+    
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._run, name='trending-refresh', daemon=True)
+            self.thread.start()
+    
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Trending snapshot refresh failed: {str(e)}")
+            time.sleep(self.refresh_seconds)
 
-💡 **I can help you with:**
-• Understanding stock analysis and metrics
-• Explaining investment concepts for beginners  
-• Risk assessment and management strategies
-• Market trends and economic indicators
+trending_snapshot = TrendingSnapshot(TRENDING_SYMBOLS, TRENDING_REFRESH_SECONDS)
 
-📈 **Popular Questions:**
-• "How do I start investing?"
-• "What does P/E ratio mean?"
-• "Is [STOCK] a good buy?"
-• "How risky is this investment?"
+PREWARM_ON_BOOT = os.environ.get('PREWARM_ON_BOOT', '').lower() in ('1', 'true', 'yes')
+PREWARM_SYMBOLS, _ = dedupe_symbols(os.environ.get('PREWARM_SYMBOLS', ','.join(TRENDING_SYMBOLS)).split(','))
 
-What would you like to learn about? 🚀"""
+# Boot-time warm-up, run off the request path so the first users don't pay for
+# the data stack import and cold fetches
+class Prewarmer:
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.state = 'idle'
+        self.thread = None
+        self.seconds = None
+        self.symbol_status = {}
+    
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='prewarm', daemon=True)
+            self.thread.start()
+        return self
+    
+    def _run(self):
+        self.state = 'running'
+        started = time.perf_counter()
+        try:
+            preload_data_stack()
+            results = fan_out(analyzer.get_stock_data, self.symbols) if self.symbols else {}
+            self.symbol_status = {symbol: status for symbol, (status, _) in results.items()}
+            # Its first refresh now finds the trending quotes in the cache
+            trending_snapshot.start()
+            self.state = 'done'
+        except Exception as e:
+            self.state = 'failed'
+            logger.warning(f"Prewarm failed: {str(e)}")
+        self.seconds = round(time.perf_counter() - started, 3)
+        logger.info(f"Prewarm {self.state} in {self.seconds}s: {self.symbol_status}")
+    
+    def stats(self):
+        return {
+            'enabled': PREWARM_ON_BOOT,
+            'state': self.state,
+            'seconds': self.seconds,
+            'symbols': dict(self.symbol_status)
+        }
 
-analyzer = StockAnalyzer()
+prewarmer = Prewarmer(PREWARM_SYMBOLS)
 
 @app.route('/')
 def home():
@@ -552,31 +1792,65 @@ def home():
         except:
             return "Application temporarily unavailable. Please try again later.", 500
 
-@app.route('/api/stock/<symbol>')
-def get_stock(symbol):
-    """Get stock data with validation"""
+def with_history_format(stock_data, history_format):
+    """Swap columnar history for the legacy list-of-rows shape when ?format=records is asked for"""
+    history = stock_data.get('historical_data')
+    if history_format != 'records' or not isinstance(history, PriceHistory):
+        return stock_data
+    stock_data = dict(stock_data)
+    stock_data['historical_data'] = history.to_records()
+    return stock_data
+
+def validate_path_symbol(symbol):
+    """Clean a symbol from the URL path; return (symbol, None) or (None, error message)"""
     if not symbol or not symbol.strip():
-        return jsonify({'error': 'Stock symbol is required'})
+        return None, 'Stock symbol is required'
     
-    # Clean and validate symbol
     symbol = symbol.strip().upper()[:10]  # Limit length and uppercase
     if not symbol.replace('.', '').replace('-', '').isalnum():
-        return jsonify({'error': 'Invalid stock symbol format'})
-    
-    return jsonify(analyzer.get_stock_data(symbol))
+        return None, 'Invalid stock symbol format'
+    return symbol, None
+
+def stock_response(symbol, stock_data):
+    """Serve a quote in the requested history format from its cached encoding"""
+    history_format = request.args.get('format') or 'columns'
+    # Serialized and compressed once per cached quote, then served as bytes
+    payload = cache.encode(f"stock_data_{symbol}", stock_data, history_format,
+                           lambda data: EncodedPayload.encode(with_history_format(data, history_format)))
+    return payload_response(payload, request.accept_encodings)
+
+@app.route('/api/stock/<symbol>')
+def get_stock(symbol):
+    """Get stock data with validation"""
+    symbol, error = validate_path_symbol(symbol)
+    if error:
+        return jsonify({'error': error})
+    return stock_response(symbol, analyzer.get_stock_data(symbol))
 
 @app.route('/api/analyze/<symbol>')
 def analyze(symbol):
     """Analyze stock with validation"""
-    if not symbol or not symbol.strip():
-        return jsonify({'error': 'Stock symbol is required'})
-    
-    symbol = symbol.strip().upper()[:10]
-    if not symbol.replace('.', '').replace('-', '').isalnum():
-        return jsonify({'error': 'Invalid stock symbol format'})
-    
+    symbol, error = validate_path_symbol(symbol)
+    if error:
+        return jsonify({'error': error})
     return jsonify(analyzer.analyze_stock(symbol))
 
+SEARCH_MAX_RESULTS = 25
+
+@app.route('/api/search')
+def search_symbols():
+    """Ticker and company-name autocomplete from the local symbol directory"""
+    query = (request.args.get('q') or '').strip()[:50]
+    if not query:
+        return jsonify({'error': 'Search query is required'})
+    if symbol_directory is None:
+        return jsonify({'error': 'Symbol search is not available'})
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), SEARCH_MAX_RESULTS)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'})
+    return jsonify({'query': query, 'results': symbol_directory.search(query, limit)})
+
 @app.route('/api/news/<symbol>')
 def news(symbol):
     """Get news with validation"""
@@ -586,72 +1860,331 @@ def news(symbol):
     symbol = symbol.strip().upper()[:10]
     return jsonify(analyzer.get_news(symbol))
 
+BUNDLE_SECTIONS = ('quote', 'analysis', 'news')
+
+def parse_bundle_fields(spec):
+    """Parse ?fields= into (sections, include, exclude).
+
+    Items are a section ("news"), a section key ("quote.name"), or either of
+    those prefixed with "-" to leave it out. With only exclusions, every
+    section is returned: fields=-quote.historical_data drops just the history.
+    """
+    include, exclude = {}, {}
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        target = exclude if item.startswith('-') else include
+        section, _, key = item.lstrip('-').partition('.')
+        if section not in BUNDLE_SECTIONS:
+            continue
+        if not key:
+            # A bare section means the whole section
+            target[section] = None
+        elif target.get(section, set()) is not None:
+            target.setdefault(section, set()).add(key)
+    sections = [section for section in BUNDLE_SECTIONS
+                if (section in include if include else True) and not (section in exclude and exclude[section] is None)]
+    return sections, include, exclude
+
+def project_section(section, value, include, exclude):
+    """Apply the include/exclude keys of one section to its dict"""
+    if not isinstance(value, dict):
+        return value
+    keys = include.get(section)
+    if keys:
+        value = {key: value[key] for key in keys if key in value}
+    dropped = exclude.get(section)
+    if dropped:
+        value = {key: item for key, item in value.items() if key not in dropped}
+    return value
+
+@app.route('/api/symbol/<symbol>')
+def symbol_bundle(symbol):
+    """Quote, analysis and news for one symbol in a single response"""
+    if not symbol or not symbol.strip():
+        return jsonify({'error': 'Stock symbol is required'})
+    
+    symbol = symbol.strip().upper()[:10]
+    if not symbol.replace('.', '').replace('-', '').isalnum():
+        return jsonify({'error': 'Invalid stock symbol format'})
+    
+    sections, include, exclude = parse_bundle_fields(request.args.get('fields'))
+    
+    # News doesn't depend on the quote, so it resolves while the quote is fetched
+    news_future = fanout_executor.submit(analyzer.get_news, symbol) if 'news' in sections else None
+    stock_data = analyzer.get_stock_data(symbol)
+    if 'error' in stock_data:
+        if news_future:
+            news_future.cancel()
+        return jsonify(stock_data)
+    
+    bundle = {'symbol': symbol}
+    if 'quote' in sections:
+        bundle['quote'] = with_history_format(stock_data, request.args.get('format'))
+    if 'analysis' in sections:
+        # Scored from the same quote rather than fetching it a second time
+        bundle['analysis'] = analyzer.analyze_stock_data(symbol, stock_data)
+    if news_future:
+        try:
+            bundle['news'] = news_future.result(timeout=FANOUT_DEADLINE_SECONDS)
+        except Exception as e:
+            logger.warning(f"News for {symbol} unavailable: {str(e)}")
+            bundle['news'] = []
+    
+    for section in sections:
+        bundle[section] = project_section(section, bundle[section], include, exclude)
+    return jsonify(bundle)
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {dumps_json(data).decode('utf-8')}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream the chat answer as server-sent events: token* then done (or error)"""
+    data = request.get_json(silent=True) or {}
+    user_message = data.get('message', '')
+    stock_context = data.get('stock_context', None)
+    
+    if not isinstance(user_message, str) or not user_message.strip():
+        return jsonify({'error': 'Please provide a message'})
+    
+    def generate():
+        chunks = analyzer.stream_ai_response(user_message, stock_context)
+        try:
+            for chunk in chunks:
+                yield sse_event('token', {'text': chunk})
+            yield sse_event('done', {'timestamp': datetime.now().isoformat()})
+        except Exception as e:
+            yield sse_event('error', {'error': f'Chat service temporarily unavailable: {str(e)}'})
+        finally:
+            chunks.close()
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/stream/quotes')
+def stream_quotes():
+    """Push live quotes for ?symbols= as server-sent events: subscribed, snapshot, then quote diffs"""
+    symbols, invalid_symbols = dedupe_symbols(symbol for symbol in request.args.get('symbols', '').split(',') if symbol)
+    if not symbols:
+        return jsonify({'error': 'No valid symbols provided'})
+    if len(symbols) > QUOTE_STREAM_MAX_SYMBOLS:
+        return jsonify({'error': f'Too many symbols (maximum {QUOTE_STREAM_MAX_SYMBOLS})'})
+    try:
+        subscription = quote_hub.subscribe(symbols)
+    except SubscriberLimitError:
+        response = jsonify({'error': 'Live quotes are at capacity. Please retry shortly.', 'retry_after': 30})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    
+    def generate():
+        try:
+            yield sse_event('subscribed', {'symbols': symbols, 'invalid': invalid_symbols, 'interval_seconds': quote_hub.interval})
+            while True:
+                updates = subscription.next(QUOTE_STREAM_HEARTBEAT_SECONDS)
+                for event, data in updates:
+                    yield sse_event(event, data)
+                if subscription.closed:
+                    yield sse_event('closed', {'reason': subscription.close_reason})
+                    return
+                if not updates:
+                    # Keeps proxies from timing out and surfaces dead connections
+                    yield ': keepalive\n\n'
+        finally:
+            quote_hub.unsubscribe(subscription)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/api/chat', methods=['POST'])
 def chat_with_ai():
+    if request.accept_mimetypes.best_match(['application/json', 'text/event-stream']) == 'text/event-stream':
+        return chat_stream()
+    
     try:
-        data = request.get_json()
-        user_message = data.get('message', '')
-        stock_context = data.get('stock_context', None)
-        
+        user_message, stock_context = parse_chat_request(request)
         if not user_message.strip():
             return jsonify({'error': 'Please provide a message'})
-        
-        ai_response = analyzer.get_ai_response(user_message, stock_context)
-        
-        return jsonify({
-            'response': ai_response,
-            'timestamp': datetime.now().isoformat()
-        })
+        return jsonify(chat_reply(analyzer.get_ai_response(user_message, stock_context)))
     except Exception as e:
         return jsonify({'error': f'Chat service temporarily unavailable: {str(e)}'})
 
+def parse_chat_request(req):
+    """(message, stock_context) from a /api/chat JSON body"""
+    data = req.get_json()
+    return data.get('message', ''), data.get('stock_context', None)
+
+def chat_reply(ai_response):
+    return {
+        'response': ai_response,
+        'timestamp': datetime.now().isoformat()
+    }
+
 @app.route('/api/portfolio', methods=['POST'])
 def analyze_portfolio():
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'No data provided'})
-            
-        symbols = data.get('symbols', [])
-        if not symbols:
-            return jsonify({'error': 'No symbols provided'})
-            
-        portfolio_analysis = []
-        total_score = 0
-        
-        for symbol in symbols:
-            analysis = analyzer.analyze_stock(symbol.upper())
-            if 'error' not in analysis:
-                portfolio_analysis.append(analysis)
-                score = analysis.get('score', 50)
-                if isinstance(score, (int, float)):
-                    total_score += score
-        
-        avg_score = total_score / len(portfolio_analysis) if portfolio_analysis else 50
-        
-        return jsonify({
-            'individual_analysis': portfolio_analysis,
-            'portfolio_score': round(avg_score, 2),
-            'portfolio_sentiment': '🚀 Strong Portfolio' if avg_score >= 70 else '📈 Good Portfolio' if avg_score >= 50 else '⚖️ Balanced Portfolio',
-            'total_stocks': len(portfolio_analysis)
-        })
+        symbols, invalid_symbols, error = parse_portfolio_request(request)
+        if error:
+            return jsonify({'error': error})
+        return jsonify(portfolio_summary(fan_out(analyzer.analyze_stock, symbols), invalid_symbols))
     except Exception as e:
         return jsonify({'error': f'Portfolio analysis failed: {str(e)}'})
 
+def parse_portfolio_request(req):
+    """(symbols, invalid symbols, error message or None) from a /api/portfolio JSON body"""
+    data = req.get_json()
+    if not data:
+        return [], [], 'No data provided'
+        
+    symbols = data.get('symbols', [])
+    if not symbols:
+        return [], [], 'No symbols provided'
+    
+    symbols, invalid_symbols = dedupe_symbols(symbols)
+    if len(symbols) > MAX_FANOUT_SYMBOLS:
+        return [], [], f'Too many symbols (maximum {MAX_FANOUT_SYMBOLS})'
+    return symbols, invalid_symbols, None
+
+def portfolio_summary(results, invalid_symbols):
+    """The /api/portfolio body from fan-out results of analyze_stock"""
+    portfolio_analysis = []
+    symbol_status = {symbol: 'invalid' for symbol in invalid_symbols if isinstance(symbol, str)}
+    total_score = 0
+    
+    for symbol, (status, analysis) in results.items():
+        symbol_status[symbol] = status
+        if status == 'ok':
+            portfolio_analysis.append(analysis)
+            score = analysis.get('score', 50)
+            if isinstance(score, (int, float)):
+                total_score += score
+    
+    avg_score = total_score / len(portfolio_analysis) if portfolio_analysis else 50
+    
+    return {
+        'individual_analysis': portfolio_analysis,
+        'portfolio_score': round(avg_score, 2),
+        'portfolio_sentiment': '🚀 Strong Portfolio' if avg_score >= 70 else '📈 Good Portfolio' if avg_score >= 50 else '⚖️ Balanced Portfolio',
+        'total_stocks': len(portfolio_analysis),
+        'symbol_status': symbol_status,
+        'partial': any(status == 'timeout' for status, _ in results.values())
+    }
+
+@app.route('/api/quotes', methods=['GET', 'POST'])
+def bulk_quotes():
+    """Stream quotes for many symbols as newline-delimited JSON, one line per symbol as it completes"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object with a symbols list'}), 400
+        symbols = data.get('symbols', [])
+    else:
+        symbols = request.args.get('symbols', '').split(',')
+    if not isinstance(symbols, list):
+        return jsonify({'error': 'symbols must be a list'})
+    
+    symbols, invalid_symbols = dedupe_symbols(symbol for symbol in symbols if symbol != '')
+    if not symbols and not invalid_symbols:
+        return jsonify({'error': 'No symbols provided'})
+    if len(symbols) > MAX_BULK_SYMBOLS:
+        return jsonify({'error': f'Too many symbols (maximum {MAX_BULK_SYMBOLS})'})
+    history_format = request.args.get('format') or 'columns'
+    
+    def generate():
+        counts = {'ok': 0, 'error': 0, 'timeout': 0, 'invalid': 0}
+        for symbol in invalid_symbols:
+            counts['invalid'] += 1
+            yield dumps_json({'symbol': str(symbol), 'status': 'invalid', 'error': 'Invalid stock symbol format'}) + b'\n'
+        for symbol, status, result in iter_quotes(symbols):
+            counts[status] += 1
+            if status == 'ok':
+                # Splice in the quote's cached encoding rather than re-encoding it per line
+                payload = cache.encode(f"stock_data_{symbol}", result, history_format,
+                                       lambda data: EncodedPayload.encode(with_history_format(data, history_format)))
+                yield dumps_json({'symbol': symbol, 'status': status})[:-1] + b',"quote":' + payload.body + b'}\n'
+                continue
+            error = result.get('error') if status == 'error' else 'Timed out; retry shortly'
+            yield dumps_json({'symbol': symbol, 'status': status, 'error': error}) + b'\n'
+        yield dumps_json({'done': True, 'counts': counts}) + b'\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/api/trending')
 def trending_stocks():
-    trending = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'META', 'NVDA']
-    trending_data = []
-    
-    for symbol in trending:
-        try:
-            data = analyzer.get_stock_data(symbol)
-            if 'error' not in data:
-                trending_data.append(data)
-        except:
-            continue
+    return trending_response(trending_snapshot.get())
+
+def trending_response(snapshot):
+    """Conditional response for a trending snapshot, in the encoding the client accepts"""
+    response = payload_response(snapshot['payload'], request.accept_encodings)
+    encoding = response.headers.get('Content-Encoding')
+    # Each encoding is different bytes, so it gets its own strong validator
+    response.set_etag(f"{snapshot['etag']}-{encoding}" if encoding else snapshot['etag'])
+    response.last_modified = snapshot['last_modified']
+    response.cache_control.public = True
+    response.cache_control.max_age = int(TRENDING_REFRESH_SECONDS)
     
-    return jsonify(trending_data)
+    # The body stays a plain list; per-symbol status travels in headers
+    response.headers['X-Symbol-Status'] = snapshot['symbol_status']
+    if snapshot['partial']:
+        response.headers['X-Partial-Results'] = 'true'
+    return response.make_conditional(request)
+
+BREAKER_STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+REGISTRY.gauge_callback('macra_cache_entries', 'Entries in the in-process cache', (),
+                        lambda: [({}, len(cache.cache))])
+REGISTRY.gauge_callback('macra_cache_bytes', 'Estimated bytes held by the in-process cache', (),
+                        lambda: [({}, cache.bytes)])
+REGISTRY.gauge_callback('macra_upstream_fetches_in_flight', 'Coalesced upstream quote fetches currently running', (),
+                        lambda: [({}, inflight.stats()['in_flight'])])
+REGISTRY.gauge_callback('macra_background_refreshes_pending', 'Stale entries queued for a background refresh', (),
+                        lambda: [({}, refresher.stats()['pending'])])
+REGISTRY.gauge_callback('macra_quote_stream_subscribers', 'Connected live-quote subscribers', (),
+                        lambda: [({}, quote_hub.stats()['subscribers'])])
+REGISTRY.gauge_callback('macra_yahoo_rate_tokens', 'Tokens left in the Yahoo rate limiter', (),
+                        lambda: [({}, yahoo_scheduler.stats()['tokens'])])
+REGISTRY.gauge_callback('macra_circuit_breaker_state', 'Circuit breaker state: 0 closed, 1 half-open, 2 open', ('upstream',),
+                        lambda: [({'upstream': breaker.name}, BREAKER_STATE_VALUES[breaker.stats()['state']])
+                                 for breaker in (yahoo_breaker, openrouter_breaker)])
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of the service metrics"""
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/stats')
+def service_stats():
+    """Expose internal counters for monitoring"""
+    return jsonify({
+        'cache': cache.stats(),
+        'inflight': inflight.stats(),
+        'refresher': refresher.stats(),
+        'provider': analyzer.provider.stats(),
+        'llm': analyzer.llm.stats(),
+        'chat_cache': chat_cache.stats(),
+        'yahoo': yahoo_scheduler.stats(),
+        'quote_stream': quote_hub.stats(),
+        'history_store': history_store.stats() if history_store else None,
+        'prewarm': prewarmer.stats(),
+        'symbol_directory': dict(symbol_directory.stats(), strict=SYMBOL_DIRECTORY_STRICT) if symbol_directory else None,
+        'breakers': {
+            'yahoo': yahoo_breaker.stats(),
+            'openrouter': openrouter_breaker.stats()
+        }
+    })
+
+if PREWARM_ON_BOOT:
+    prewarmer.start()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
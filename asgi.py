@@ -0,0 +1,252 @@
+"""ASGI entry point: asyncio serving for the endpoints that wait on upstreams.
+
+Run with `uvicorn asgi:app`. /api/stock, /api/analyze, /api/portfolio,
+/api/trending and JSON /api/chat are coroutines here. Market data fetches
+(yfinance, retries and backoff included) run on a bounded thread pool, and
+chat completions are awaited over httpx, so one process can hold hundreds
+of requests waiting on Yahoo or OpenRouter while threads are used only for
+market fetches that are actually running.
+
+Responses are built by the same helpers as the Flask views, inside a Flask
+request context, so the app's before/after hooks (CORS, compression,
+metrics) run and the bodies and headers are identical. Every other route
+(the page, the SSE and NDJSON streams, stats) is the Flask app itself,
+bridged over a separate thread pool.
+"""
+import asyncio
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import jsonify, request
+from werkzeug.wrappers import Request
+
+import app as web
+
+flask_app = web.app
+
+# Blocking market data work; bounds concurrent yfinance calls per process
+market_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ASGI_MARKET_WORKERS', 32)),
+    thread_name_prefix='asgi-market'
+)
+# Routes served by the Flask app as-is; each open stream holds one thread
+wsgi_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ASGI_WSGI_WORKERS', 32)),
+    thread_name_prefix='asgi-wsgi'
+)
+
+async def run_market(fn, symbol):
+    """Answer fresh L1 hits on the loop; anything that may touch SQLite or go upstream runs on the market pool"""
+    if web.quote_in_memory(symbol):
+        return fn(symbol)
+    return await asyncio.get_running_loop().run_in_executor(market_executor, fn, symbol)
+
+async def fan_out(fn, symbols, deadline=web.FANOUT_DEADLINE_SECONDS):
+    """app.fan_out for the event loop: same deadline and {symbol: (status, result)} shape"""
+    loop = asyncio.get_running_loop()
+    expires = time.monotonic() + deadline
+    futures = {symbol: loop.run_in_executor(market_executor, web.paced_call, fn, symbol, expires) for symbol in symbols}
+    if futures:
+        await asyncio.wait(futures.values(), timeout=deadline)
+    return web.collect_fan_out(futures)
+
+async def get_stock(symbol):
+    symbol, error = web.validate_path_symbol(symbol)
+    if error:
+        return jsonify({'error': error})
+    return web.stock_response(symbol, await run_market(web.analyzer.get_stock_data, symbol))
+
+async def analyze(symbol):
+    symbol, error = web.validate_path_symbol(symbol)
+    if error:
+        return jsonify({'error': error})
+    return jsonify(await run_market(web.analyzer.analyze_stock, symbol))
+
+async def analyze_portfolio():
+    try:
+        symbols, invalid_symbols, error = web.parse_portfolio_request(request)
+        if error:
+            return jsonify({'error': error})
+        return jsonify(web.portfolio_summary(await fan_out(web.analyzer.analyze_stock, symbols), invalid_symbols))
+    except Exception as e:
+        return jsonify({'error': f'Portfolio analysis failed: {str(e)}'})
+
+async def trending_stocks():
+    snapshot = web.trending_snapshot.snapshot
+    if snapshot is None:
+        # First build fetches every trending symbol
+        snapshot = await asyncio.get_running_loop().run_in_executor(market_executor, web.trending_snapshot.get)
+    else:
+        snapshot = web.trending_snapshot.get()
+    return web.trending_response(snapshot)
+
+async def chat_with_ai():
+    try:
+        user_message, stock_context = web.parse_chat_request(request)
+        if not user_message.strip():
+            return jsonify({'error': 'Please provide a message'})
+        return jsonify(web.chat_reply(await web.analyzer.get_ai_response_async(user_message, stock_context)))
+    except Exception as e:
+        return jsonify({'error': f'Chat service temporarily unavailable: {str(e)}'})
+
+def wants_json_chat(req):
+    # Streaming chat stays on the Flask path
+    return req.accept_mimetypes.best_match(['application/json', 'text/event-stream']) != 'text/event-stream'
+
+# (method, path pattern, handler, optional predicate on the request)
+ROUTES = [
+    ('GET', re.compile(r'/api/stock/(?P<symbol>[^/]+)'), get_stock, None),
+    ('GET', re.compile(r'/api/analyze/(?P<symbol>[^/]+)'), analyze, None),
+    ('POST', re.compile(r'/api/portfolio'), analyze_portfolio, None),
+    ('GET', re.compile(r'/api/trending'), trending_stocks, None),
+    ('POST', re.compile(r'/api/chat'), chat_with_ai, wants_json_chat)
+]
+
+def match_route(environ):
+    """(handler, path params) for the async routes, or None to serve the request through Flask"""
+    req = Request(environ)
+    if web.PROFILING_ENABLED and req.args.get('profile') == '1':
+        # The sampling profiler follows one thread, so profiled requests take the thread path
+        return None
+    for method, pattern, handler, accepts in ROUTES:
+        if req.method != method:
+            continue
+        found = pattern.fullmatch(req.path)
+        if found and (accepts is None or accepts(req)):
+            return handler, found.groupdict()
+    return None
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope whose body has been read"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = name if name == 'CONTENT_TYPE' else f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+def start_message(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+    }
+
+async def dispatch(environ, handler, params):
+    """Run an async view the way Flask runs a sync one: hooks, error handlers and all"""
+    with flask_app.request_context(environ):
+        try:
+            try:
+                rv = flask_app.preprocess_request()
+                if rv is None:
+                    rv = await handler(**params)
+            except Exception as e:
+                rv = flask_app.handle_user_exception(e)
+            response = flask_app.finalize_request(rv)
+        except Exception as e:
+            response = flask_app.handle_exception(e)
+        # Buffered bodies only; the streaming routes are not served here
+        body_iter, status, headers = response.get_wsgi_response(environ)
+        return start_message(status, headers), b''.join(body_iter)
+
+async def call_wsgi(environ, receive, send):
+    """Serve a request with the Flask app on the bridge pool, streaming its body chunk by chunk"""
+    loop = asyncio.get_running_loop()
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['message'] = start_message(status, headers)
+
+    def begin():
+        body = flask_app(environ, start_response)
+        return body, iter(body)
+
+    body, chunks = await loop.run_in_executor(wsgi_executor, begin)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await send(started['message'])
+        while not disconnected.done():
+            chunk = await loop.run_in_executor(wsgi_executor, next, chunks, None)
+            if chunk is None:
+                break
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        if not disconnected.done():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+        if hasattr(body, 'close'):
+            # Runs the generator's cleanup, e.g. unsubscribing a live-quote stream
+            await loop.run_in_executor(wsgi_executor, body.close)
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await web.analyzer.llm.aclose()
+            market_executor.shutdown(wait=False)
+            wsgi_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        # No websocket routes
+        return
+    environ = build_environ(scope, await read_body(receive))
+    route = match_route(environ)
+    if route is None:
+        return await call_wsgi(environ, receive, send)
+    start, body = await dispatch(environ, *route)
+    await send(start)
+    await send({'type': 'http.response.body', 'body': body})
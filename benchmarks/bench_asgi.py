@@ -0,0 +1,86 @@
+"""Concurrent-request throughput: gunicorn gthread (app:app) vs uvicorn (asgi:app).
+
+Both servers run one worker process against the fake provider and a local
+fake OpenRouter, both with latency, so every request waits on an upstream:
+chat messages and stock symbols are unique per request and always miss the
+caches. `--concurrency` clients keep requests in flight for `--duration`
+seconds. The gunicorn side is the Procfile deployment (gthread, 32 threads).
+
+Usage: python benchmarks/bench_asgi.py [--concurrency 200] [--duration 15] [--mix chat=1,stock=1]
+"""
+import argparse
+import itertools
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_openrouter import FakeOpenRouter
+from load_test import GunicornTarget, parse_mix, percentile, run
+
+class UvicornTarget(GunicornTarget):
+    name = 'uvicorn'
+
+    def command(self, workers, threads):
+        return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(self.port),
+                '--workers', str(workers), '--log-level', 'warning', '--no-access-log']
+
+def build_plan(mix, count):
+    """Requests that all miss the caches: unique chat questions and unique symbols"""
+    kinds = itertools.cycle([kind for kind, weight in mix.items() for _ in range(int(weight))])
+    plan = []
+    for n, kind in zip(range(count), kinds):
+        if kind == 'chat':
+            plan.append((kind, 'POST', '/api/chat', {'message': f'How do I diversify a small portfolio of {n} stocks?'}))
+        elif kind == 'stock':
+            plan.append((kind, 'GET', f'/api/stock/S{n:05d}', None))
+        else:
+            raise ValueError(f'unknown request kind {kind}')
+    return plan
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--mix', default='chat=1,stock=1')
+    parser.add_argument('--llm-latency', type=float, default=2.0)
+    parser.add_argument('--market-latency', type=float, default=0.5)
+    parser.add_argument('--threads', type=int, default=32, help='gunicorn threads, as in the Procfile')
+    args = parser.parse_args()
+
+    fake_llm = FakeOpenRouter(latency=args.llm_latency).start()
+    env = dict(
+        os.environ,
+        MARKET_DATA_PROVIDER='fake',
+        FAKE_PROVIDER_LATENCY=str(args.market_latency),
+        OPENROUTER_BASE_URL=fake_llm.base_url,
+        # Measure serving concurrency, not our own upstream budgets
+        YAHOO_RATE_PER_SECOND='100000',
+        YAHOO_BURST='100000',
+        LLM_POOL_SIZE=str(args.threads),
+        CACHE_L2_PATH='',
+        HISTORY_STORE_PATH=''
+    )
+    mix = parse_mix(args.mix)
+    print(f"{args.concurrency} concurrent clients for {args.duration:.0f}s; upstream latency: "
+          f"chat {args.llm_latency}s, market data {args.market_latency}s per call")
+    print(f"{'server':<10} {'kind':<6} {'req/s':>7} {'ok':>6} {'errors':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    try:
+        for target_class in (GunicornTarget, UvicornTarget):
+            target = target_class(env, 1, args.threads)
+            try:
+                results, elapsed = run(target, build_plan(mix, 10 ** 6), args.concurrency, args.duration)
+            finally:
+                target.close()
+            for kind in list(mix) + ['all']:
+                rows = [(seconds, outcome) for row_kind, seconds, outcome in results if kind in ('all', row_kind)]
+                latencies = sorted(seconds for seconds, _ in rows)
+                ok = sum(1 for _, outcome in rows if outcome == 'ok')
+                print(f"{target.name:<10} {kind:<6} {len(rows) / elapsed:7.1f} {ok:6d} {len(rows) - ok:6d}"
+                      f" {percentile(latencies, 0.5) * 1000:6.0f}ms {percentile(latencies, 0.95) * 1000:6.0f}ms"
+                      f" {percentile(latencies, 0.99) * 1000:6.0f}ms")
+    finally:
+        fake_llm.stop()
+
+if __name__ == '__main__':
+    main()
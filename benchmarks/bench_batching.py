@@ -0,0 +1,41 @@
+"""Compare per-symbol history fetches against BatchingProvider, fully offline.
+
+Usage: python benchmarks/bench_batching.py [--symbols 30] [--latency 0.2]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from providers import BatchingProvider, FakeMarketDataProvider
+
+def run(label, get_history, upstream, symbols, workers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(get_history, symbols))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed * 1000:9.1f} ms  upstream downloads: {upstream.download_calls:4d}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=30)
+    parser.add_argument('--latency', type=float, default=0.2, help='simulated upstream latency (seconds)')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--period', default='3mo')
+    args = parser.parse_args()
+
+    symbols = [f'SYM{i}' for i in range(args.symbols)]
+
+    direct = FakeMarketDataProvider(latency_seconds=args.latency)
+    run('direct', lambda s: direct.download([s], args.period)[s], direct, symbols, args.workers)
+
+    upstream = FakeMarketDataProvider(latency_seconds=args.latency)
+    batching = BatchingProvider(upstream)
+    run('batched', lambda s: batching.get_history(s, args.period), upstream, symbols, args.workers)
+    print(f"batches: {batching.stats()['batches']}, symbols per batch: {batching.stats()['symbols_per_batch']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Cold start: import time and first-request latency of a fresh worker process.
+
+Every measurement runs in a new interpreter against the fake provider with
+the shared cache tier and history store disabled, as a freshly recycled
+worker on a fresh dyno would start:
+  import         `import app`, and whether pandas/yfinance were loaded by it
+  first /        the page, which needs no market data
+  first stock    /api/stock/<symbol>: data stack import plus a cold fetch
+  prewarmed      the same request after PREWARM_ON_BOOT=1 finished warming
+
+Usage: python benchmarks/bench_cold_start.py [--runs 5] [--symbol AAPL]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PROBE = r'''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter() - started
+heavy = sorted(name for name in ('pandas', 'yfinance') if name in sys.modules)
+client = app.app.test_client()
+symbol, prewarm = sys.argv[1], sys.argv[2] == '1'
+if prewarm:
+    app.prewarmer.thread.join()
+started = time.perf_counter()
+assert client.get('/').status_code == 200
+page = time.perf_counter() - started
+started = time.perf_counter()
+assert client.get(f'/api/stock/{symbol}').status_code == 200
+stock = time.perf_counter() - started
+print(json.dumps({'import': imported, 'page': page, 'stock': stock, 'heavy': heavy}))
+'''
+
+def probe(symbol, prewarm):
+    env = dict(os.environ, MARKET_DATA_PROVIDER='fake', CACHE_L2_PATH='', HISTORY_STORE_PATH='',
+               PREWARM_ON_BOOT='1' if prewarm else '', PREWARM_SYMBOLS=symbol)
+    output = subprocess.run([sys.executable, '-c', PROBE, symbol, '1' if prewarm else '0'],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--symbol', default='AAPL')
+    args = parser.parse_args()
+
+    cold = [probe(args.symbol, False) for _ in range(args.runs)]
+    warm = [probe(args.symbol, True) for _ in range(args.runs)]
+
+    def median_ms(runs, key):
+        return statistics.median(run[key] for run in runs) * 1000
+
+    print(f"median of {args.runs} fresh processes")
+    print(f"import          {median_ms(cold, 'import'):8.1f} ms  (loaded at import: {cold[0]['heavy'] or 'no pandas/yfinance'})")
+    print(f"first /         {median_ms(cold, 'page'):8.1f} ms")
+    print(f"first stock     {median_ms(cold, 'stock'):8.1f} ms")
+    print(f"prewarmed stock {median_ms(warm, 'stock'):8.1f} ms")
+
+if __name__ == '__main__':
+    main()
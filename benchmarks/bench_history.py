@@ -0,0 +1,51 @@
+"""Memory and JSON-encode cost of cached history: to_dict('records') vs PriceHistory.
+
+Usage: python benchmarks/bench_history.py [--rows 30] [--symbols 500]
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from price_history import PriceHistory
+from providers import FakeMarketDataProvider
+
+def allocated_bytes(build, count):
+    """Bytes still allocated after building `count` cached histories"""
+    tracemalloc.start()
+    kept = [build() for _ in range(count)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current / count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=30)
+    parser.add_argument('--symbols', type=int, default=500)
+    args = parser.parse_args()
+
+    frame = FakeMarketDataProvider().download(['AAPL'], '1y')['AAPL'].tail(args.rows)
+    shapes = {
+        'records': (lambda: frame.to_dict('records'), lambda h: h),
+        'columnar': (lambda: PriceHistory.from_dataframe(frame), lambda h: h.to_columns())
+    }
+
+    print(f"{args.rows} rows per symbol")
+    print(f"{'shape':<10} {'memory/symbol':>14} {'pickle':>8} {'json bytes':>11} {'encode':>10}")
+    for name, (build, to_json) in shapes.items():
+        history = build()
+        memory = allocated_bytes(build, args.symbols)
+        pickled = len(pickle.dumps(history, protocol=pickle.HIGHEST_PROTOCOL))
+        encoded = len(json.dumps(to_json(history), default=str))
+        runs = 2000
+        seconds = timeit.timeit(lambda: json.dumps(to_json(history), default=str), number=runs) / runs
+        print(f"{name:<10} {memory:>12.0f} B {pickled:>6} B {encoded:>9} B {seconds * 1e6:>7.1f} us")
+
+if __name__ == '__main__':
+    main()
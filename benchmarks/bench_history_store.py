@@ -0,0 +1,90 @@
+"""Refreshing daily history: full re-download vs the incremental on-disk store.
+
+Each refresh cycle re-fetches history for every symbol, as a cache miss in
+get_stock_data does:
+  full         download the whole period every time (the behaviour without a store)
+  store cold   first HistoryStore.sync per symbol, which downloads the whole period
+  store warm   later syncs, which download only the bars since the last stored one
+  restart      a new HistoryStore over the same directory, as a restarted worker sees it
+and then times reading 30-day, 1-year and 5-year windows out of the store.
+
+The fake provider's cost does not depend on how many bars it returns, so
+the bars downloaded per refresh are the figure that carries over to Yahoo.
+
+Usage: python benchmarks/bench_history_store.py [--symbols 50] [--period 1y] [--cycles 5]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from history_store import HistoryStore
+from price_history import PriceHistory
+from providers import FakeMarketDataProvider
+
+def refresh(label, get_history, symbols, cycles):
+    """Run `cycles` refreshes of every symbol; get_history returns (bars downloaded, history)"""
+    downloaded = 0
+    start = time.perf_counter()
+    for _ in range(cycles):
+        for symbol in symbols:
+            bars, history = get_history(symbol)
+            downloaded += bars
+    elapsed = time.perf_counter() - start
+    calls = len(symbols) * cycles
+    print(f"{label:<11} {elapsed / calls * 1e3:8.2f} ms {downloaded / calls:10.1f} {len(history):8d}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--period', default='1y')
+    parser.add_argument('--cycles', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated upstream latency (seconds)')
+    args = parser.parse_args()
+
+    symbols = [f'SYM{i}' for i in range(args.symbols)]
+    provider = FakeMarketDataProvider(latency_seconds=args.latency)
+    root = tempfile.mkdtemp(prefix='macra_history_bench_')
+
+    def full(symbol):
+        frame = provider.download([symbol], args.period)[symbol]
+        return len(frame), PriceHistory.from_dataframe(frame)
+
+    def synced(store):
+        def sync(symbol):
+            downloaded = []
+
+            def fetch(period):
+                frame = provider.download([symbol], period)[symbol]
+                downloaded.append(len(frame))
+                return frame
+            history = store.sync(symbol, args.period, fetch)
+            return sum(downloaded), history
+        return sync
+
+    try:
+        print(f"{args.symbols} symbols, {args.period} of daily bars")
+        print(f"{'mode':<11} {'refresh':>11} {'bars down':>10} {'bars out':>8}")
+        refresh('full', full, symbols, args.cycles)
+
+        # refresh_seconds=0 so every sync checks upstream, as after the quote cache TTL
+        store = HistoryStore(root, refresh_seconds=0)
+        refresh('store cold', synced(store), symbols, 1)
+        refresh('store warm', synced(store), symbols, args.cycles)
+        refresh('restart', synced(HistoryStore(root, refresh_seconds=0)), symbols, 1)
+
+        store.sync('DEEP', '5y', lambda period: provider.download(['DEEP'], period)['DEEP'])
+        print(f"\n{'window':<8} {'read':>10}")
+        for label, rows in (('30d', 21), ('1y', 252), ('5y', 1260)):
+            per_call = timeit.timeit(lambda: store.window('DEEP', rows), number=2000) / 2000
+            print(f"{label:<8} {per_call * 1e6:7.1f} us  ({rows} bars as views on the mapped file)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
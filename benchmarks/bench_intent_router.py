@@ -0,0 +1,74 @@
+"""Check the intent router against its labelled corpus and measure throughput.
+
+The legacy substring scans (should_use_fallback + the get_fallback_response
+elif chain) are reproduced here as a baseline.
+
+Usage: python benchmarks/bench_intent_router.py [--rounds 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from intent_router import IntentRouter
+
+def legacy_route(message):
+    message_lower = message.lower()
+    fallback_triggers = [
+        'hello', 'hi', 'help', 'what can you do', 'how to start', 'beginner', 'hey',
+        'what stock should i buy', 'which stock', 'recommend stock', 'should buy',
+        'good stock to buy', 'best stock'
+    ]
+    local = any(trigger in message_lower for trigger in fallback_triggers) or len(message_lower.strip()) < 5
+    message_lower = message_lower.strip()
+    if not message_lower or any(word in message_lower for word in ['hello', 'hi', 'hey', 'start']):
+        return 'greeting', local
+    elif any(word in message_lower for word in ['buy', 'sell', 'invest', 'good stock', 'should buy', 'recommend', 'which stock']):
+        return 'recommendation', local
+    elif 'p/e' in message_lower or 'pe ratio' in message_lower or 'price to earnings' in message_lower:
+        return 'pe_ratio', local
+    elif any(word in message_lower for word in ['risk', 'safe', 'dangerous']):
+        return 'risk', local
+    elif any(word in message_lower for word in ['beginner', 'start', 'how to', 'new']):
+        return 'beginner', local
+    elif any(word in message_lower for word in ['market', 'trend', 'economy']):
+        return 'market', local
+    return 'default', local
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(os.path.join(BENCH_DIR, 'intent_corpus.json'), encoding='utf-8') as f:
+        corpus = json.load(f)
+    router = IntentRouter()
+    # label -> (route function that is timed, converter to an (intent, local) pair)
+    routers = {
+        'legacy': (legacy_route, lambda result: result),
+        'compiled': (router.route, lambda intent: (intent.name, intent.local))
+    }
+
+    failures = []
+    messages = [case['message'] for case in corpus] * args.rounds
+    for label, (route, as_pair) in routers.items():
+        misrouted = [case for case in corpus if as_pair(route(case['message'])) != (case['intent'], case['local'])]
+        start = time.perf_counter()
+        for message in messages:
+            route(message)
+        elapsed = time.perf_counter() - start
+        correct = len(corpus) - len(misrouted)
+        print(f"{label:<9} accuracy {correct}/{len(corpus)}  {len(messages) / elapsed:>10,.0f} messages/s")
+        if label == 'compiled':
+            failures = misrouted
+
+    for case in failures:
+        print(f"  MISROUTED {case['message']!r}: got {router.route(case['message'])}, want {case['intent']}/{case['local']}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
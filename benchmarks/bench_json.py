@@ -0,0 +1,87 @@
+"""Encode time and bytes on the wire: jsonify's stdlib encoder vs the fast response layer.
+
+Encodes a /api/stock quote and a /api/trending list of quotes each way:
+  jsonify      Flask's DefaultJSONProvider, what every endpoint used before
+  fast         json_response.dumps (orjson when installed)
+  cached       an EncodedPayload served from the cache: no encoding at all
+and reports the body size raw and under each Content-Encoding.
+
+Usage: python benchmarks/bench_json.py [--symbols 7] [--runs 2000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import json_response
+from indicators import latest_indicators
+from json_response import EncodedPayload, compress, supported_encodings
+from price_history import PriceHistory
+from providers import FakeMarketDataProvider
+
+class StdlibProvider(DefaultJSONProvider):
+    @staticmethod
+    def default(o):
+        if isinstance(o, PriceHistory):
+            return o.to_columns()
+        return DefaultJSONProvider.default(o)
+
+def quote(provider, symbol):
+    """A quote shaped like StockAnalyzer.get_stock_data's result"""
+    hist = provider.download([symbol], '3mo')[symbol]
+    info = provider.get_info(symbol)
+    return {
+        'symbol': symbol,
+        'name': info['longName'],
+        'current_price': info['currentPrice'],
+        'change': info['regularMarketChangePercent'],
+        'volume': info['volume'],
+        'market_cap': info['marketCap'],
+        'pe_ratio': info['trailingPE'],
+        'dividend_yield': info['dividendYield'],
+        'historical_data': PriceHistory.from_dataframe(hist.tail(30)),
+        'indicators': latest_indicators(PriceHistory.from_dataframe(hist))
+    }
+
+def per_call_us(fn, runs):
+    return timeit.timeit(fn, number=runs) / runs * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=7)
+    parser.add_argument('--runs', type=int, default=2000)
+    args = parser.parse_args()
+
+    provider = FakeMarketDataProvider()
+    symbols = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'META', 'NVDA'] + [f'SYM{i}' for i in range(args.symbols)]
+    quotes = [quote(provider, symbol) for symbol in symbols[:args.symbols]]
+    stdlib = StdlibProvider(Flask(__name__))
+    payloads = {'quote': quotes[0], 'trending': quotes}
+
+    print(f"encoder: {'orjson ' + json_response.orjson.__version__ if json_response.orjson else 'stdlib json'}; "
+          f"encodings: {', '.join(supported_encodings())}")
+    encodings = supported_encodings()
+    print(f"{'payload':<9} {'encoder':<8} {'encode':>10} {'raw':>8} " + ' '.join(f'{e:>7}' for e in encodings))
+    for name, obj in payloads.items():
+        cached = EncodedPayload.encode(obj)
+        encoders = {
+            'jsonify': lambda: stdlib.dumps(obj).encode('utf-8'),
+            'fast': lambda: json_response.dumps(obj),
+            'cached': lambda: cached.body
+        }
+        for encoder, fn in encoders.items():
+            body = fn()
+            sizes = ' '.join(f'{len(compress(body, e)):>7}' for e in encodings)
+            print(f"{name:<9} {encoder:<8} {per_call_us(fn, args.runs):>7.1f} us {len(body):>8} {sizes}")
+        for encoding in encodings:
+            body = json_response.dumps(obj)
+            print(f"{name:<9} {'+' + encoding:<8} {per_call_us(lambda: compress(body, encoding), max(1, args.runs // 10)):>7.1f} us"
+                  f"  (compressing per request; cached payloads skip this)")
+
+if __name__ == '__main__':
+    main()
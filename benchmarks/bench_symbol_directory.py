@@ -0,0 +1,69 @@
+"""Symbol directory: existence checks, name lookups and search latency.
+
+Times the bundled symbols.csv and a synthetic listing of --size tickers
+(about the size of the NASDAQ and NYSE listings together):
+  contains     `symbol in directory`, the strict-mode check before any upstream call
+  name         company name for a ticker, in place of an info round trip
+  ticker       search by ticker prefix ("MS")
+  company      search by a company name word ("micro")
+  typo         search for a mistyped ticker ("APPL"), which falls through to one-edit matches
+
+Usage: python benchmarks/bench_symbol_directory.py [--size 12000]
+"""
+import argparse
+import itertools
+import os
+import string
+import sys
+import time
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from symbol_directory import SymbolDirectory
+
+WORDS = ['Global', 'Micro', 'Energy', 'Capital', 'Health', 'Systems', 'Pacific', 'Digital', 'Motors', 'Realty',
+         'Bio', 'Financial', 'Semiconductor', 'Foods', 'Networks', 'Industries', 'Resources', 'Therapeutics']
+
+def synthetic_listing(size):
+    """`size` (symbol, name, exchange) rows with 1-5 letter tickers and three-word names"""
+    tickers = (''.join(letters) for length in range(1, 6) for letters in itertools.product(string.ascii_uppercase, repeat=length))
+    rows = []
+    for n, ticker in zip(range(size), tickers):
+        name = f'{WORDS[n % len(WORDS)]} {WORDS[(n // 7) % len(WORDS)]} {WORDS[(n // 49) % len(WORDS)]} Inc.'
+        rows.append((ticker, name, 'NASDAQ' if n % 2 else 'NYSE'))
+    return rows
+
+def report(label, directory, number):
+    cases = [
+        ('contains', lambda: 'MSFT' in directory),
+        ('name', lambda: directory.name('MSFT')),
+        ('ticker', lambda: directory.search('MS')),
+        ('company', lambda: directory.search('micro')),
+        ('typo', lambda: directory.search('APPL'))
+    ]
+    for case, fn in cases:
+        per_call = timeit.timeit(fn, number=number) / number
+        print(f"{label:<10} {case:<9} {per_call * 1e6:9.1f} us")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=12000)
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    bundled = SymbolDirectory.load(os.path.join(ROOT, 'symbols.csv'))
+    print(f"bundled: {len(bundled)} symbols loaded in {(time.perf_counter() - started) * 1000:.1f} ms")
+    listing = synthetic_listing(args.size)
+    started = time.perf_counter()
+    synthetic = SymbolDirectory(listing)
+    print(f"synthetic: {len(synthetic)} symbols indexed in {(time.perf_counter() - started) * 1000:.1f} ms\n")
+
+    print(f"{'listing':<10} {'case':<9} {'per call':>12}")
+    report('bundled', bundled, args.number)
+    report('synthetic', synthetic, args.number)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Local stand-in for the OpenRouter chat-completions API.
+
+Serves POST /chat/completions, both as plain JSON and as an SSE stream when
+the request sets "stream": true, with configurable latency, error rate and
+periodic 429 bursts. cut_after_tokens drops a stream's connection partway
+through the answer, as a provider failing mid-response would. Point the app at it with
+OPENROUTER_BASE_URL=http://127.0.0.1:<port>.
+
+Usage: python benchmarks/fake_openrouter.py [--port 8099] [--latency 0.8] [--error-rate 0.05]
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = ("Diversification spreads risk across holdings, so no single position can sink the portfolio. "
+          "Review your allocation regularly and keep a long-term horizon.")
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Hundreds of concurrent callers must not overflow the default listen backlog of 5
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections is routine, not worth a traceback
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+class FakeOpenRouter:
+    def __init__(self, port=0, latency=0.8, token_interval=0.02, error_rate=0.0,
+                 rate_limit_every=0, rate_limit_burst=0, seed=0, cut_after_tokens=0):
+        self.latency = latency
+        self.cut_after_tokens = cut_after_tokens
+        self.token_interval = token_interval
+        self.error_rate = error_rate
+        self.rate_limit_every = rate_limit_every
+        self.rate_limit_burst = rate_limit_burst
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.by_model = {}
+        self.errors = 0
+        self.rate_limited = 0
+        self.server = _Server(('127.0.0.1', port), self._handler())
+        self.port = self.server.server_address[1]
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def _outcome(self, model):
+        """'ok', 'error' or 'rate_limited' for the next call"""
+        with self.lock:
+            self.calls += 1
+            self.by_model[model] = self.by_model.get(model, 0) + 1
+            if self.rate_limit_every and self.calls % self.rate_limit_every >= self.rate_limit_every - self.rate_limit_burst:
+                self.rate_limited += 1
+                return 'rate_limited'
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self.errors += 1
+                return 'error'
+        return 'ok'
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _chunk(self, data):
+                self.wfile.write(b'%x\r\n' % len(data) + data + b'\r\n')
+                self.wfile.flush()
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                outcome = fake._outcome(request.get('model', ''))
+                time.sleep(fake.latency)
+                if outcome == 'rate_limited':
+                    return self._reply(429, {'error': {'message': 'Rate limit exceeded'}})
+                if outcome == 'error':
+                    return self._reply(502, {'error': {'message': 'Upstream provider error'}})
+                if not request.get('stream'):
+                    return self._reply(200, {'choices': [{'message': {'role': 'assistant', 'content': ANSWER}}]})
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                try:
+                    for n, word in enumerate(ANSWER.split(' ')):
+                        if fake.cut_after_tokens and n == fake.cut_after_tokens:
+                            # Hang up without [DONE] or the terminating chunk
+                            self.close_connection = True
+                            return
+                        delta = {'choices': [{'delta': {'content': word + ' '}}]}
+                        self._chunk(f'data: {json.dumps(delta)}\n\n'.encode('utf-8'))
+                        time.sleep(fake.token_interval)
+                    self._chunk(b'data: [DONE]\n\n')
+                    self.wfile.write(b'0\r\n\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='fake-openrouter', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'calls': self.calls,
+                'by_model': dict(self.by_model),
+                'errors': self.errors,
+                'rate_limited': self.rate_limited
+            }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.8)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-every', type=int, default=0)
+    parser.add_argument('--rate-limit-burst', type=int, default=0)
+    parser.add_argument('--cut-after-tokens', type=int, default=0)
+    args = parser.parse_args()
+    fake = FakeOpenRouter(args.port, args.latency, error_rate=args.error_rate,
+                          rate_limit_every=args.rate_limit_every, rate_limit_burst=args.rate_limit_burst,
+                          cut_after_tokens=args.cut_after_tokens).start()
+    print(f"Fake OpenRouter listening on {fake.base_url}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        fake.stop()
+
+if __name__ == '__main__':
+    main()
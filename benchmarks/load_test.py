@@ -0,0 +1,305 @@
+"""Offline load test: search, portfolio, trending and chat traffic against fake backends.
+
+Market data comes from the fake provider (MARKET_DATA_PROVIDER=fake) and chat
+from a local fake OpenRouter, both with configurable latency, error rate and
+429 bursts. The app is driven in-process through Flask's test client or over
+HTTP against a real gunicorn server. The report gives throughput,
+p50/p95/p99 latency per request kind and upstream call counts. The same
+--seed replays the same request sequence.
+
+Usage:
+  python benchmarks/load_test.py --mode client --requests 2000 --concurrency 16
+  python benchmarks/load_test.py --mode gunicorn --workers 1 --threads 16 --duration 30
+  python benchmarks/load_test.py --env YAHOO_RATE_PER_SECOND=50 --json report.json
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from fake_openrouter import FakeOpenRouter
+
+POPULAR = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'META', 'NVDA']
+CHAT_MESSAGES = [
+    ('hello', None),
+    ('help', None),
+    ('What does P/E ratio mean?', None),
+    ('Should I buy this stock?', 'Currently analyzing AAPL (AAPL Holdings Inc): Price $185.20, Change 1.10%'),
+    ('How do I diversify a small portfolio?', None),
+    ('how do i diversify a small portfolio', None),
+    ('What happens to growth stocks when interest rates rise?', None),
+    ('Is it a good time to invest in index funds?', None),
+    ('Explain dollar cost averaging with an example', None)
+]
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(','):
+        kind, _, weight = part.partition('=')
+        mix[kind.strip()] = float(weight)
+    return mix
+
+def build_plan(count, mix, universe_size, seed):
+    """Deterministic list of (kind, method, path, json body)"""
+    rng = random.Random(seed)
+    universe = POPULAR + [f'SYM{i:04d}' for i in range(max(0, universe_size - len(POPULAR)))]
+    # Zipf-like popularity: a few symbols take most of the searches
+    weights = [1.0 / (rank + 1) ** 1.1 for rank in range(len(universe))]
+    kinds, kind_weights = zip(*mix.items())
+
+    plan = []
+    for _ in range(count):
+        kind = rng.choices(kinds, kind_weights)[0]
+        if kind == 'search':
+            symbol = rng.choices(universe, weights)[0]
+            plan.append((kind, 'GET', f'/api/symbol/{symbol}?fields=-quote.historical_data', None))
+        elif kind == 'portfolio':
+            symbols = rng.choices(universe, weights, k=rng.randint(3, 10))
+            plan.append((kind, 'POST', '/api/portfolio', {'symbols': symbols}))
+        elif kind == 'trending':
+            plan.append((kind, 'GET', '/api/trending', None))
+        elif kind == 'chat':
+            message, context = rng.choice(CHAT_MESSAGES)
+            plan.append((kind, 'POST', '/api/chat', {'message': message, 'stock_context': context}))
+        else:
+            raise ValueError(f'unknown request kind {kind}')
+    return plan
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+def app_error(body):
+    """True when a 200 response carries an {"error": ...} payload"""
+    return body[:1] == b'{' and b'"error"' in body[:200]
+
+class ClientTarget:
+    """In-process app through Flask's test client"""
+
+    def __init__(self):
+        import app as app_module
+        self.app_module = app_module
+        self.local = threading.local()
+
+    def request(self, method, path, body):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app_module.app.test_client()
+        response = client.open(path, method=method, json=body)
+        return response.status_code, response.get_data()
+
+    def stats(self):
+        return self.app_module.app.test_client().get('/api/stats').get_json()
+
+    def close(self):
+        pass
+
+class GunicornTarget:
+    """A real gunicorn server in a subprocess, driven over HTTP"""
+
+    name = 'gunicorn'
+
+    def __init__(self, env, workers, threads):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        self.base = f'http://127.0.0.1:{self.port}'
+        self.process = subprocess.Popen(
+            self.command(workers, threads),
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.local = threading.local()
+        self._wait_ready()
+
+    def command(self, workers, threads):
+        return [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{self.port}',
+                '--workers', str(workers), '--threads', str(threads), '--worker-class', 'gthread',
+                '--log-level', 'warning']
+
+    def _wait_ready(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'{self.name} exited during startup')
+            try:
+                requests.get(self.base + '/api/stats', timeout=1)
+                return
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise RuntimeError(f'{self.name} did not become ready')
+
+    def request(self, method, path, body):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        response = session.request(method, self.base + path, json=body, timeout=60)
+        return response.status_code, response.content
+
+    def stats(self):
+        return requests.get(self.base + '/api/stats', timeout=10).json()
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+def run(target, plan, concurrency, duration):
+    """Replay plan with `concurrency` workers; returns ([(kind, seconds, outcome)], elapsed)"""
+    results = []
+    lock = threading.Lock()
+    queue = iter(plan)
+    stop_at = time.monotonic() + duration if duration else None
+
+    def worker():
+        while stop_at is None or time.monotonic() < stop_at:
+            with lock:
+                item = next(queue, None)
+            if item is None:
+                return
+            kind, method, path, body = item
+            started = time.perf_counter()
+            try:
+                status, data = target.request(method, path, body)
+                outcome = 'http_error' if status >= 400 else 'app_error' if app_error(data) else 'ok'
+            except Exception:
+                outcome = 'http_error'
+            elapsed = time.perf_counter() - started
+            with lock:
+                results.append((kind, elapsed, outcome))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return results, time.perf_counter() - started
+
+def summarize(results, elapsed):
+    by_kind = {}
+    for kind, seconds, outcome in results:
+        by_kind.setdefault(kind, []).append((seconds, outcome))
+    by_kind['all'] = [(seconds, outcome) for _, seconds, outcome in results]
+
+    summary = {'requests': len(results), 'elapsed_seconds': round(elapsed, 3),
+               'throughput_rps': round(len(results) / elapsed, 1) if elapsed else 0.0, 'kinds': {}}
+    for kind, rows in by_kind.items():
+        latencies = sorted(seconds for seconds, _ in rows)
+        outcomes = [outcome for _, outcome in rows]
+        summary['kinds'][kind] = {
+            'count': len(rows),
+            'ok': outcomes.count('ok'),
+            'app_error': outcomes.count('app_error'),
+            'http_error': outcomes.count('http_error'),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2)
+        }
+    return summary
+
+def upstream_counts(before, after, llm_before, llm_after):
+    def provider(stats):
+        return stats.get('provider', {}).get('upstream', {})
+    counts = {f'market_{key}': value - provider(before).get(key, 0) for key, value in provider(after).items()}
+    counts.update({f'llm_{key}': llm_after[key] - llm_before[key] for key in ('calls', 'errors', 'rate_limited')})
+    cache = after.get('cache', {})
+    counts['cache_hit_ratio'] = cache.get('hit_ratio')
+    counts['chat_cache'] = {key: after.get('chat_cache', {}).get(key) for key in ('exact_hits', 'near_hits', 'misses')}
+    return counts
+
+def print_report(report):
+    print(f"mode={report['mode']} concurrency={report['concurrency']} requests={report['requests']} "
+          f"elapsed={report['elapsed_seconds']}s throughput={report['throughput_rps']} req/s")
+    print(f"{'kind':<10} {'count':>6} {'ok':>6} {'app_err':>8} {'http_err':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for kind, row in report['kinds'].items():
+        print(f"{kind:<10} {row['count']:>6} {row['ok']:>6} {row['app_error']:>8} {row['http_error']:>8} "
+              f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}")
+    print('upstream:', json.dumps(report['upstream']))
+    if report.get('note'):
+        print('note:', report['note'])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=['client', 'gunicorn'], default='client')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--duration', type=float, default=0, help='stop after this many seconds (0: run the whole plan)')
+    parser.add_argument('--warmup', type=int, default=0, help='unmeasured requests replayed first')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--mix', default='search=60,portfolio=10,trending=20,chat=10')
+    parser.add_argument('--symbols', type=int, default=200, help='size of the symbol universe')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--provider-latency', type=float, default=0.05)
+    parser.add_argument('--provider-error-rate', type=float, default=0.0)
+    parser.add_argument('--provider-429-every', type=int, default=0)
+    parser.add_argument('--provider-429-burst', type=int, default=0)
+    parser.add_argument('--llm-latency', type=float, default=0.3)
+    parser.add_argument('--llm-error-rate', type=float, default=0.0)
+    parser.add_argument('--llm-429-every', type=int, default=0)
+    parser.add_argument('--llm-429-burst', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=16, help='gunicorn threads per worker')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE', help='extra app environment')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    llm = FakeOpenRouter(latency=args.llm_latency, error_rate=args.llm_error_rate,
+                         rate_limit_every=args.llm_429_every, rate_limit_burst=args.llm_429_burst,
+                         seed=args.seed).start()
+    cache_dir = tempfile.mkdtemp(prefix='macra-load-')
+    env = dict(os.environ)
+    env.update({
+        'MARKET_DATA_PROVIDER': 'fake',
+        'FAKE_PROVIDER_LATENCY': str(args.provider_latency),
+        'FAKE_PROVIDER_ERROR_RATE': str(args.provider_error_rate),
+        'FAKE_PROVIDER_429_EVERY': str(args.provider_429_every),
+        'FAKE_PROVIDER_429_BURST': str(args.provider_429_burst),
+        'FAKE_PROVIDER_SEED': str(args.seed),
+        'OPENROUTER_BASE_URL': llm.base_url,
+        # A fresh shared cache per run keeps runs comparable
+        'CACHE_L2_PATH': os.path.join(cache_dir, 'cache.sqlite3')
+    })
+    env.update(item.split('=', 1) for item in args.env)
+
+    if args.mode == 'client':
+        os.environ.update(env)
+        target = ClientTarget()
+    else:
+        target = GunicornTarget(env, args.workers, args.threads)
+
+    try:
+        plan = build_plan(args.warmup + args.requests, parse_mix(args.mix), args.symbols, args.seed)
+        if args.warmup:
+            run(target, plan[:args.warmup], args.concurrency, 0)
+        stats_before, llm_before = target.stats(), llm.stats()
+        results, elapsed = run(target, plan[args.warmup:], args.concurrency, args.duration)
+        stats_after, llm_after = target.stats(), llm.stats()
+    finally:
+        target.close()
+        llm.stop()
+
+    report = {'mode': args.mode, 'concurrency': args.concurrency, 'seed': args.seed}
+    report.update(summarize(results, elapsed))
+    report['upstream'] = upstream_counts(stats_before, stats_after, llm_before, llm_after)
+    if args.mode == 'gunicorn' and args.workers > 1:
+        report['note'] = 'market data and cache counters come from whichever worker served /api/stats'
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Circuit breaker for upstream services.
+
+closed: calls flow and outcomes are recorded in a rolling time window. Once
+the window holds at least `min_calls` outcomes and the failure rate reaches
+`failure_threshold`, the breaker opens.
+open: calls are refused immediately for `cooldown_seconds`.
+half_open: a single probe call is let through; success closes the breaker,
+failure opens it again.
+"""
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=0.5, min_calls=5, window_seconds=60.0, cooldown_seconds=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.lock = threading.Lock()
+        self.outcomes = deque()  # (monotonic time, succeeded)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.open_reason = None
+        self.probe_in_flight = False
+        self.probe_started = 0.0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def _prune(self, now):
+        while self.outcomes and now - self.outcomes[0][0] > self.window_seconds:
+            self.outcomes.popleft()
+
+    def _open(self, now, reason):
+        self.state = OPEN
+        self.opened_at = now
+        self.open_reason = reason
+        self.probe_in_flight = False
+        self.times_opened += 1
+
+    def allow(self):
+        """True if a call may go upstream now; False means fail fast"""
+        with self.lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= self.cooldown_seconds:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return True
+            # A probe that never reported back must not wedge the breaker half-open
+            if self.state == HALF_OPEN and (not self.probe_in_flight or now - self.probe_started >= self.cooldown_seconds):
+                self.probe_in_flight = True
+                self.probe_started = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self.outcomes.clear()
+                self.open_reason = None
+                self.probe_in_flight = False
+            self.outcomes.append((now, True))
+            self._prune(now)
+
+    def record_failure(self, reason=None):
+        with self.lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                self._open(now, reason or 'probe failed')
+                return
+            self.outcomes.append((now, False))
+            self._prune(now)
+            failures = sum(1 for _, succeeded in self.outcomes if not succeeded)
+            if (self.state == CLOSED and len(self.outcomes) >= self.min_calls
+                    and failures / len(self.outcomes) >= self.failure_threshold):
+                self._open(now, reason or f'{failures}/{len(self.outcomes)} calls failed')
+
+    def release(self):
+        """Hand back the probe slot allow() gave a call that then never went upstream"""
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.probe_in_flight = False
+
+    def trip(self, reason):
+        """Open immediately, e.g. on an auth failure no retry will fix"""
+        with self.lock:
+            self._open(time.monotonic(), reason)
+
+    def retry_after(self):
+        """Seconds until an open breaker lets a probe through"""
+        with self.lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.cooldown_seconds - (time.monotonic() - self.opened_at))
+
+    def stats(self):
+        with self.lock:
+            now = time.monotonic()
+            self._prune(now)
+            state = self.state
+            if state == OPEN and now - self.opened_at >= self.cooldown_seconds:
+                state = HALF_OPEN
+            failures = sum(1 for _, succeeded in self.outcomes if not succeeded)
+            return {
+                'name': self.name,
+                'state': state,
+                'reason': self.open_reason,
+                'window_calls': len(self.outcomes),
+                'window_failures': failures,
+                'retry_in_seconds': round(max(0.0, self.cooldown_seconds - (now - self.opened_at)), 1) if state == OPEN else 0.0,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected
+            }
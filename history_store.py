@@ -0,0 +1,200 @@
+"""Persistent per-symbol daily OHLCV store.
+
+Each symbol's bars live in one .npy file holding a (6, N) float64 array, one
+row per column (t, open, high, low, close, volume), oldest bar first. Row 0
+stores the int64 epoch seconds bit for bit, so every column can be read back
+as a view. Files are memory-mapped, so a window of any length is a slice of
+the page cache rather than a copy, and every worker on the host shares the
+same pages.
+
+A refresh downloads only the bars after the last stored one, through the
+smallest period that covers the gap. A small JSON sidecar records how deep
+the stored history is and when it was last checked. Writes go to a fresh
+temp file that is then renamed over the old one, so readers (including other
+processes) always see a complete file. The directory must be private to this
+user, so nobody else can plant bars for the indicators to read.
+"""
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from price_history import PriceHistory
+from private_files import check_owned, private_directory
+from providers import PERIOD_TRADING_DAYS
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('t', 'open', 'high', 'low', 'close', 'volume')
+
+# Stored bars the fresh download overlaps must agree this closely, otherwise
+# Yahoo re-adjusted the series (split or dividend) and it is replaced whole
+MAX_ADJUSTMENT_DRIFT = 1e-3
+
+def _file_stem(symbol):
+    """Filesystem-safe name for a symbol (^GSPC, BRK-B, ...)"""
+    return re.sub(r'[^A-Za-z0-9.-]', lambda m: f'%{ord(m.group()):02X}', symbol.upper())
+
+def _period_for_rows(rows):
+    """Smallest period string yielding at least `rows` bars, or None"""
+    for period, period_rows in sorted(PERIOD_TRADING_DAYS.items(), key=lambda item: item[1]):
+        if period_rows >= rows:
+            return period
+    return None
+
+class HistoryStore:
+    def __init__(self, root, max_rows=PERIOD_TRADING_DAYS['5y'], refresh_seconds=900):
+        self.root = root
+        self.max_rows = max_rows
+        self.refresh_seconds = refresh_seconds
+        private_directory(root)
+        self.lock = threading.Lock()
+        self.fresh_reads = 0
+        self.incremental_fetches = 0
+        self.full_fetches = 0
+        self.readjusted = 0
+        self.bars_fetched = 0
+        self.write_failures = 0
+
+    def _paths(self, symbol):
+        stem = os.path.join(self.root, _file_stem(symbol))
+        return stem + '.npy', stem + '.json'
+
+    def _load(self, symbol):
+        """Return (memory-mapped (6, N) array, meta dict), or (None, None) if nothing is stored"""
+        data_path, meta_path = self._paths(symbol)
+        try:
+            check_owned(data_path, meta_path)
+            with open(meta_path) as f:
+                meta = json.load(f)
+            data = np.load(data_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None, None
+        if data.ndim != 2 or data.shape[0] != len(COLUMNS) or data.shape[1] == 0:
+            return None, None
+        return data, meta
+
+    @staticmethod
+    def _view(data, rows=None):
+        """PriceHistory over the last `rows` stored bars; the arrays are views on the mapping"""
+        start = 0 if rows is None else max(0, data.shape[1] - rows)
+        columns = [np.asarray(data[i, start:]) for i in range(len(COLUMNS))]
+        columns[0] = columns[0].view(np.int64)
+        return PriceHistory(*columns)
+
+    def window(self, symbol, rows):
+        """The last `rows` stored bars for symbol without touching upstream, or None"""
+        data, _ = self._load(symbol)
+        return self._view(data, rows) if data is not None else None
+
+    def _save(self, symbol, history, depth, checked):
+        data_path, meta_path = self._paths(symbol)
+        history = history.tail(self.max_rows)
+        data = np.empty((len(COLUMNS), len(history)))
+        data[0] = history.t.view(np.float64)
+        for i, name in enumerate(COLUMNS[1:], start=1):
+            data[i] = getattr(history, name)
+        try:
+            self._replace(data_path, lambda f: np.save(f, data))
+            meta = json.dumps({'depth': min(depth, self.max_rows), 'checked': checked}).encode('utf-8')
+            self._replace(meta_path, lambda f: f.write(meta))
+        except OSError as e:
+            with self.lock:
+                self.write_failures += 1
+            logger.warning(f"History store write failed for {symbol}: {str(e)}")
+
+    def _replace(self, path, write):
+        """Write through a new, exclusively created temp file, then rename it over path"""
+        fd, temp_path = tempfile.mkstemp(dir=self.root, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    @staticmethod
+    def _merge(stored, fresh):
+        """Stored bars older than the fresh ones followed by the fresh ones, or None if they disagree"""
+        if len(fresh) == 0 or fresh.t[0] > stored.t[-1]:
+            return None
+        # The newest stored bar may have been taken mid-session, so it is not compared
+        _, stored_index, fresh_index = np.intersect1d(stored.t[:-1], fresh.t, assume_unique=True, return_indices=True)
+        if len(stored_index):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                drift = np.abs(fresh.close[fresh_index] / stored.close[stored_index] - 1)
+            if np.nanmax(drift, initial=0.0) > MAX_ADJUSTMENT_DRIFT:
+                return None
+        keep = int(np.searchsorted(stored.t, fresh.t[0]))
+        return PriceHistory(*(np.concatenate([getattr(stored, name)[:keep], getattr(fresh, name)])
+                              for name in PriceHistory.__slots__))
+
+    def sync(self, symbol, period, fetch):
+        """Return the last `period` of daily bars for symbol, downloading only what is missing.
+
+        `fetch(period)` returns a yfinance-style OHLCV DataFrame for a period
+        string. Stored bars checked within `refresh_seconds` are returned
+        without calling it; otherwise just the bars since the last stored one
+        are fetched, and the whole period only on first use, when more depth is
+        asked for, or when Yahoo has re-adjusted the series.
+        """
+        rows = PERIOD_TRADING_DAYS.get(period, 252)
+        data, meta = self._load(symbol)
+        now = time.time()
+        if data is not None and meta.get('depth', 0) >= rows:
+            if now - meta.get('checked', 0) < self.refresh_seconds:
+                with self.lock:
+                    self.fresh_reads += 1
+                return self._view(data, rows)
+
+            stored = self._view(data)
+            # Calendar days since the last bar bound the trading days missing
+            gap_period = _period_for_rows(int((now - stored.t[-1]) // 86400) + 2)
+            if gap_period is not None and PERIOD_TRADING_DAYS[gap_period] < rows:
+                fresh = PriceHistory.from_dataframe(fetch(gap_period))
+                merged = self._merge(stored, fresh)
+                with self.lock:
+                    self.bars_fetched += len(fresh)
+                    if merged is None:
+                        self.readjusted += 1
+                    else:
+                        self.incremental_fetches += 1
+                if merged is not None:
+                    self._save(symbol, merged, meta['depth'], now)
+                    return merged.tail(rows)
+
+        fresh = PriceHistory.from_dataframe(fetch(period))
+        with self.lock:
+            self.full_fetches += 1
+            self.bars_fetched += len(fresh)
+        if len(fresh) == 0:
+            # Unknown symbol, or Yahoo returned nothing this time: keep what we have
+            return self._view(data, rows) if data is not None else fresh
+        depth = rows
+        if data is not None:
+            merged = self._merge(self._view(data), fresh)
+            if merged is not None:
+                fresh, depth = merged, max(rows, meta.get('depth', 0))
+        self._save(symbol, fresh, depth, now)
+        return fresh.tail(rows)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'path': self.root,
+                'fresh_reads': self.fresh_reads,
+                'incremental_fetches': self.incremental_fetches,
+                'full_fetches': self.full_fetches,
+                'readjusted': self.readjusted,
+                'bars_fetched': self.bars_fetched,
+                'write_failures': self.write_failures
+            }
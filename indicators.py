@@ -0,0 +1,124 @@
+"""Vectorized technical indicators.
+
+Every function takes arrays shaped (..., T), oldest bar first, so a single
+call can compute an indicator for one symbol (T,) or for hundreds of
+symbols at once (N, T). Leading bars without enough history are NaN.
+Recursive smoothers (EMA, Wilder) loop over time only; each step is one
+vector operation across all symbols.
+"""
+import numpy as np
+
+TRADING_DAYS_PER_YEAR = 252
+
+def _as_2d(values):
+    values = np.asarray(values, dtype=np.float64)
+    return values.reshape(1, -1) if values.ndim == 1 else values
+
+def _restore_shape(result, like):
+    return result.reshape(-1) if np.ndim(like) == 1 else result
+
+def sma(values, window):
+    """Simple moving average over the last `window` bars"""
+    data = _as_2d(values)
+    out = np.full(data.shape, np.nan)
+    if data.shape[-1] >= window:
+        csum = np.cumsum(data, axis=-1)
+        csum = np.concatenate([np.zeros((data.shape[0], 1)), csum], axis=-1)
+        out[:, window - 1:] = (csum[:, window:] - csum[:, :-window]) / window
+    return _restore_shape(out, values)
+
+def ema(values, span=None, alpha=None):
+    """Exponential moving average seeded with the first bar (pandas ewm(adjust=False))"""
+    data = _as_2d(values)
+    alpha = alpha if alpha is not None else 2.0 / (span + 1)
+    out = np.empty(data.shape)
+    if data.shape[-1] == 0:
+        return _restore_shape(out, values)
+    out[:, 0] = data[:, 0]
+    for i in range(1, data.shape[-1]):
+        out[:, i] = alpha * data[:, i] + (1 - alpha) * out[:, i - 1]
+    return _restore_shape(out, values)
+
+def rsi(close, window=14):
+    """Relative Strength Index with Wilder smoothing"""
+    data = _as_2d(close)
+    delta = np.diff(data, axis=-1)
+    gains = ema(np.clip(delta, 0, None), alpha=1.0 / window)
+    losses = ema(np.clip(-delta, 0, None), alpha=1.0 / window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = 100 - 100 / (1 + gains / losses)
+    value = np.where(losses == 0, 100.0, value)
+    out = np.full(data.shape, np.nan)
+    out[:, window:] = value[:, window - 1:]
+    return _restore_shape(out, close)
+
+def macd(close, fast=12, slow=26, signal=9):
+    """Return (macd_line, signal_line, histogram)"""
+    data = _as_2d(close)
+    line = ema(data, span=fast) - ema(data, span=slow)
+    signal_line = ema(line, span=signal)
+    histogram = line - signal_line
+    # EMAs need about `slow` bars before they mean anything
+    for series in (line, signal_line, histogram):
+        series[:, :slow - 1] = np.nan
+    signal_line[:, :slow + signal - 2] = np.nan
+    histogram[:, :slow + signal - 2] = np.nan
+    return tuple(_restore_shape(series, close) for series in (line, signal_line, histogram))
+
+def atr(high, low, close, window=14):
+    """Average True Range with Wilder smoothing"""
+    high, low, close_2d = _as_2d(high), _as_2d(low), _as_2d(close)
+    prev_close = np.concatenate([close_2d[:, :1], close_2d[:, :-1]], axis=-1)
+    true_range = np.maximum.reduce([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+    out = ema(true_range, alpha=1.0 / window)
+    out[:, :window - 1] = np.nan
+    return _restore_shape(out, close)
+
+def realized_volatility(close, window=20, periods_per_year=TRADING_DAYS_PER_YEAR):
+    """Annualized standard deviation of daily log returns over `window` bars"""
+    data = _as_2d(close)
+    returns = np.diff(np.log(data), axis=-1)
+    mean = sma(returns, window)
+    mean_sq = sma(returns ** 2, window)
+    variance = np.clip(mean_sq - mean ** 2, 0, None) * window / max(window - 1, 1)
+    out = np.full(data.shape, np.nan)
+    out[:, 1:] = np.sqrt(variance * periods_per_year)
+    return _restore_shape(out, close)
+
+def volume_zscore(volume, window=20):
+    """How many standard deviations each bar's volume is from its trailing mean"""
+    data = _as_2d(volume)
+    mean = sma(data, window)
+    std = np.sqrt(np.clip(sma(data ** 2, window) - mean ** 2, 0, None))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = np.where(std > 0, (data - mean) / std, 0.0)
+    out[np.isnan(mean)] = np.nan
+    return _restore_shape(out, volume)
+
+def compute_indicators(close, high, low, volume):
+    """Full indicator series for (N, T) or (T,) inputs, in one pass per indicator"""
+    macd_line, macd_signal, macd_histogram = macd(close)
+    return {
+        'sma_20': sma(close, 20),
+        'sma_50': sma(close, 50),
+        'ema_12': ema(close, span=12),
+        'ema_26': ema(close, span=26),
+        'rsi_14': rsi(close, 14),
+        'macd': macd_line,
+        'macd_signal': macd_signal,
+        'macd_histogram': macd_histogram,
+        'atr_14': atr(high, low, close, 14),
+        'volatility_20d': realized_volatility(close, 20),
+        'volume_zscore': volume_zscore(volume, 20)
+    }
+
+def latest_indicators(history):
+    """Most recent value of every indicator for one PriceHistory; None where history is too short"""
+    if len(history) < 2:
+        return {}
+    series = compute_indicators(history.close, history.high, history.low, history.volume)
+    latest = {}
+    for name, values in series.items():
+        value = float(values[-1])
+        latest[name] = None if np.isnan(value) else round(value, 4)
+    return latest
@@ -0,0 +1,242 @@
+"""Intent routing for chat messages.
+
+A single compiled, word-boundary-aware regex scans each message once and
+returns the best intent with a confidence score. This replaces repeated
+substring scans where "hi" matched "which" and "this". Canned answers are
+pre-rendered; only the stock-context answer is formatted per call.
+"""
+import re
+from collections import namedtuple
+
+Intent = namedtuple('Intent', ['name', 'confidence', 'local'])
+
+DEFAULT_INTENT = Intent('default', 0.0, False)
+
+# (intent, phrase, answer locally without calling the AI API). Phrases are
+# regex fragments matched on word boundaries against the lower-cased message.
+INTENT_PHRASES = [
+    ('greeting', r'hello', True),
+    ('greeting', r'hi', True),
+    ('greeting', r'hiya', True),
+    ('greeting', r'hey', True),
+    ('greeting', r'greetings', True),
+    ('greeting', r'good (?:morning|afternoon|evening)', True),
+    ('help', r'help', True),
+    ('help', r'what can you do', True),
+    ('recommendation', r'what stocks? should i buy', True),
+    ('recommendation', r'which stocks?', True),
+    ('recommendation', r'recommend(?:ed)? stocks?', True),
+    ('recommendation', r'should i buy', True),
+    ('recommendation', r'should buy', True),
+    ('recommendation', r'good stocks? to buy', True),
+    ('recommendation', r'best stocks?', True),
+    ('recommendation', r'good stocks?', False),
+    ('recommendation', r'recommend(?:ation|ations)?', False),
+    ('recommendation', r'buy(?:ing)?', False),
+    ('recommendation', r'sell(?:ing)?', False),
+    ('recommendation', r'invest', False),
+    ('pe_ratio', r'p/e(?: ratio)?', False),
+    ('pe_ratio', r'pe ratio', False),
+    ('pe_ratio', r'price[ -]to[ -]earnings', False),
+    ('risk', r'risk(?:s|y)?', False),
+    ('risk', r'safe(?:ty)?', False),
+    ('risk', r'dangerous', False),
+    ('beginner', r'beginners?', True),
+    ('beginner', r'how (?:to|do i) start(?: investing)?', True),
+    ('beginner', r'get(?:ting)? started', True),
+    ('beginner', r'start(?:ing)? investing', True),
+    ('beginner', r'how to', False),
+    ('beginner', r'new to', False),
+    ('market', r'markets?', False),
+    ('market', r'trends?', False),
+    ('market', r'economy', False)
+]
+
+# When several intents match, the earlier one wins (same order as the old elif chain)
+INTENT_PRIORITY = ['greeting', 'recommendation', 'pe_ratio', 'risk', 'beginner', 'market', 'help']
+
+# Local intents that must make up this much of the message to skip the AI API,
+# so "hi, can you explain bond duration?" still reaches the model
+LOCAL_MIN_CONFIDENCE = {'greeting': 0.75, 'help': 0.6}
+
+def literal_length(phrase):
+    """Length of a phrase pattern with its optional parts dropped"""
+    return len(re.sub(r'.\?', '', re.sub(r'\(\?:[^()]*\)\?', '', phrase)))
+
+class IntentRouter:
+    def __init__(self, phrases=INTENT_PHRASES, priority=INTENT_PRIORITY):
+        # Longest phrases first so "should i buy" wins over "buy" at the same position
+        ordered = sorted(phrases, key=lambda item: literal_length(item[1]), reverse=True)
+        self.groups = {}
+        branches = {}
+        for index, (intent, phrase, local) in enumerate(ordered):
+            group = f'p{index}'
+            self.groups[group] = (intent, local)
+            branches.setdefault(phrase[0], []).append(f'(?P<{group}>{phrase[1:]})')
+        # Dispatch on the first character so each word start tries only a few branches
+        alternation = '|'.join(
+            re.escape(first) + '(?:' + '|'.join(rest) + ')' for first, rest in branches.items()
+        )
+        self.pattern = re.compile(r'(?<![a-z0-9])(?:' + alternation + r')(?![a-z0-9])')
+        self.rank = {intent: position for position, intent in enumerate(priority)}
+        # Group name -> (intent, local, priority rank), so the scan loop does one lookup per match
+        self.matches = {group: (intent, local, self.rank.get(intent, len(self.rank)))
+                        for group, (intent, local) in self.groups.items()}
+
+    def route(self, message):
+        """Return the best Intent for a message, or Intent('default', ...) if nothing matched"""
+        text = (message or '').lower().strip()
+        if len(text) < 5 and not self.pattern.search(text):
+            # Empty or near-empty messages get the local default answer
+            return Intent('greeting' if not text else 'default', 1.0, True)
+
+        # Keep only the highest-priority intent seen so far, adding up its matched words.
+        # Start one past the lowest rank so intents missing from the priority list still match.
+        best, best_rank, words, any_local = None, len(self.rank) + 1, 0, False
+        matches = self.matches
+        for match in self.pattern.finditer(text):
+            intent, local, rank = matches[match.lastgroup]
+            if rank < best_rank:
+                best, best_rank, words, any_local = intent, rank, match.group().count(' ') + 1, local
+            elif rank == best_rank:
+                words += match.group().count(' ') + 1
+                any_local = any_local or local
+
+        if best is None:
+            return DEFAULT_INTENT
+        confidence = round(min(1.0, 0.5 + 0.5 * words / len(text.split())), 3)
+        if any_local and confidence < LOCAL_MIN_CONFIDENCE.get(best, 0.0):
+            any_local = False
+        return Intent(best, confidence, any_local)
+
+# Canned answers, rendered once at import
+RESPONSES = {
+    'greeting': """🤖 Hi! I'm your MACRA AI assistant, here to help you learn about stocks and investing! 
+
+💡 **I can help you with:**
+• Understanding stock analysis and metrics
+• Explaining investment concepts for beginners
+• Risk assessment and management strategies
+• Market trends and economic indicators
+
+📈 **Popular Questions:**
+• "How do I start investing?"
+• "What does P/E ratio mean?"
+• "Is [STOCK] a good buy?"
+• "How risky is this investment?"
+
+What would you like to learn about?""",
+
+    'recommendation': """� **Stock Investment Guidance:**
+
+I can't recommend specific stocks to buy, but I can teach you how to choose wisely! 
+
+🔍 **Research Process:**
+• **Step 1**: Use our analyzer above to check AMZN, AAPL, TSLA, GOOGL, or MSFT
+• **Step 2**: Look for companies with strong financials and reasonable P/E ratios
+• **Step 3**: Consider your risk tolerance and investment timeline
+• **Step 4**: Diversify - don't put all money in one stock!
+
+📊 **Key Metrics to Check:**
+• P/E Ratio (15-25 is often reasonable)
+• Revenue growth over time
+• Market cap and trading volume
+• Industry position and competition
+
+⚠️ **Important**: This is educational guidance, not financial advice. Start with small amounts, learn as you go, and consider consulting a financial advisor!
+
+Try analyzing a stock above to see these principles in action! 📈""",
+
+    'pe_ratio': """📊 **P/E Ratio Explained Simply:**
+
+The Price-to-Earnings ratio compares a stock's price to its annual earnings per share.
+
+• **Low P/E (under 15)**: Potentially undervalued, but verify why
+• **Medium P/E (15-25)**: Generally fair valuation  
+• **High P/E (over 25)**: May be overvalued or high-growth company
+
+💡 **Example**: If a stock costs $100 and earns $5 per share annually, P/E = 20
+
+⚠️ **Tip**: Compare P/E ratios within the same industry for better context!""",
+
+    'risk': """🛡️ **Stock Investment Risks:**
+
+• **Market Risk**: Prices fluctuate with overall market conditions
+• **Company Risk**: Business-specific challenges or failures
+• **Sector Risk**: Industry-wide problems (tech crash, oil prices)
+• **Inflation Risk**: Purchasing power erosion over time
+
+🎯 **Risk Management Tips**:
+• Diversify across different stocks and sectors
+• Only invest money you can afford to lose
+• Start small and learn gradually
+• Consider your time horizon
+
+📊 Our AI analysis includes risk assessment for each stock!""",
+
+    'beginner': """🌟 **Getting Started with Stock Investing:**
+
+**Step 1**: Learn the basics (you're doing great! 📚)
+**Step 2**: Open a brokerage account with reputable firms
+**Step 3**: Start with index funds or blue-chip stocks
+**Step 4**: Invest regularly, not just once
+
+💡 **Beginner-Friendly Stocks**: Look for established companies like:
+• Apple (AAPL) • Microsoft (MSFT) • Google (GOOGL)
+
+⚠️ **Golden Rule**: Never invest more than you can afford to lose!
+
+🚀 Try analyzing these stocks with our tool above!""",
+
+    'market': """📈 **Understanding Market Trends:**
+
+• **Bull Market**: Prices rising, investor confidence high 🐂
+• **Bear Market**: Prices falling 20%+ from highs 🐻  
+• **Correction**: 10-20% decline, often healthy
+
+🔍 **Key Indicators to Watch**:
+• Economic data (GDP, employment, inflation)
+• Company earnings reports
+• Federal Reserve policy changes
+• Global events and sentiment
+
+💡 **Pro Tip**: Focus on long-term investing rather than trying to time the market!""",
+
+    'general': """🤖 Hi! I'm your MACRA AI assistant, here to help you learn about stocks and investing! 
+
+💡 **I can help you with:**
+• Understanding stock analysis and metrics
+• Explaining investment concepts for beginners  
+• Risk assessment and management strategies
+• Market trends and economic indicators
+
+📈 **Popular Questions:**
+• "How do I start investing?"
+• "What does P/E ratio mean?"
+• "Is [STOCK] a good buy?"
+• "How risky is this investment?"
+
+What would you like to learn about? 🚀"""
+}
+
+# Formatted with the caller's stock context when there is one
+CONTEXT_RESPONSE = """🤖 I'm here to help with stock and investing questions! 
+
+📊 **Current Analysis Context**: {stock_context}
+
+💭 **Ask me about:**
+• How to interpret the analysis results
+• What the risk level means
+• Investment strategies for beginners
+• How to use P/E ratios and other metrics
+
+🚀 What specific aspect of investing would you like to learn about?"""
+
+def render_response(intent, stock_context=None):
+    """Pre-rendered answer for an intent; unmatched messages get the context-aware default"""
+    response = RESPONSES.get(intent.name)
+    if response is not None:
+        return response
+    if stock_context:
+        return CONTEXT_RESPONSE.format(stock_context=stock_context)
+    return RESPONSES['general']
@@ -0,0 +1,139 @@
+"""Fast JSON encoding and compressed responses.
+
+orjson, when installed, encodes numpy arrays and scalars and datetimes
+natively and is several times faster than the stdlib encoder behind
+jsonify. The stdlib encoder is used otherwise. An EncodedPayload keeps the
+encoded body together with its gzip (and, if the brotli package is
+installed, br) variants, so a cached response is serialized and compressed
+once and then served as bytes.
+"""
+import gzip
+import hashlib
+import json
+from datetime import date, datetime
+
+import numpy as np
+from flask import Response
+
+from price_history import PriceHistory
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Below this size compression costs more than the bytes it saves
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript'}
+
+def _default(o):
+    """Types the stdlib encoder does not know about"""
+    if isinstance(o, PriceHistory):
+        return o.to_columns()
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+def _orjson_default(o):
+    if isinstance(o, PriceHistory):
+        # orjson writes the arrays directly, NaN as null
+        return {'t': o.t, 'o': o.open, 'h': o.high, 'l': o.low, 'c': o.close, 'v': o.volume}
+    return _default(o)
+
+def dumps(obj):
+    """Encode obj as compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_orjson_default,
+                                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # e.g. integers beyond 64 bits or non-contiguous arrays; the stdlib copes
+            pass
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+def supported_encodings():
+    """Content-Encodings we can produce, best first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def choose_encoding(accept_encodings):
+    """Pick the best encoding the client accepts (a werkzeug Accept), or None for identity"""
+    best, best_quality = None, 0
+    for encoding in supported_encodings():
+        quality = accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+# An encoded response body plus its precompressed variants
+class EncodedPayload:
+    __slots__ = ('body', 'variants', 'etag')
+
+    def __init__(self, body):
+        self.body = body
+        self.variants = {}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            for encoding in supported_encodings():
+                self.variants[encoding] = compress(body, encoding)
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+
+    @classmethod
+    def encode(cls, obj):
+        return cls(dumps(obj))
+
+    @property
+    def nbytes(self):
+        return len(self.body) + sum(len(variant) for variant in self.variants.values())
+
+    def select(self, accept_encodings):
+        """Return (encoding or None, body bytes) for the client's Accept-Encoding"""
+        encoding = choose_encoding(accept_encodings)
+        if encoding in self.variants:
+            return encoding, self.variants[encoding]
+        return None, self.body
+
+def payload_response(payload, accept_encodings, mimetype='application/json', status=200):
+    """Build a response from a payload, serving a precompressed variant when the client takes one"""
+    encoding, body = payload.select(accept_encodings)
+    response = Response(body, status=status, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+def compress_response(response, accept_encodings):
+    """Compress a finished, buffered response in place if it is large and compressible"""
+    if (response.direct_passthrough or response.is_streamed
+            or not 200 <= response.status_code < 300 or response.status_code == 204
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    encoding = choose_encoding(accept_encodings)
+    if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    if response.get_etag()[0]:
+        # A strong validator names exact bytes, so each encoding gets its own
+        etag, weak = response.get_etag()
+        response.set_etag(f'{etag}-{encoding}', weak=weak)
+    return response
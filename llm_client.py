@@ -0,0 +1,439 @@
+"""Pooled OpenRouter chat-completions client with hedged model fallback.
+
+One keep-alive requests.Session is shared by every chat. Each model's
+latency and errors are tracked. If the preferred model has not answered
+within its observed p90 latency, the next model is fired as well and
+whichever answers first wins. A failed model hands over to the next one
+immediately, and the whole call is bounded by a single deadline instead
+of one timeout per model.
+
+complete_async runs the same hedging for asyncio callers over an httpx
+AsyncClient when httpx is installed, so an event loop can hold many chats
+in flight without a thread each.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import REGISTRY, UPSTREAM_SECONDS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import httpx
+    # httpx logs every request at INFO, which the app's root logger would print
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+except ImportError:
+    httpx = None
+
+DEFAULT_MODELS = [
+    "meta-llama/llama-3.1-8b-instruct:free",
+    "microsoft/phi-3-mini-128k-instruct:free",
+    "google/gemma-2-9b-it:free"
+]
+
+FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    'macra_llm_first_token_seconds',
+    'Time from sending a streaming completion to its first token',
+    ('model',)
+)
+
+class LLMAuthError(Exception):
+    """The upstream rejected our API key; no model will do better"""
+
+class LLMStreamInterrupted(Exception):
+    """A streamed answer broke off after its first tokens; what was yielded is incomplete"""
+
+# Rolling latency/error record for one model
+class ModelStats:
+    def __init__(self, window=100):
+        self.latencies = deque(maxlen=window)
+        self.first_token_latencies = deque(maxlen=window)
+        self.successes = 0
+        self.errors = 0
+        self.hedge_wins = 0
+
+    @staticmethod
+    def _p90(samples):
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))]
+
+    def p90(self):
+        return self._p90(self.latencies)
+
+    def snapshot(self):
+        p90 = self.p90()
+        ttft_p90 = self._p90(self.first_token_latencies)
+        return {
+            'successes': self.successes,
+            'errors': self.errors,
+            'hedge_wins': self.hedge_wins,
+            'p90_seconds': round(p90, 3) if p90 is not None else None,
+            'first_token_p90_seconds': round(ttft_p90, 3) if ttft_p90 is not None else None
+        }
+
+class OpenRouterClient:
+    def __init__(self, api_key, base_url='https://openrouter.ai/api/v1', models=None, timeout=15.0,
+                 default_hedge_delay=4.0, min_hedge_delay=0.5, pool_size=10, headers=None, breaker=None,
+                 async_pool_size=100):
+        self.api_key = api_key
+        self.url = base_url.rstrip('/') + '/chat/completions'
+        self.models = list(models or DEFAULT_MODELS)
+        self.timeout = timeout
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.extra_headers = dict(headers or {})
+        # Optional CircuitBreaker; while it is open, calls return nothing without touching the network
+        self.breaker = breaker
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='llm')
+        # Created on first use, inside the event loop that will drive it
+        self.async_pool_size = async_pool_size
+        self.async_client = None
+
+        self.lock = threading.Lock()
+        self.stats_by_model = {model: ModelStats() for model in self.models}
+        self.hedges_fired = 0
+
+    def _headers(self):
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        headers.update(self.extra_headers)
+        return headers
+
+    def _hedge_delay(self, model):
+        """Wait this long for `model` before firing the next one"""
+        with self.lock:
+            p90 = self.stats_by_model[model].p90()
+        if p90 is None:
+            return self.default_hedge_delay
+        return min(self.timeout, max(self.min_hedge_delay, p90))
+
+    @staticmethod
+    def _completion_content(status_code, body):
+        """Text of a chat-completions response body (bytes); raise if the call did not succeed"""
+        if status_code == 401:
+            raise LLMAuthError("401 Unauthorized")
+        if status_code != 200:
+            raise requests.HTTPError(f"API Error {status_code}: {body[:200].decode('utf-8', 'replace')}")
+        result = json.loads(body)
+        if not result.get('choices'):
+            raise ValueError("response had no choices")
+        return result['choices'][0]['message']['content']
+
+    def _record_call(self, model, started, error=None):
+        with self.lock:
+            stats = self.stats_by_model[model]
+            if error is not None:
+                stats.errors += 1
+            else:
+                stats.successes += 1
+                stats.latencies.append(time.monotonic() - started)
+
+    def _call(self, model, payload, timeout):
+        """POST one completion; return its text, or raise on any failure"""
+        started = time.monotonic()
+        outcome = 'error'
+        try:
+            response = self.session.post(
+                self.url,
+                headers=self._headers(),
+                json=dict(payload, model=model),
+                timeout=timeout
+            )
+            content = self._completion_content(response.status_code, response.content)
+            outcome = 'ok'
+        except Exception as e:
+            if isinstance(e, LLMAuthError):
+                outcome = 'auth_error'
+            self._record_call(model, started, e)
+            raise
+        finally:
+            UPSTREAM_SECONDS.observe(time.monotonic() - started, upstream='openrouter',
+                                     operation='complete', model=model, outcome=outcome)
+        self._record_call(model, started)
+        return content
+
+    async def _call_async(self, model, payload, timeout):
+        """_call over the shared AsyncClient"""
+        started = time.monotonic()
+        outcome = 'error'
+        try:
+            response = await self._async_client().post(
+                self.url,
+                headers=self._headers(),
+                json=dict(payload, model=model),
+                timeout=timeout
+            )
+            content = self._completion_content(response.status_code, response.content)
+            outcome = 'ok'
+        except asyncio.CancelledError:
+            # Lost the hedge race; the model itself did nothing wrong
+            outcome = 'cancelled'
+            raise
+        except Exception as e:
+            if isinstance(e, LLMAuthError):
+                outcome = 'auth_error'
+            self._record_call(model, started, e)
+            raise
+        finally:
+            UPSTREAM_SECONDS.observe(time.monotonic() - started, upstream='openrouter',
+                                     operation='complete', model=model, outcome=outcome)
+        self._record_call(model, started)
+        return content
+
+    def _async_client(self):
+        if self.async_client is None:
+            self.async_client = httpx.AsyncClient(limits=httpx.Limits(
+                max_connections=self.async_pool_size,
+                max_keepalive_connections=self.async_pool_size
+            ))
+        return self.async_client
+
+    async def aclose(self):
+        if self.async_client is not None:
+            await self.async_client.aclose()
+            self.async_client = None
+
+    def complete(self, messages, max_tokens=400, temperature=0.7):
+        """Return the first successful completion across the hedged models, or None"""
+        if self.breaker and not self.breaker.allow():
+            return None
+        payload = {'messages': messages, 'max_tokens': max_tokens, 'temperature': temperature}
+        deadline = time.monotonic() + self.timeout
+        remaining_models = list(self.models)
+        running = {}
+
+        def fire_next():
+            model = remaining_models.pop(0)
+            time_left = max(0.1, deadline - time.monotonic())
+            running[self.executor.submit(self._call, model, payload, time_left)] = model
+
+        fire_next()
+        while running:
+            time_left = deadline - time.monotonic()
+            if time_left <= 0:
+                break
+            # Newest in-flight model decides how long to wait before hedging
+            newest_model = list(running.values())[-1]
+            wait_for = min(time_left, self._hedge_delay(newest_model)) if remaining_models else time_left
+            done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            if not done:
+                if remaining_models:
+                    with self.lock:
+                        self.hedges_fired += 1
+                    fire_next()
+                continue
+
+            for future in done:
+                model = running.pop(future)
+                try:
+                    content = future.result()
+                except LLMAuthError as e:
+                    logger.warning(f"Request error with model {model}: {str(e)}")
+                    self._trip(str(e))
+                    return None
+                except Exception as e:
+                    logger.warning(f"Request error with model {model}: {str(e)}")
+                    if remaining_models:
+                        fire_next()
+                    continue
+                if model != self.models[0]:
+                    with self.lock:
+                        self.stats_by_model[model].hedge_wins += 1
+                self._record(True)
+                return content
+        self._record(False, 'every model failed or timed out')
+        return None
+
+    async def complete_async(self, messages, max_tokens=400, temperature=0.7):
+        """complete() for asyncio callers: same hedging and deadline, losing calls are cancelled.
+
+        Without httpx the blocking complete() runs on a worker thread instead.
+        That thread comes from the loop's default executor, not self.executor:
+        complete() waits there on calls it submits to self.executor, so sharing
+        the pool would deadlock once every worker was waiting.
+        """
+        if httpx is None:
+            return await asyncio.to_thread(self.complete, messages, max_tokens, temperature)
+        if self.breaker and not self.breaker.allow():
+            return None
+        payload = {'messages': messages, 'max_tokens': max_tokens, 'temperature': temperature}
+        deadline = time.monotonic() + self.timeout
+        remaining_models = list(self.models)
+        running = {}
+
+        def fire_next():
+            model = remaining_models.pop(0)
+            time_left = max(0.1, deadline - time.monotonic())
+            running[asyncio.ensure_future(self._call_async(model, payload, time_left))] = model
+
+        fire_next()
+        try:
+            while running:
+                time_left = deadline - time.monotonic()
+                if time_left <= 0:
+                    break
+                newest_model = list(running.values())[-1]
+                wait_for = min(time_left, self._hedge_delay(newest_model)) if remaining_models else time_left
+                done, _ = await asyncio.wait(list(running), timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    if remaining_models:
+                        with self.lock:
+                            self.hedges_fired += 1
+                        fire_next()
+                    continue
+
+                for task in done:
+                    model = running.pop(task)
+                    try:
+                        content = task.result()
+                    except LLMAuthError as e:
+                        logger.warning(f"Request error with model {model}: {str(e)}")
+                        self._trip(str(e))
+                        return None
+                    except Exception as e:
+                        logger.warning(f"Request error with model {model}: {str(e)}")
+                        if remaining_models:
+                            fire_next()
+                        continue
+                    if model != self.models[0]:
+                        with self.lock:
+                            self.stats_by_model[model].hedge_wins += 1
+                    self._record(True)
+                    return content
+        finally:
+            for task in running:
+                task.cancel()
+        self._record(False, 'every model failed or timed out')
+        return None
+
+    def stream(self, messages, max_tokens=400, temperature=0.7):
+        """Yield completion text deltas as they arrive.
+
+        Models are tried in order until one starts streaming; once the first
+        token is out we are committed to that model. If that model then fails,
+        or its stream ends without [DONE], LLMStreamInterrupted is raised so the
+        caller can tell a truncated answer from a finished one. Closing the
+        generator (e.g. when the client disconnects) closes the upstream response.
+        """
+        if self.breaker and not self.breaker.allow():
+            return
+        payload = {'messages': messages, 'max_tokens': max_tokens, 'temperature': temperature, 'stream': True}
+        deadline = time.monotonic() + self.timeout
+        for model in self.models:
+            time_left = deadline - time.monotonic()
+            if time_left <= 0:
+                break
+            started = time.monotonic()
+            streamed_any = False
+            try:
+                with self.session.post(
+                    self.url,
+                    headers=self._headers(),
+                    json=dict(payload, model=model),
+                    timeout=(min(5.0, time_left), time_left),
+                    stream=True
+                ) as response:
+                    if response.status_code == 401:
+                        raise LLMAuthError("401 Unauthorized")
+                    if response.status_code != 200:
+                        raise requests.HTTPError(f"API Error {response.status_code}: {response.text[:200]}")
+                    for text in self._iter_deltas(response):
+                        if not streamed_any:
+                            streamed_any = True
+                            first_token = time.monotonic() - started
+                            with self.lock:
+                                self.stats_by_model[model].first_token_latencies.append(first_token)
+                            FIRST_TOKEN_SECONDS.observe(first_token, model=model)
+                        yield text
+                with self.lock:
+                    stats = self.stats_by_model[model]
+                    stats.successes += 1
+                    stats.latencies.append(time.monotonic() - started)
+                self._observe_stream(model, started, 'ok' if streamed_any else 'empty')
+                if streamed_any:
+                    self._record(True)
+                    return
+            except GeneratorExit:
+                # The client went away mid-answer; the upstream itself was healthy
+                self._observe_stream(model, started, 'cancelled')
+                self._record(True)
+                raise
+            except LLMAuthError as e:
+                with self.lock:
+                    self.stats_by_model[model].errors += 1
+                self._observe_stream(model, started, 'auth_error')
+                logger.warning(f"Request error with model {model}: {str(e)}")
+                self._trip(str(e))
+                return
+            except Exception as e:
+                with self.lock:
+                    self.stats_by_model[model].errors += 1
+                self._observe_stream(model, started, 'error')
+                logger.warning(f"Request error with model {model}: {str(e)}")
+                if streamed_any:
+                    # Half an answer is already with the client; don't splice in another model
+                    self._record(False, str(e)[:200])
+                    raise LLMStreamInterrupted(f"{model} stopped mid-answer: {str(e)}") from e
+        self._record(False, 'every model failed or timed out')
+
+    @staticmethod
+    def _observe_stream(model, started, outcome):
+        UPSTREAM_SECONDS.observe(time.monotonic() - started, upstream='openrouter',
+                                 operation='stream', model=model, outcome=outcome)
+
+    def _record(self, succeeded, reason=None):
+        if self.breaker:
+            if succeeded:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure(reason)
+
+    def _trip(self, reason):
+        # A rejected key fails every model the same way; stop calling until the cooldown passes
+        if self.breaker:
+            self.breaker.trip(reason)
+
+    @staticmethod
+    def _iter_deltas(response):
+        """Parse an OpenAI-style SSE completion stream into text deltas; raise if it ends before [DONE]"""
+        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                return
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                continue
+            choices = chunk.get('choices') or []
+            text = choices[0].get('delta', {}).get('content') if choices else None
+            if text:
+                yield text
+        raise requests.exceptions.ConnectionError("completion stream ended before [DONE]")
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hedges_fired': self.hedges_fired,
+                'models': {model: stats.snapshot() for model, stats in self.stats_by_model.items()}
+            }
@@ -0,0 +1,89 @@
+"""Compact columnar OHLCV history.
+
+PriceHistory keeps daily bars as parallel float64 arrays plus an int64 epoch
+index instead of a list of per-row dicts, which is far smaller to cache and
+much faster to JSON-encode.
+"""
+import numpy as np
+
+def _floats(values):
+    """Convert a float64 array to a list, with NaN as None so the output stays valid JSON"""
+    values = values.tolist()
+    if any(x != x for x in values):
+        return [None if x != x else x for x in values]
+    return values
+
+class PriceHistory:
+    __slots__ = ('t', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, t, open, high, low, close, volume):
+        self.t = np.asarray(t, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.float64)
+
+    @classmethod
+    def from_dataframe(cls, frame):
+        """Build from a yfinance-style OHLCV DataFrame indexed by date"""
+        if len(frame) == 0:
+            return cls.empty()
+        # .values on a tz-aware index is UTC datetime64, so this is a UTC epoch;
+        # columns are copied so the cache does not pin the whole DataFrame block
+        t = frame.index.values.astype('datetime64[s]').astype(np.int64)
+        return cls(
+            t,
+            frame['Open'].to_numpy(dtype=np.float64, copy=True),
+            frame['High'].to_numpy(dtype=np.float64, copy=True),
+            frame['Low'].to_numpy(dtype=np.float64, copy=True),
+            frame['Close'].to_numpy(dtype=np.float64, copy=True),
+            frame['Volume'].to_numpy(dtype=np.float64, copy=True)
+        )
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Inverse of to_columns; None comes back as NaN"""
+        return cls(*(columns[name] for name in ('t', 'o', 'h', 'l', 'c', 'v')))
+
+    @classmethod
+    def empty(cls):
+        return cls(*([] for _ in range(6)))
+
+    def __len__(self):
+        return len(self.t)
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def tail(self, rows):
+        """Last `rows` bars as views on the same arrays (no copy)"""
+        start = max(0, len(self) - rows)
+        return PriceHistory(*(getattr(self, name)[start:] for name in self.__slots__))
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+
+    def to_columns(self):
+        """Columnar JSON shape: {"t": [epoch seconds], "o": [...], "h", "l", "c", "v"}"""
+        return {
+            't': self.t.tolist(),
+            'o': _floats(self.open),
+            'h': _floats(self.high),
+            'l': _floats(self.low),
+            'c': _floats(self.close),
+            'v': _floats(self.volume)
+        }
+
+    def to_records(self):
+        """Legacy per-row shape matching DataFrame.to_dict('records')"""
+        columns = [_floats(getattr(self, name)) for name in ('open', 'high', 'low', 'close', 'volume')]
+        return [
+            {'Open': o, 'High': h, 'Low': l, 'Close': c, 'Volume': v}
+            for o, h, l, c, v in zip(*columns)
+        ]
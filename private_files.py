@@ -0,0 +1,34 @@
+"""Guards for files kept in shared locations such as the system temp dir.
+
+Other local users can pre-create directories or plant symlinks there, so the
+on-disk caches live in a 0700 directory owned by this user and refuse any
+file that is a symlink or belongs to someone else.
+"""
+import os
+import stat
+import tempfile
+
+def check_owned(*paths):
+    """Refuse any of the given files that is a symlink or another user's; missing ones are fine"""
+    for candidate in paths:
+        try:
+            st = os.lstat(candidate)
+        except FileNotFoundError:
+            continue
+        if stat.S_ISLNK(st.st_mode) or st.st_uid != os.getuid():
+            raise PermissionError(f"{candidate} is not a regular file owned by this user")
+
+def private_directory(path):
+    """Create path as a 0700 directory, or check that the existing one is ours and private"""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(f"{path} must be a directory owned by this user with mode 0700")
+    return path
+
+def user_temp_directory(*parts):
+    """Private per-user directory under the temp dir, e.g. <tmp>/macra-<uid>/history"""
+    path = private_directory(os.path.join(tempfile.gettempdir(), f'macra-{os.getuid()}'))
+    for part in parts:
+        path = private_directory(os.path.join(path, part))
+    return path
@@ -0,0 +1,99 @@
+"""Sampling profiler for a single request.
+
+A helper thread snapshots the target thread's Python stack every
+`interval` seconds through sys._current_frames and folds the stacks into a
+call tree. Nothing is hooked into the target thread itself, so overhead
+stays small and independent of how many calls the request makes. The cost
+is resolution: functions shorter than the interval show up only
+statistically.
+"""
+import os
+import sys
+import threading
+import time
+
+class SamplingProfiler:
+    def __init__(self, interval=0.001, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.stacks = {}  # tuple of frame labels, outermost first -> samples
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @staticmethod
+    def _label(code):
+        return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        key = tuple(reversed(stack))
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+        self.samples += 1
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def call_tree(self, min_fraction=0.01):
+        """Nested [{'function', 'samples', 'percent', 'self_samples', 'children'}], heaviest first.
+
+        Subtrees holding less than `min_fraction` of all samples are dropped.
+        The tree starts at the deepest frame common to every sample.
+        """
+        root = {'children': {}, 'samples': 0, 'self_samples': 0}
+        for stack, count in self.stacks.items():
+            node = root
+            node['samples'] += count
+            for label in stack:
+                node = node['children'].setdefault(label, {'children': {}, 'samples': 0, 'self_samples': 0})
+                node['samples'] += count
+            node['self_samples'] += count
+
+        total = max(1, self.samples)
+
+        # Skip the trunk every sample shares (server, WSGI and dispatch frames) down to
+        # the deepest frame that still holds all samples, usually the view function
+        trunk = root['children']
+        while len(trunk) == 1:
+            (label, node), = trunk.items()
+            if len(node['children']) != 1 or node['self_samples']:
+                break
+            trunk = node['children']
+
+        def render(children):
+            nodes = []
+            for label, node in sorted(children.items(), key=lambda item: -item[1]['samples']):
+                if node['samples'] / total < min_fraction:
+                    continue
+                nodes.append({
+                    'function': label,
+                    'samples': node['samples'],
+                    'percent': round(100.0 * node['samples'] / total, 1),
+                    'self_samples': node['self_samples'],
+                    'children': render(node['children'])
+                })
+            return nodes
+
+        return render(trunk)
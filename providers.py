@@ -0,0 +1,319 @@
+"""Market data providers for StockAnalyzer.
+
+YahooProvider talks to Yahoo Finance through yfinance, FakeMarketDataProvider
+generates deterministic offline data for testing and benchmarks, and
+BatchingProvider wraps either one so concurrent history requests are
+collected over a short window and fetched as one multi-ticker download.
+
+pandas and yfinance take most of a second to import, so they are imported
+on first use (or by preload_data_stack) rather than with this module. A
+process that never fetches market data never pays for them.
+"""
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+
+import numpy as np
+
+from metrics import UPSTREAM_SECONDS
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Trading days covered by each yfinance period string
+PERIOD_TRADING_DAYS = {
+    '5d': 5,
+    '1mo': 21,
+    '3mo': 63,
+    '6mo': 126,
+    '1y': 252,
+    '2y': 504,
+    '5y': 1260
+}
+
+# First bar of every fake series
+FAKE_HISTORY_START = '2015-01-02'
+
+def preload_data_stack():
+    """Import pandas and yfinance now, e.g. from a boot thread, instead of on the first fetch"""
+    import pandas  # noqa: F401
+    import yfinance  # noqa: F401
+
+def empty_history():
+    import pandas as pd
+    return pd.DataFrame(columns=OHLCV_COLUMNS)
+
+# yfinance errors meaning Yahoo has no bars for the ticker, as opposed to the request failing
+NO_DATA_ERRORS = ('delisted', 'no data found', 'no timezone found', 'not found')
+
+class UpstreamFetchError(Exception):
+    """One ticker of a batch download failed (429, timeout, ...) and is worth retrying"""
+
+def split_download(frame, symbols, errors=None):
+    """Split a multi-ticker yf.download frame into {symbol: OHLCV DataFrame}.
+
+    `errors` is yfinance's {ticker: message} map for the download. Tickers
+    that failed for a reason other than having no data map to an
+    UpstreamFetchError instead of an empty frame, so they are not cached as
+    data.
+    """
+    import pandas as pd
+    histories = {}
+    for ticker, message in (errors or {}).items():
+        message = str(message)
+        if ticker.upper() in symbols and not any(marker in message.lower() for marker in NO_DATA_ERRORS):
+            histories[ticker.upper()] = UpstreamFetchError(f"{ticker.upper()}: {message}")
+    if isinstance(frame.columns, pd.MultiIndex):
+        tickers = set(frame.columns.get_level_values(0))
+        for symbol in symbols:
+            if symbol in tickers and symbol not in histories:
+                histories[symbol] = frame[symbol].dropna(how='all')
+    elif len(symbols) == 1 and symbols[0] not in histories:
+        histories[symbols[0]] = frame.dropna(how='all')
+
+    # Symbols Yahoo had nothing for come back empty rather than missing
+    for symbol in symbols:
+        histories.setdefault(symbol, empty_history())
+    return histories
+
+class YahooProvider:
+    name = 'yahoo'
+
+    def __init__(self):
+        # yf.download resets and fills one module-global error map, so downloads
+        # are serialized to read back the errors belonging to this one
+        self.download_lock = threading.Lock()
+
+    def download(self, symbols, period):
+        """Fetch daily OHLCV for every symbol in a single request.
+
+        yf.download swallows per-ticker failures and returns empty columns for
+        them, so those tickers come back as UpstreamFetchError values.
+        """
+        import yfinance as yf
+        from yfinance import shared
+        with self.download_lock:
+            frame = yf.download(
+                symbols,
+                period=period,
+                group_by='ticker',
+                auto_adjust=True,
+                actions=False,
+                progress=False,
+                threads=False
+            )
+            errors = dict(getattr(shared, '_ERRORS', None) or {})
+        return split_download(frame, symbols, errors)
+
+    def get_info(self, symbol):
+        import yfinance as yf
+        return yf.Ticker(symbol).info
+
+class FakeUpstreamError(Exception):
+    """Injected failure; the message mimics what Yahoo/yfinance would raise"""
+
+# Deterministic offline provider: same symbol, same data, no network.
+# Failures can be injected for load tests: `error_rate` fails that fraction of
+# calls with a transient error, and the last `rate_limit_burst` of every
+# `rate_limit_every` calls are answered with 429. Injection is seeded, so a
+# given call sequence fails the same way every run.
+class FakeMarketDataProvider:
+    name = 'fake'
+
+    def __init__(self, latency_seconds=0.0, known_symbols=None, error_rate=0.0,
+                 rate_limit_every=0, rate_limit_burst=0, seed=0):
+        self.latency = latency_seconds
+        self.known_symbols = set(known_symbols) if known_symbols else None
+        self.error_rate = error_rate
+        self.rate_limit_every = rate_limit_every
+        self.rate_limit_burst = rate_limit_burst
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.download_calls = 0
+        self.info_calls = 0
+        self.symbols_downloaded = 0
+        self.injected_errors = 0
+        self.injected_rate_limits = 0
+
+    def _exists(self, symbol):
+        return self.known_symbols is None or symbol in self.known_symbols
+
+    def _failure(self):
+        """The injected failure due for this call, or None; call with the lock held"""
+        calls = self.download_calls + self.info_calls
+        if self.rate_limit_every and calls % self.rate_limit_every >= self.rate_limit_every - self.rate_limit_burst:
+            self.injected_rate_limits += 1
+            return FakeUpstreamError('429 Client Error: Too Many Requests')
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.injected_errors += 1
+            return FakeUpstreamError('Read timed out')
+        return None
+
+    def _history(self, symbol, period):
+        import pandas as pd
+        rows = PERIOD_TRADING_DAYS.get(period, 252)
+        # The series starts on a fixed date, so every period agrees on a given day's bar
+        days = np.arange(np.datetime64(FAKE_HISTORY_START), np.datetime64(pd.Timestamp.today().date()) + 1)
+        days = days[np.is_busday(days)]
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+        start_price = rng.uniform(20, 500)
+        returns = rng.normal(0.0002, 0.015, len(days))
+        close = start_price * np.exp(np.cumsum(returns))
+        spread = np.abs(rng.normal(0, 0.01, len(days))) * close
+        volume = rng.integers(1_000_000, 50_000_000, len(days)).astype(float)
+        close, spread, volume = close[-rows:], spread[-rows:], volume[-rows:]
+        return pd.DataFrame({
+            'Open': close - spread / 2,
+            'High': close + spread,
+            'Low': close - spread,
+            'Close': close,
+            'Volume': volume
+        }, index=pd.DatetimeIndex(days[-rows:]))
+
+    def download(self, symbols, period):
+        with self.lock:
+            self.download_calls += 1
+            self.symbols_downloaded += len(symbols)
+            failure = self._failure()
+        if self.latency:
+            time.sleep(self.latency)
+        if failure:
+            raise failure
+        return {
+            symbol: self._history(symbol, period) if self._exists(symbol) else empty_history()
+            for symbol in symbols
+        }
+
+    def get_info(self, symbol):
+        with self.lock:
+            self.info_calls += 1
+            failure = self._failure()
+        if self.latency:
+            time.sleep(self.latency)
+        if failure:
+            raise failure
+        if not self._exists(symbol):
+            return {}
+
+        hist = self._history(symbol, '5d')
+        close = hist['Close']
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()) + 1)
+        return {
+            'longName': f'{symbol} Holdings Inc',
+            'currentPrice': round(float(close.iloc[-1]), 2),
+            'regularMarketChangePercent': round(float((close.iloc[-1] / close.iloc[-2] - 1) * 100), 2),
+            'volume': int(hist['Volume'].iloc[-1]),
+            'marketCap': int(close.iloc[-1] * rng.integers(100_000_000, 10_000_000_000)),
+            'trailingPE': round(float(rng.uniform(8, 60)), 2),
+            'dividendYield': round(float(rng.uniform(0, 3)), 2)
+        }
+
+    def stats(self):
+        with self.lock:
+            return {
+                'download_calls': self.download_calls,
+                'info_calls': self.info_calls,
+                'symbols_downloaded': self.symbols_downloaded,
+                'injected_errors': self.injected_errors,
+                'injected_rate_limits': self.injected_rate_limits
+            }
+
+# Collects concurrent history requests over a short window into one batched download
+class BatchingProvider:
+    def __init__(self, provider, window_seconds=0.025, max_batch=25):
+        self.provider = provider
+        self.name = provider.name
+        self.window = window_seconds
+        self.max_batch = max_batch
+        self.lock = threading.Lock()
+        self.pending = {}  # period -> open batch
+        self.batches = 0
+        self.requests = 0
+
+    def get_history(self, symbol, period, timeout=30):
+        """Return the OHLCV DataFrame for symbol, sharing a download with concurrent callers"""
+        with self.lock:
+            self.requests += 1
+            batch = self.pending.get(period)
+            leader = batch is None
+            if leader:
+                batch = {'futures': {}, 'full': threading.Event()}
+                self.pending[period] = batch
+            future = batch['futures'].get(symbol)
+            if future is None:
+                future = batch['futures'][symbol] = Future()
+            if len(batch['futures']) >= self.max_batch:
+                # Close this batch so later arrivals open a new one
+                self.pending.pop(period, None)
+                batch['full'].set()
+
+        if leader:
+            batch['full'].wait(self.window)
+            with self.lock:
+                if self.pending.get(period) is batch:
+                    del self.pending[period]
+                self.batches += 1
+            self._run_batch(batch['futures'], period)
+
+        return future.result(timeout=timeout)
+
+    def _timed(self, operation, fn, *args):
+        """Call the wrapped provider, recording its latency and outcome"""
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            result = fn(*args)
+            outcome = 'ok'
+            return result
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, upstream=self.name,
+                                     operation=operation, model='', outcome=outcome)
+
+    def _run_batch(self, futures, period):
+        symbols = list(futures)
+        try:
+            histories = self._timed('download', self.provider.download, symbols, period)
+        except Exception as e:
+            for future in futures.values():
+                future.set_exception(e)
+            return
+        for symbol, future in futures.items():
+            history = histories.get(symbol)
+            if isinstance(history, Exception):
+                future.set_exception(history)
+            else:
+                future.set_result(history if history is not None else empty_history())
+
+    def get_info(self, symbol):
+        return self._timed('info', self.provider.get_info, symbol)
+
+    def stats(self):
+        with self.lock:
+            stats = {
+                'provider': self.name,
+                'history_requests': self.requests,
+                'batches': self.batches,
+                'symbols_per_batch': round(self.requests / self.batches, 2) if self.batches else 0.0
+            }
+        if hasattr(self.provider, 'stats'):
+            stats['upstream'] = self.provider.stats()
+        return stats
+
+def create_provider():
+    """Build the configured provider: MARKET_DATA_PROVIDER=yahoo (default) or fake"""
+    if os.environ.get('MARKET_DATA_PROVIDER', 'yahoo').lower() == 'fake':
+        provider = FakeMarketDataProvider(
+            latency_seconds=float(os.environ.get('FAKE_PROVIDER_LATENCY', 0.0)),
+            error_rate=float(os.environ.get('FAKE_PROVIDER_ERROR_RATE', 0.0)),
+            rate_limit_every=int(os.environ.get('FAKE_PROVIDER_429_EVERY', 0)),
+            rate_limit_burst=int(os.environ.get('FAKE_PROVIDER_429_BURST', 0)),
+            seed=int(os.environ.get('FAKE_PROVIDER_SEED', 0))
+        )
+    else:
+        provider = YahooProvider()
+    return BatchingProvider(
+        provider,
+        window_seconds=float(os.environ.get('BATCH_WINDOW_MS', 25)) / 1000,
+        max_batch=int(os.environ.get('BATCH_MAX_SYMBOLS', 25))
+    )
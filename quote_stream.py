@@ -0,0 +1,257 @@
+"""Shared live-quote polling with fan-out to subscribers.
+
+QuoteHub polls each subscribed symbol once per interval, however many
+clients watch it, and pushes what changed to every subscriber of that
+symbol. Upstream calls therefore scale with distinct symbols, not viewers.
+
+Each Subscription holds at most one pending update per symbol: a newer
+update for a symbol the client has not read yet is merged into the unread
+one. A slow consumer therefore sees fewer, coalesced updates, and its
+buffer never grows past its symbol count. A consumer that reads nothing
+for `stall_seconds` while updates are waiting is disconnected.
+
+A symbol whose poll fails (or is turned away by the rate limiter) is
+polled again after an exponentially growing delay, up to
+`max_backoff_seconds`, instead of every interval.
+"""
+import heapq
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Quote fields pushed to subscribers; history and indicators stay on the REST endpoints
+QUOTE_FIELDS = ('name', 'current_price', 'change', 'volume', 'market_cap', 'pe_ratio',
+                'dividend_yield', 'stale', 'demo_mode')
+
+class SubscriberLimitError(Exception):
+    """The hub is already serving its maximum number of subscribers"""
+
+def quote_view(quote):
+    """The subset of a get_stock_data result that is streamed"""
+    return {field: quote[field] for field in QUOTE_FIELDS if field in quote}
+
+class Subscription:
+    def __init__(self, symbols):
+        self.symbols = list(symbols)
+        self.cond = threading.Condition()
+        self.pending = OrderedDict()  # symbol -> (event, data), one unread update per symbol
+        self.closed = False
+        self.close_reason = None
+        self.coalesced = 0
+        self.last_read = time.monotonic()
+
+    def push(self, symbol, event, data):
+        """Queue an update, merging it into an unread one for the same symbol"""
+        with self.cond:
+            if self.closed:
+                return
+            previous = self.pending.get(symbol)
+            if previous is not None:
+                self.coalesced += 1
+                previous_event, previous_data = previous
+                if event == 'quote' and previous_event == 'snapshot':
+                    # Unread full quote plus changes is still a full quote
+                    event, data = 'snapshot', dict(previous_data, quote=dict(previous_data['quote'], **data['changes']))
+                elif event == 'quote':
+                    data = dict(data, changes=dict(previous_data['changes'], **data['changes']))
+            self.pending[symbol] = (event, data)
+            self.cond.notify()
+
+    def next(self, timeout):
+        """Wait up to `timeout` seconds; return every pending (event, data), possibly none"""
+        with self.cond:
+            if not self.pending and not self.closed:
+                self.cond.wait(timeout)
+            updates = list(self.pending.values())
+            self.pending.clear()
+            self.last_read = time.monotonic()
+            return updates
+
+    def stalled(self, now, stall_seconds):
+        with self.cond:
+            return not self.closed and bool(self.pending) and now - self.last_read > stall_seconds
+
+    def close(self, reason):
+        with self.cond:
+            self.closed = True
+            self.close_reason = reason
+            self.cond.notify_all()
+
+class QuoteHub:
+    def __init__(self, fetch, interval_seconds=15.0, max_subscribers=16, stall_seconds=60.0, workers=4,
+                 max_backoff_seconds=300.0):
+        self.fetch = fetch  # symbol -> quote dict, or None when nothing new could be fetched
+        self.interval = interval_seconds
+        self.max_backoff = max_backoff_seconds
+        self.max_subscribers = max_subscribers
+        self.stall_seconds = stall_seconds
+        self.lock = threading.Lock()
+        self.subscriptions = set()
+        self.watchers = {}  # symbol -> set of Subscriptions
+        self.latest = {}  # symbol -> last broadcast quote view
+        self.schedule = []  # heap of (due monotonic time, symbol); entries not matching `due` are stale
+        self.due = {}  # symbol -> when it is next polled
+        self.polling = set()
+        self.failures = {}  # symbol -> consecutive failed polls
+        self.wakeup = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='quote-poll')
+        self.thread = None
+        self.polls = 0
+        self.poll_failures = 0
+        self.broadcasts = 0
+        self.stalled_disconnects = 0
+
+    def subscribe(self, symbols):
+        """Register a subscriber; symbols already being polled get their last quote at once"""
+        with self.lock:
+            if len(self.subscriptions) >= self.max_subscribers:
+                raise SubscriberLimitError(f'{self.max_subscribers} subscribers already connected')
+            subscription = Subscription(symbols)
+            self.subscriptions.add(subscription)
+            for symbol in subscription.symbols:
+                watchers = self.watchers.setdefault(symbol, set())
+                if not watchers and symbol not in self.polling:
+                    self._schedule(symbol, time.monotonic())
+                watchers.add(subscription)
+                if symbol in self.latest:
+                    subscription.push(symbol, 'snapshot', {'symbol': symbol, 'quote': self.latest[symbol]})
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='quote-hub', daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close('unsubscribed')
+        with self.lock:
+            self.subscriptions.discard(subscription)
+            for symbol in subscription.symbols:
+                watchers = self.watchers.get(symbol)
+                if watchers is None:
+                    continue
+                watchers.discard(subscription)
+                if not watchers:
+                    # Nobody is watching: stop polling (its schedule entry goes stale)
+                    del self.watchers[symbol]
+                    self.latest.pop(symbol, None)
+                    self.due.pop(symbol, None)
+                    self.failures.pop(symbol, None)
+
+    def _schedule(self, symbol, due):
+        """Call with the lock held"""
+        self.due[symbol] = due
+        heapq.heappush(self.schedule, (due, symbol))
+
+    def _run(self):
+        while True:
+            now = time.monotonic()
+            with self.lock:
+                while self.schedule and self.schedule[0][0] <= now:
+                    due, symbol = heapq.heappop(self.schedule)
+                    if self.due.get(symbol) != due:
+                        continue
+                    del self.due[symbol]
+                    self.polling.add(symbol)
+                    self.executor.submit(self._poll, symbol)
+                wait_for = self.schedule[0][0] - now if self.schedule else None
+            self.wakeup.wait(wait_for)
+            self.wakeup.clear()
+
+    def _poll(self, symbol):
+        quote = None
+        try:
+            quote = self.fetch(symbol)
+        except Exception as e:
+            logger.warning(f"Quote poll for {symbol} failed: {str(e)}")
+        failed = not quote or 'error' in quote
+        with self.lock:
+            self.polls += 1
+            self.polling.discard(symbol)
+            if failed:
+                self.poll_failures += 1
+                failures = self.failures[symbol] = self.failures.get(symbol, 0) + 1
+                delay = min(self.max_backoff, self.interval * 2 ** failures)
+            else:
+                self.failures.pop(symbol, None)
+                delay = self.interval
+            if symbol in self.watchers:
+                self._schedule(symbol, time.monotonic() + delay)
+        self.wakeup.set()
+
+        if not failed:
+            self._broadcast(symbol, quote_view(quote))
+
+    def _broadcast(self, symbol, view):
+        now = time.monotonic()
+        with self.lock:
+            if symbol not in self.watchers:
+                return
+            previous = self.latest.get(symbol)
+            self.latest[symbol] = view
+            if previous is None:
+                event, data = 'snapshot', {'symbol': symbol, 'quote': view}
+            else:
+                changes = {field: value for field, value in view.items() if previous.get(field) != value}
+                changes.update({field: None for field in previous if field not in view})
+                if not changes:
+                    return
+                event, data = 'quote', {'symbol': symbol, 'changes': changes}
+            watchers = list(self.watchers[symbol])
+            self.broadcasts += 1
+
+        for subscription in watchers:
+            if subscription.stalled(now, self.stall_seconds):
+                with self.lock:
+                    self.stalled_disconnects += 1
+                subscription.close('too slow to keep up')
+                continue
+            subscription.push(symbol, event, data)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'subscribers': len(self.subscriptions),
+                'symbols': len(self.watchers),
+                'interval_seconds': self.interval,
+                'polls': self.polls,
+                'poll_failures': self.poll_failures,
+                'backing_off': len(self.failures),
+                'broadcasts': self.broadcasts,
+                'coalesced': sum(subscription.coalesced for subscription in self.subscriptions),
+                'stalled_disconnects': self.stalled_disconnects
+            }
+
+# Offline quote source: every call moves each symbol's price one random-walk step
+class FakeTicker:
+    def __init__(self, volatility=0.002, seed=0):
+        self.volatility = volatility
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.state = {}  # symbol -> (rng, open price, last price, volume)
+        self.calls = 0
+
+    def __call__(self, symbol):
+        with self.lock:
+            self.calls += 1
+            if symbol not in self.state:
+                rng = np.random.default_rng(zlib.crc32(symbol.encode()) + self.seed)
+                price = float(rng.uniform(20, 500))
+                self.state[symbol] = (rng, price, price, 0)
+            rng, open_price, price, volume = self.state[symbol]
+            price = round(price * float(np.exp(rng.normal(0, self.volatility))), 2)
+            volume += int(rng.integers(1_000, 50_000))
+            self.state[symbol] = (rng, open_price, price, volume)
+        return {
+            'symbol': symbol,
+            'name': f'{symbol} Holdings Inc',
+            'current_price': price,
+            'change': round((price / open_price - 1) * 100, 2),
+            'volume': volume
+        }
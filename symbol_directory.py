@@ -0,0 +1,135 @@
+"""Local directory of listed symbols: ticker, company name and exchange.
+
+Loaded once from a CSV with symbol, name and exchange columns (the bundled
+symbols.csv, or a full exchange listing converted to the same shape).
+Tickers live in one sorted list with the names and exchanges alongside, so
+an existence check or a name lookup is a binary search. Every word of every
+company name is kept in a second sorted list with its row number next to it,
+so a prefix of any name word is found by binary search as well. Nothing here
+goes upstream.
+"""
+import bisect
+import csv
+import heapq
+import re
+from array import array
+
+# Characters clean_symbol lets through; one-edit typo candidates are drawn from them
+SYMBOL_CHARACTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.-'
+
+def _name_words(name):
+    """Lower-case words of a name, apostrophes dropped ("McDonald's Corp." -> ['mcdonalds', 'corp'])"""
+    return re.findall(r'[a-z0-9]+', name.lower().replace("'", ''))
+
+def _one_edit(symbol):
+    """Strings one deletion, transposition, substitution or insertion away from symbol"""
+    edits = set()
+    for i in range(len(symbol) + 1):
+        left, right = symbol[:i], symbol[i:]
+        if right:
+            edits.add(left + right[1:])
+        if len(right) > 1:
+            edits.add(left + right[1] + right[0] + right[2:])
+        for c in SYMBOL_CHARACTERS:
+            edits.add(left + c + right)
+            if right:
+                edits.add(left + c + right[1:])
+    edits.discard(symbol)
+    return edits
+
+class SymbolDirectory:
+    def __init__(self, entries, path=None):
+        """entries are (symbol, name, exchange); the first row of a repeated symbol wins"""
+        rows = {}
+        for symbol, name, exchange in entries:
+            rows.setdefault(symbol.strip().upper(), (name.strip(), exchange.strip()))
+        self.path = path
+        self.symbols = sorted(rows)
+        self.names = [rows[symbol][0] for symbol in self.symbols]
+        self.exchanges = [rows[symbol][1] for symbol in self.symbols]
+        # (word, row, 1 if the name starts with it); a word repeated in a name is indexed once
+        entries = set()
+        for row, name in enumerate(self.names):
+            words = _name_words(name)
+            entries.update((word, row, int(i == 0)) for i, word in enumerate(words) if word not in words[:i])
+        entries = sorted(entries)
+        self.words = [word for word, _, _ in entries]
+        self.word_rows = array('I', [row for _, row, _ in entries])
+        self.word_leads = array('B', [leads for _, _, leads in entries])
+
+    @classmethod
+    def load(cls, path):
+        with open(path, newline='', encoding='utf-8') as f:
+            entries = [(row['symbol'], row.get('name') or '', row.get('exchange') or '')
+                       for row in csv.DictReader(f) if (row.get('symbol') or '').strip()]
+        return cls(entries, path)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return self._row(symbol.upper()) is not None
+
+    def _row(self, symbol):
+        i = bisect.bisect_left(self.symbols, symbol)
+        if i < len(self.symbols) and self.symbols[i] == symbol:
+            return i
+        return None
+
+    @staticmethod
+    def _prefix_range(keys, prefix):
+        """[start, end) of the sorted keys that start with prefix"""
+        return bisect.bisect_left(keys, prefix), bisect.bisect_left(keys, prefix + '\uffff')
+
+    def name(self, symbol):
+        """Company name for a listed symbol, or None"""
+        row = self._row(symbol.upper())
+        return self.names[row] if row is not None else None
+
+    def search(self, query, limit=10):
+        """Up to `limit` entries matching query, best first.
+
+        The exact ticker ranks first, then tickers starting with the query,
+        then companies whose name starts with it, then companies with a later
+        name word starting with it, then tickers one typo away. Each word of a
+        multi-word query must start a word of the name ("gen mot" finds
+        General Motors).
+        """
+        query = (query or '').strip()
+        if not query or limit <= 0:
+            return []
+        tiers = {}
+
+        def rank(row, tier):
+            if tier < tiers.get(row, tier + 1):
+                tiers[row] = tier
+
+        ticker = query.upper()
+        start, end = self._prefix_range(self.symbols, ticker)
+        for row in range(start, end):
+            rank(row, 0 if self.symbols[row] == ticker else 1)
+
+        words = _name_words(query)
+        if words:
+            start, end = self._prefix_range(self.words, words[0])
+            for i in range(start, end):
+                row = self.word_rows[i]
+                if len(words) > 1:
+                    name_words = _name_words(self.names[row])
+                    if not all(any(word.startswith(rest) for word in name_words) for rest in words[1:]):
+                        continue
+                rank(row, 2 if self.word_leads[i] else 3)
+
+        if len(tiers) < limit and len(ticker) <= 10 and all(c in SYMBOL_CHARACTERS for c in ticker):
+            for candidate in _one_edit(ticker):
+                row = self._row(candidate)
+                if row is not None:
+                    rank(row, 4)
+
+        # Within a tier the closest length wins, so APPL suggests AAPL before APP
+        best = heapq.nsmallest(limit, tiers, key=lambda row: (tiers[row], abs(len(self.symbols[row]) - len(ticker)), self.symbols[row]))
+        return [{'symbol': self.symbols[row], 'name': self.names[row], 'exchange': self.exchanges[row]}
+                for row in best]
+
+    def stats(self):
+        return {'path': self.path, 'symbols': len(self.symbols), 'name_words': len(self.words)}
@@ -0,0 +1,11 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+# Importing app must not touch Yahoo, a shared cache file or the bar store
+os.environ.setdefault('MARKET_DATA_PROVIDER', 'fake')
+os.environ.setdefault('CACHE_L2_PATH', '')
+os.environ.setdefault('HISTORY_STORE_PATH', '')
@@ -0,0 +1,49 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app as market_app
+import asgi
+from app import DataCache, SQLiteCacheTier
+
+class RecordingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.submitted = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(fn, *args, **kwargs)
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = RecordingExecutor()
+    monkeypatch.setattr(asgi, 'market_executor', executor)
+    yield executor
+    executor.shutdown()
+
+@pytest.fixture
+def two_tier(tmp_path, monkeypatch):
+    cache = DataCache(l2=SQLiteCacheTier(str(tmp_path / 'cache.sqlite3')))
+    monkeypatch.setattr(market_app, 'cache', cache)
+    return cache
+
+def test_fresh_l1_hit_is_answered_on_the_loop(executor, two_tier):
+    two_tier.set('stock_data_AAPL', {'symbol': 'AAPL'})
+    assert asyncio.run(asgi.run_market(market_app.analyzer.get_stock_data, 'AAPL')) == {'symbol': 'AAPL'}
+    assert executor.submitted == 0
+
+def test_l2_only_entry_is_read_on_the_pool(executor, two_tier):
+    now = time.time()
+    two_tier.l2.set('stock_data_AAPL', {'symbol': 'AAPL'}, now, now + 60, now + 120)
+    assert asyncio.run(asgi.run_market(market_app.analyzer.get_stock_data, 'AAPL')) == {'symbol': 'AAPL'}
+    assert executor.submitted == 1
+
+def test_stale_l1_entry_is_refreshed_off_the_loop(executor, two_tier):
+    now = time.time()
+    with two_tier.lock:
+        two_tier._store('stock_data_AAPL', {'symbol': 'AAPL'}, now - 1000, now - 100)
+    result = asyncio.run(asgi.run_market(market_app.analyzer.get_stock_data, 'AAPL'))
+    assert result['stale'] and executor.submitted == 1
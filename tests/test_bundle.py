@@ -0,0 +1,57 @@
+import pytest
+
+import app as market_app
+from app import UpstreamScheduler
+from circuit_breaker import CircuitBreaker
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(market_app, 'yahoo_scheduler', UpstreamScheduler('test', rate_per_second=50.0, burst=5))
+    monkeypatch.setattr(market_app, 'yahoo_breaker', CircuitBreaker('test'))
+    market_app.cache.clear()
+    yield market_app.app.test_client()
+    market_app.cache.clear()
+
+def bundle(client, query=''):
+    response = client.get('/api/symbol/AAPL' + query)
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_bundle_has_every_section_from_one_quote_fetch(client):
+    info_calls = market_app.analyzer.provider.stats()['upstream']['info_calls']
+    body = bundle(client)
+    assert sorted(body) == ['analysis', 'news', 'quote', 'symbol']
+    assert market_app.analyzer.provider.stats()['upstream']['info_calls'] == info_calls + 1
+    quote = market_app.analyzer.get_stock_data('AAPL')
+    assert body['quote']['current_price'] == quote['current_price']
+    assert sorted(body['quote']['historical_data']) == ['c', 'h', 'l', 'o', 't', 'v']
+    assert body['analysis']['score'] == market_app.analyzer.analyze_stock_data('AAPL', quote)['score']
+    assert len(body['news']) == 3
+
+def test_fields_pick_sections_and_keys(client):
+    body = bundle(client, '?fields=quote.name,quote.current_price,news')
+    assert sorted(body) == ['news', 'quote', 'symbol']
+    assert sorted(body['quote']) == ['current_price', 'name']
+
+def test_exclusions_alone_keep_the_other_sections(client):
+    body = bundle(client, '?fields=-quote.historical_data,-news')
+    assert sorted(body) == ['analysis', 'quote', 'symbol']
+    assert 'historical_data' not in body['quote'] and 'current_price' in body['quote']
+
+def test_unknown_fields_are_ignored(client):
+    assert sorted(bundle(client, '?fields=bogus')) == ['analysis', 'news', 'quote', 'symbol']
+    body = bundle(client, '?fields=bogus,quote.nope,analysis.score')
+    assert sorted(body) == ['analysis', 'quote', 'symbol']
+    assert body['quote'] == {}
+    assert sorted(body['analysis']) == ['score']
+
+def test_records_format_applies_to_the_quote_history(client):
+    history = bundle(client, '?fields=quote.historical_data&format=records')['quote']['historical_data']
+    assert sorted(history[0]) == ['Close', 'High', 'Low', 'Open', 'Volume']
+
+def test_quote_error_is_returned_without_sections(client, monkeypatch):
+    monkeypatch.setattr(market_app.analyzer, 'get_stock_data', lambda symbol: {'error': f'No data found for symbol {symbol}.'})
+    assert bundle(client) == {'error': 'No data found for symbol AAPL.'}
+
+def test_invalid_symbol_is_rejected(client):
+    assert client.get('/api/symbol/AA$PL').get_json() == {'error': 'Invalid stock symbol format'}
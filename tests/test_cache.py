@@ -0,0 +1,75 @@
+import time
+from datetime import timedelta
+
+from app import DataCache, estimate_size
+from json_response import EncodedPayload
+
+WINDOWS = {'stock_data': {'fresh': timedelta(seconds=60), 'stale': timedelta(seconds=60)}}
+
+def held_bytes(cache):
+    """What the byte count should be: every entry plus its encoded payloads"""
+    return (sum(entry[3] for entry in cache.cache.values())
+            + sum(payload.nbytes for payloads in cache.encoded.values() for payload in payloads.values()))
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = DataCache(max_entries=3, namespace_windows=WINDOWS)
+    for symbol in ('AAPL', 'MSFT', 'GOOGL'):
+        cache.set(f'stock_data_{symbol}', {'symbol': symbol})
+    cache.get('stock_data_AAPL')  # now the most recently used
+    cache.set('stock_data_TSLA', {'symbol': 'TSLA'})
+    assert list(cache.cache) == ['stock_data_GOOGL', 'stock_data_AAPL', 'stock_data_TSLA']
+    assert cache.evictions == 1
+
+def test_byte_budget_evicts_until_it_fits():
+    value = {'history': list(range(100))}
+    size = estimate_size(value)
+    cache = DataCache(max_bytes=size * 2 + size // 2, namespace_windows=WINDOWS)
+    for symbol in ('AAPL', 'MSFT', 'GOOGL', 'TSLA'):
+        cache.set(f'stock_data_{symbol}', dict(value))
+    assert list(cache.cache) == ['stock_data_GOOGL', 'stock_data_TSLA']
+    assert cache.bytes == held_bytes(cache) <= cache.max_bytes
+    assert cache.evictions == 2
+
+def test_newest_entry_is_kept_even_over_budget():
+    cache = DataCache(max_bytes=1, namespace_windows=WINDOWS)
+    cache.set('stock_data_AAPL', {'symbol': 'AAPL'})
+    cache.set('stock_data_MSFT', {'symbol': 'MSFT'})
+    assert list(cache.cache) == ['stock_data_MSFT']
+
+def test_overwrite_replaces_the_old_size():
+    cache = DataCache(namespace_windows=WINDOWS)
+    cache.set('stock_data_AAPL', {'history': list(range(1000))})
+    data = cache.get('stock_data_AAPL')
+    cache.encode('stock_data_AAPL', data, 'columns', EncodedPayload.encode)
+    cache.set('stock_data_AAPL', {'history': [1]})
+    assert cache.encoded == {}
+    assert cache.bytes == held_bytes(cache) == estimate_size({'history': [1]})
+
+def test_encoded_payloads_count_towards_the_budget():
+    cache = DataCache(namespace_windows=WINDOWS)
+    cache.set('stock_data_AAPL', {'symbol': 'AAPL'})
+    data = cache.get('stock_data_AAPL')
+    payload = cache.encode('stock_data_AAPL', data, 'columns', EncodedPayload.encode)
+    assert cache.encode('stock_data_AAPL', data, 'columns', EncodedPayload.encode) is payload
+    assert cache.bytes == held_bytes(cache) == estimate_size(data) + payload.nbytes
+    cache.delete('stock_data_AAPL')
+    assert cache.bytes == 0
+
+def test_expired_entries_are_stale_then_swept_with_their_bytes():
+    cache = DataCache(namespace_windows=WINDOWS)
+    now = time.time()
+    with cache.lock:
+        cache._store('stock_data_AAPL', {'symbol': 'AAPL'}, now - 90, now - 30)
+        cache._store('stock_data_MSFT', {'symbol': 'MSFT'}, now - 200, now - 140)
+    cache.set('stock_data_GOOGL', {'symbol': 'GOOGL'})
+    assert cache.get('stock_data_AAPL') is None
+    assert cache.lookup('stock_data_AAPL')[2] == 'stale'
+    assert cache.lookup('stock_data_MSFT')[2] is None
+
+    assert cache.sweep() == 1
+    assert list(cache.cache) == ['stock_data_AAPL', 'stock_data_GOOGL']
+    assert cache.bytes == held_bytes(cache)
+    assert cache.sweep(now + 31) == 1
+    assert list(cache.cache) == ['stock_data_GOOGL']
+    assert cache.bytes == held_bytes(cache) == estimate_size({'symbol': 'GOOGL'})
+    assert cache.expirations == 2
@@ -0,0 +1,31 @@
+from app import ChatAnswerCache
+
+MODEL = 'test-model'
+
+def remembered(threshold, question='Should I buy AAPL stock now?'):
+    cache = ChatAnswerCache(similarity_threshold=threshold)
+    cache.set(question, None, MODEL, 'answer', 1.5)
+    return cache
+
+def test_exact_repeat_hits_by_default():
+    cache = remembered(ChatAnswerCache().similarity_threshold)
+    assert cache.get('should i buy aapl stock now', None, MODEL) == 'answer'
+    assert cache.get('Should I buy AAPL stock today?', None, MODEL) is None
+
+def test_context_and_model_are_part_of_the_key():
+    cache = remembered(0)
+    assert cache.get('Should I buy AAPL stock now?', 'AAPL: $190', MODEL) is None
+    assert cache.get('Should I buy AAPL stock now?', None, 'other-model') is None
+
+def test_paraphrase_hits_when_enabled():
+    cache = remembered(0.5)
+    assert cache.get('Should I buy AAPL stock right now?', None, MODEL) == 'answer'
+
+def test_paraphrase_must_keep_direction_ticker_and_numbers():
+    cache = remembered(0.5)
+    assert cache.get('Should I sell AAPL stock now?', None, MODEL) is None
+    assert cache.get('Should I buy TSLA stock now?', None, MODEL) is None
+    assert cache.get('Should I not buy AAPL stock now?', None, MODEL) is None
+    cache = remembered(0.5, 'Is AAPL a buy under 150?')
+    assert cache.get('Is AAPL a buy under 180?', None, MODEL) is None
+    assert cache.stats()['near_hits'] == 0
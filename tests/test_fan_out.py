@@ -0,0 +1,39 @@
+import pytest
+
+import app as market_app
+from app import UpstreamScheduler
+from circuit_breaker import CircuitBreaker
+
+SYMBOLS = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'META', 'NVDA', 'NFLX', 'AMD', 'INTC', 'ORCL', 'IBM']
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """A small, fast bucket: two tokens at once, then one every 50ms"""
+    scheduler = UpstreamScheduler('test', rate_per_second=20.0, burst=2)
+    monkeypatch.setattr(market_app, 'yahoo_scheduler', scheduler)
+    monkeypatch.setattr(market_app, 'yahoo_breaker', CircuitBreaker('test'))
+    # A single request would give up almost at once; a fan-out waits until its own deadline
+    monkeypatch.setattr(market_app, 'YAHOO_MAX_WAIT_SECONDS', 0.01)
+    market_app.cache.clear()
+    yield scheduler
+    market_app.cache.clear()
+
+def test_portfolio_beyond_the_burst_is_paced_not_failed(scheduler):
+    client = market_app.app.test_client()
+    body = client.post('/api/portfolio', json={'symbols': SYMBOLS}).get_json()
+    assert body['symbol_status'] == {symbol: 'ok' for symbol in SYMBOLS}
+    assert not any(analysis.get('demo_mode') for analysis in body['individual_analysis'])
+    stats = scheduler.stats()
+    assert stats['rejected'] == 0 and stats['waited'] > 0
+
+def test_fan_out_rejects_what_cannot_start_before_the_deadline(scheduler):
+    scheduler.rate = 1.0
+    results = market_app.fan_out(market_app.analyzer.get_stock_data, SYMBOLS[:6], deadline=0.5)
+    errors = [result for status, result in results.values() if status == 'error']
+    assert errors and all('retry_after' in result and not result.get('demo_mode') for result in errors)
+
+def test_trending_snapshot_has_every_symbol(scheduler):
+    snapshot = market_app.TrendingSnapshot(market_app.TRENDING_SYMBOLS, refresh_seconds=3600).refresh()
+    assert snapshot['symbol_status'] == ','.join(f'{symbol}=ok' for symbol in market_app.TRENDING_SYMBOLS)
+    assert not snapshot['partial']
+    assert b'demo_mode' not in snapshot['payload'].body
@@ -0,0 +1,121 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app as market_app
+from history_store import HistoryStore
+from providers import PERIOD_TRADING_DAYS
+
+TODAY = np.datetime64(pd.Timestamp.today().date())
+
+class Upstream:
+    """yfinance-style history ending at `end`; close is a function of the date so periods agree"""
+    def __init__(self, end=TODAY, scale=1.0):
+        self.end = end
+        self.scale = scale
+        self.periods = []
+
+    def __call__(self, period):
+        self.periods.append(period)
+        days = np.arange(np.datetime64('2015-01-02'), self.end + 1)
+        days = days[np.is_busday(days)][-PERIOD_TRADING_DAYS[period]:]
+        close = (100 + (days - np.datetime64('2015-01-02')).astype(float) / 10) * self.scale
+        return pd.DataFrame(
+            {'Open': close - 1, 'High': close + 1, 'Low': close - 2, 'Close': close, 'Volume': 1000.0},
+            index=pd.DatetimeIndex(days)
+        )
+
+def bars(frame):
+    return frame.index.values.astype('datetime64[s]').astype(np.int64).tolist(), frame['Close'].tolist()
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(str(tmp_path / 'history'), refresh_seconds=900)
+
+def test_first_use_downloads_the_whole_period(store):
+    upstream = Upstream()
+    history = store.sync('AAPL', '1y', upstream)
+    assert upstream.periods == ['1y']
+    assert (history.t.tolist(), history.close.tolist()) == bars(upstream('1y'))
+    assert store.stats()['full_fetches'] == 1
+
+def test_recently_checked_bars_are_served_without_fetching(store):
+    store.sync('AAPL', '1y', Upstream())
+    upstream = Upstream()
+    history = store.sync('AAPL', '6mo', upstream)
+    assert upstream.periods == []
+    assert len(history) == PERIOD_TRADING_DAYS['6mo']
+    assert store.stats()['fresh_reads'] == 1
+
+def test_refresh_fetches_only_the_missing_days(store):
+    store.sync('AAPL', '1y', Upstream(end=TODAY - 2))
+    store.refresh_seconds = 0
+    upstream = Upstream()
+    history = store.sync('AAPL', '1y', upstream)
+    assert upstream.periods[0] in ('5d', '1mo')
+    assert (history.t.tolist(), history.close.tolist()) == bars(upstream('1y'))
+    assert store.stats()['incremental_fetches'] == 1
+    assert store.stats()['full_fetches'] == 1
+
+def test_longer_gap_uses_the_smallest_covering_period(store):
+    store.sync('AAPL', '1y', Upstream(end=TODAY - 40))
+    store.refresh_seconds = 0
+    upstream = Upstream()
+    history = store.sync('AAPL', '1y', upstream)
+    assert upstream.periods[0] == '3mo'
+    # No bar is missing or duplicated where the stored and fetched bars meet
+    assert (history.t.tolist(), history.close.tolist()) == bars(upstream('1y'))
+    assert store.stats()['incremental_fetches'] == 1
+
+def test_deeper_period_downloads_it_whole_and_keeps_the_depth(store):
+    store.sync('AAPL', '6mo', Upstream())
+    upstream = Upstream()
+    history = store.sync('AAPL', '2y', upstream)
+    assert upstream.periods == ['2y']
+    assert len(history) == PERIOD_TRADING_DAYS['2y']
+    assert store.stats()['full_fetches'] == 2
+    # The deeper history now answers the shorter period from disk
+    assert len(store.sync('AAPL', '1y', upstream)) == PERIOD_TRADING_DAYS['1y']
+    assert upstream.periods == ['2y']
+
+def test_readjusted_series_is_replaced_whole(store):
+    store.sync('AAPL', '1y', Upstream(end=TODAY - 10))
+    store.refresh_seconds = 0
+    upstream = Upstream(scale=0.5)  # a 2:1 split re-adjusts every stored close
+    history = store.sync('AAPL', '1y', upstream)
+    assert upstream.periods[-1] == '1y'
+    assert history.close.tolist() == bars(upstream('1y'))[1]
+    assert store.stats()['readjusted'] == 1
+
+def test_shared_directory_is_refused(tmp_path):
+    root = tmp_path / 'history'
+    root.mkdir()
+    os.chmod(root, 0o777)
+    with pytest.raises(PermissionError):
+        HistoryStore(str(root))
+
+def test_planted_symlink_is_neither_read_nor_written_through(store, tmp_path):
+    store.sync('AAPL', '1y', Upstream())
+    data_path = os.path.join(store.root, 'AAPL.npy')
+    target = tmp_path / 'victim'
+    target.write_bytes(open(data_path, 'rb').read())
+    os.remove(data_path)
+    os.symlink(target, data_path)
+    original = target.read_bytes()
+
+    upstream = Upstream()
+    assert len(store.sync('AAPL', '1y', upstream)) == PERIOD_TRADING_DAYS['1y']
+    assert upstream.periods == ['1y']
+    assert target.read_bytes() == original
+    assert not os.path.islink(data_path)
+    assert not [name for name in os.listdir(store.root) if name.endswith('.tmp')]
+
+def test_default_store_lives_in_the_private_temp_directory(tmp_path, monkeypatch):
+    monkeypatch.delenv('HISTORY_STORE_PATH')
+    monkeypatch.setattr(tempfile, 'gettempdir', lambda: str(tmp_path))
+    store = market_app.create_history_store()
+    assert store.root == str(tmp_path / f'macra-{os.getuid()}' / 'history')
+    assert os.stat(store.root).st_mode & 0o777 == 0o700
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import latest_indicators, macd, rsi, sma
+from price_history import PriceHistory
+
+NAN = float('nan')
+
+def same(actual, expected):
+    np.testing.assert_allclose(actual, expected, rtol=1e-12, atol=1e-12, equal_nan=True)
+
+def test_sma_known_values():
+    same(sma([1, 2, 3, 4, 5], 3), [NAN, NAN, 2, 3, 4])
+
+def test_sma_shorter_than_the_window_is_all_nan():
+    same(sma([1, 2], 3), [NAN, NAN])
+    assert sma([], 3).shape == (0,)
+
+def test_sma_batches_symbols_row_by_row():
+    batch = sma([[1, 2, 3, 4], [10, 20, 30, 40]], 2)
+    same(batch, [[NAN, 1.5, 2.5, 3.5], [NAN, 15, 25, 35]])
+
+def test_rsi_known_values():
+    # deltas +1, -1, +1 with alpha 1/2: gains 1, .5, .75 and losses 0, .5, .25
+    same(rsi([1, 2, 1, 2], window=2), [NAN, NAN, 50, 75])
+
+def test_rsi_one_way_series_hit_the_bounds():
+    same(rsi(np.arange(1.0, 21.0), window=14)[14:], [100.0] * 6)
+    same(rsi(np.arange(20.0, 0.0, -1), window=14)[14:], [0.0] * 6)
+
+def test_rsi_shorter_than_the_window_is_all_nan():
+    assert np.isnan(rsi([1, 2, 3, 4, 5], window=14)).all()
+
+def test_macd_known_values():
+    # fast span 1 is the price itself; slow span 2 has alpha 2/3: 3, 5, 23/3
+    line, signal, histogram = macd([3.0, 6.0, 9.0], fast=1, slow=2, signal=1)
+    same(line, [NAN, 1, 4 / 3])
+    same(signal, [NAN, 1, 4 / 3])
+    same(histogram, [NAN, 0, 0])
+
+def test_macd_matches_pandas_ewm():
+    close = pd.Series(100 + np.sin(np.arange(60) / 5) * 10)
+    line = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    signal = line.ewm(span=9, adjust=False).mean()
+    macd_line, macd_signal, macd_histogram = macd(close.to_numpy())
+    same(macd_line[25:], line[25:])
+    same(macd_signal[33:], signal[33:])
+    same(macd_histogram[33:], (line - signal)[33:])
+    assert np.isnan(macd_line[:25]).all() and np.isnan(macd_signal[:33]).all()
+
+def test_macd_shorter_than_the_slow_window_is_all_nan():
+    for series in macd(np.arange(1.0, 11.0)):
+        assert np.isnan(series).all()
+
+@pytest.mark.parametrize('rows', [0, 1])
+def test_latest_indicators_need_two_bars(rows):
+    history = PriceHistory(*([1.0] * rows for _ in range(6)))
+    assert latest_indicators(history) == {}
+
+def test_latest_indicators_report_none_until_there_is_enough_history():
+    close = np.arange(1.0, 31.0)
+    history = PriceHistory(np.arange(30), close, close + 1, close - 1, close, np.full(30, 1000.0))
+    latest = latest_indicators(history)
+    assert latest['sma_20'] == pytest.approx(20.5)
+    assert latest['rsi_14'] == 100.0
+    assert latest['sma_50'] is None and latest['macd_signal'] is None
@@ -0,0 +1,27 @@
+import json
+import os
+
+import pytest
+
+from intent_router import IntentRouter
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'intent_corpus.json')
+
+with open(CORPUS, encoding='utf-8') as f:
+    CASES = json.load(f)
+
+router = IntentRouter()
+
+@pytest.mark.parametrize('case', CASES, ids=[case['message'] or '<empty>' for case in CASES])
+def test_corpus_label(case):
+    intent = router.route(case['message'])
+    assert (intent.name, intent.local) == (case['intent'], case['local'])
+
+def test_confidence_grows_with_the_matched_share_of_the_message():
+    short = router.route('hello')
+    long = router.route('hello, can you explain bond duration and convexity?')
+    assert short.name == long.name == 'greeting'
+    assert short.confidence > long.confidence
+
+def test_no_match_is_default():
+    assert router.route('tell me about bond convexity') == ('default', 0.0, False)
@@ -0,0 +1,73 @@
+import gzip
+import json
+
+import pytest
+from flask import Response
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+import app as market_app
+import json_response
+from json_response import EncodedPayload, compress_response
+
+@pytest.fixture
+def client():
+    market_app.cache.clear()
+    yield market_app.app.test_client()
+    market_app.cache.clear()
+
+def accept(header):
+    return parse_accept_header(header, Accept)
+
+def test_cached_quote_is_served_gzipped_when_accepted(client):
+    plain = client.get('/api/stock/AAPL')
+    assert 'Content-Encoding' not in plain.headers
+    compressed = client.get('/api/stock/AAPL', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(compressed.data)) == plain.get_json()
+    assert plain.headers['Vary'] == compressed.headers['Vary'] == 'Accept-Encoding'
+
+def test_buffered_json_is_compressed_by_the_after_request_hook(client):
+    response = client.get('/api/symbol/AAPL', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.data))['symbol'] == 'AAPL'
+
+def test_small_bodies_stay_uncompressed_but_vary(client):
+    response = client.get('/api/symbol/AA$PL', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+def test_refused_encoding_falls_back_to_identity():
+    payload = EncodedPayload(b'[' + b'1,' * 1000 + b'1]')
+    assert payload.select(accept('gzip;q=0')) == (None, payload.body)
+    assert payload.select(accept('gzip, deflate'))[0] == 'gzip'
+
+@pytest.mark.skipif(json_response.brotli is None, reason='Brotli is not installed')
+def test_brotli_is_preferred_when_installed():
+    payload = EncodedPayload(b'[' + b'1,' * 1000 + b'1]')
+    encoding, body = payload.select(accept('gzip, br'))
+    assert encoding == 'br' and json_response.brotli.decompress(body) == payload.body
+
+def test_gzip_is_the_only_encoding_without_brotli(monkeypatch):
+    monkeypatch.setattr(json_response, 'brotli', None)
+    payload = EncodedPayload(b'[' + b'1,' * 1000 + b'1]')
+    assert list(payload.variants) == ['gzip']
+    assert payload.select(accept('br')) == (None, payload.body)
+
+def test_compressed_response_gets_its_own_strong_etag():
+    response = Response(b'{"a":"' + b'x' * 2000 + b'"}', mimetype='application/json')
+    response.set_etag('abc')
+    compress_response(response, accept('gzip'))
+    assert response.get_etag() == ('abc-gzip', False)
+
+def test_trending_answers_304_for_a_matching_etag(client):
+    first = client.get('/api/trending', headers={'Accept-Encoding': 'gzip'})
+    assert first.status_code == 200 and first.headers['ETag'].endswith('-gzip"')
+    assert first.headers['Vary'] == 'Accept-Encoding'
+    again = client.get('/api/trending', headers={'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and again.data == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+    # The gzip validator does not match the identity body
+    plain = client.get('/api/trending', headers={'If-None-Match': first.headers['ETag']})
+    assert plain.status_code == 200 and 'Content-Encoding' not in plain.headers
@@ -0,0 +1,86 @@
+import os
+import pickle
+import sqlite3
+import tempfile
+import time
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+import app as market_app
+from app import DataCache, SQLiteCacheTier
+from price_history import PriceHistory
+
+@pytest.fixture
+def tier(tmp_path):
+    return SQLiteCacheTier(str(tmp_path / 'cache.sqlite3'))
+
+def quote():
+    history = PriceHistory([1700000000, 1700086400], [1.0, float('nan')], [2.0, 3.0], [0.5, 1.5], [1.5, 2.5], [100, 200])
+    return {'symbol': 'AAPL', 'current_price': 2.5, 'indicators': {'rsi_14': 55.0}, 'historical_data': history}
+
+def test_round_trip_keeps_price_history(tier):
+    now = time.time()
+    tier.set('stock_data_AAPL', quote(), now, now + 60, now + 120)
+    data, stored_at, expires_at = tier.get('stock_data_AAPL')
+    assert (stored_at, expires_at) == (now, now + 60)
+    assert data['current_price'] == 2.5 and data['indicators'] == {'rsi_14': 55.0}
+    history = data['historical_data']
+    assert isinstance(history, PriceHistory)
+    assert history.t.tolist() == [1700000000, 1700086400]
+    assert history.open[0] == 1.0 and np.isnan(history.open[1])
+
+def test_expired_rows_are_stale_then_swept(tmp_path):
+    tier = SQLiteCacheTier(str(tmp_path / 'cache.sqlite3'))
+    cache = DataCache(namespace_windows={'stock_data': {'fresh': timedelta(seconds=60), 'stale': timedelta(seconds=60)}}, l2=tier)
+    now = time.time()
+    tier.set('stock_data_AAPL', {'current_price': 1.0}, now - 90, now - 30, now + 30)
+    data, _, status = cache.lookup('stock_data_AAPL')
+    assert status == 'stale' and data == {'current_price': 1.0}
+    assert tier.sweep(now + 31) == 1
+    assert tier.get('stock_data_AAPL') is None
+
+def test_corrupt_row_is_dropped_as_a_miss(tier):
+    now = time.time()
+    with sqlite3.connect(tier.path) as conn:
+        conn.execute("INSERT INTO cache VALUES (?, ?, ?, ?, ?)", ('stock_data_AAPL', b'\x80\x04not json', now, now + 60, now + 120))
+    assert tier.get('stock_data_AAPL') is None
+    assert tier.stats()['errors'] == 1
+    assert tier.stats()['entries'] == 0
+
+def test_values_are_never_unpickled(tier):
+    now = time.time()
+    with sqlite3.connect(tier.path) as conn:
+        conn.execute("INSERT INTO cache VALUES (?, ?, ?, ?, ?)", ('k', pickle.dumps({'a': 1}), now, now + 60, now + 120))
+    assert tier.get('k') is None
+
+def test_file_owned_by_someone_else_is_refused(tmp_path, monkeypatch):
+    path = tmp_path / 'cache.sqlite3'
+    path.touch()
+    monkeypatch.setattr(os, 'getuid', lambda: os.stat(path).st_uid + 1)
+    with pytest.raises(PermissionError):
+        SQLiteCacheTier(str(path))
+
+def test_symlinked_file_is_refused(tmp_path):
+    target = tmp_path / 'elsewhere.sqlite3'
+    target.touch()
+    (tmp_path / 'cache.sqlite3').symlink_to(target)
+    with pytest.raises(PermissionError):
+        SQLiteCacheTier(str(tmp_path / 'cache.sqlite3'))
+
+def test_default_directory_is_private(tmp_path, monkeypatch):
+    monkeypatch.delenv('CACHE_L2_PATH')
+    monkeypatch.setattr(tempfile, 'gettempdir', lambda: str(tmp_path))
+    tier = market_app.create_l2_cache()
+    directory = os.path.dirname(tier.path)
+    assert os.stat(directory).st_mode & 0o777 == 0o700
+    assert os.stat(tier.path).st_mode & 0o777 == 0o600
+
+def test_shared_default_directory_is_refused(tmp_path, monkeypatch):
+    monkeypatch.delenv('CACHE_L2_PATH')
+    monkeypatch.setattr(tempfile, 'gettempdir', lambda: str(tmp_path))
+    directory = tmp_path / f'macra-{os.getuid()}'
+    directory.mkdir(mode=0o777)
+    os.chmod(directory, 0o777)
+    assert market_app.create_l2_cache() is None
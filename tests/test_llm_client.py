@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+import app as market_app
+import llm_client
+from circuit_breaker import CircuitBreaker
+from fake_openrouter import ANSWER, FakeOpenRouter
+from llm_client import LLMStreamInterrupted, OpenRouterClient
+
+MESSAGES = [{'role': 'user', 'content': 'Explain bond duration and convexity'}]
+
+@pytest.fixture
+def upstream():
+    fake = FakeOpenRouter(latency=0.0, token_interval=0.0).start()
+    yield fake
+    fake.stop()
+
+def client(fake, models=('model-a', 'model-b'), **kwargs):
+    return OpenRouterClient('test-key', base_url=fake.base_url, models=list(models), timeout=5.0, **kwargs)
+
+def test_stream_yields_the_whole_answer(upstream):
+    breaker = CircuitBreaker('test')
+    assert ''.join(client(upstream, breaker=breaker).stream(MESSAGES)) == ANSWER + ' '
+    assert breaker.stats()['state'] == 'closed'
+
+def test_stream_cut_mid_answer_raises(upstream):
+    upstream.cut_after_tokens = 3
+    breaker = CircuitBreaker('test', min_calls=1, failure_threshold=0.5)
+    deltas = client(upstream, breaker=breaker).stream(MESSAGES)
+    received = []
+    with pytest.raises(LLMStreamInterrupted):
+        for text in deltas:
+            received.append(text)
+    assert len(received) == 3
+    # Committed to the first model: the second one is never asked to finish the answer
+    assert upstream.stats()['by_model'] == {'model-a': 1}
+    assert breaker.stats()['state'] == 'open'
+
+def test_chat_stream_reports_a_cut_answer_as_an_error_and_does_not_cache_it(upstream, monkeypatch):
+    upstream.cut_after_tokens = 3
+    monkeypatch.setattr(market_app.analyzer, 'llm', client(upstream))
+    monkeypatch.setattr(market_app, 'chat_cache', market_app.ChatAnswerCache())
+    body = market_app.app.test_client().post('/api/chat/stream', json={'message': MESSAGES[0]['content']}).get_data(as_text=True)
+    events = [block.split('\n', 1)[0] for block in body.strip().split('\n\n')]
+    assert events == ['event: token'] * 3 + ['event: error']
+    assert market_app.chat_cache.stats()['entries'] == 0
+
+def test_chat_stream_caches_a_finished_answer(upstream, monkeypatch):
+    monkeypatch.setattr(market_app.analyzer, 'llm', client(upstream))
+    monkeypatch.setattr(market_app, 'chat_cache', market_app.ChatAnswerCache())
+    body = market_app.app.test_client().post('/api/chat/stream', json={'message': MESSAGES[0]['content']}).get_data(as_text=True)
+    assert body.rstrip().split('\n\n')[-1].startswith('event: done')
+    assert market_app.chat_cache.get(MESSAGES[0]['content'], None, 'model-a') == ANSWER + ' '
+
+def test_failed_model_hands_over_to_the_next(upstream):
+    # Every other call is a 429: model-a gets one, model-b answers
+    upstream.rate_limit_every, upstream.rate_limit_burst = 2, 1
+    llm = client(upstream)
+    assert llm.complete(MESSAGES) == ANSWER
+    assert upstream.stats()['by_model'] == {'model-a': 1, 'model-b': 1}
+    assert llm.stats()['models']['model-a']['errors'] == 1
+    assert llm.stats()['models']['model-b']['hedge_wins'] == 1
+
+def test_slow_model_is_hedged(upstream):
+    upstream.latency = 0.3
+    llm = client(upstream, default_hedge_delay=0.05, min_hedge_delay=0.05)
+    assert llm.complete(MESSAGES) == ANSWER
+    assert llm.stats()['hedges_fired'] == 1
+    assert set(upstream.stats()['by_model']) == {'model-a', 'model-b'}
+
+def test_every_model_failing_returns_none_and_counts_against_the_breaker(upstream):
+    upstream.error_rate = 1.0
+    breaker = CircuitBreaker('test', min_calls=1)
+    assert client(upstream, breaker=breaker).complete(MESSAGES) is None
+    assert breaker.stats()['state'] == 'open'
+    assert upstream.stats()['errors'] == 2
+
+def test_open_breaker_skips_the_network(upstream):
+    breaker = CircuitBreaker('test')
+    breaker.trip('test')
+    assert client(upstream, breaker=breaker).complete(MESSAGES) is None
+    assert upstream.stats()['calls'] == 0
+
+def test_async_complete_matches_the_threaded_one(upstream):
+    upstream.rate_limit_every, upstream.rate_limit_burst = 2, 1
+    llm = client(upstream)
+
+    async def ask():
+        try:
+            return await llm.complete_async(MESSAGES)
+        finally:
+            await llm.aclose()
+    assert asyncio.run(ask()) == ANSWER
+    assert upstream.stats()['by_model'] == {'model-a': 1, 'model-b': 1}
+
+def test_threaded_async_fallback_does_not_starve_its_own_pool(upstream, monkeypatch):
+    monkeypatch.setattr(llm_client, 'httpx', None)
+    llm = client(upstream, models=('model-a',), pool_size=2)
+
+    async def ask_all():
+        return await asyncio.gather(*(llm.complete_async(MESSAGES) for _ in range(4)))
+    assert asyncio.run(ask_all()) == [ANSWER] * 4
+    assert upstream.stats()['calls'] == 4
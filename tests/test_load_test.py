@@ -0,0 +1,33 @@
+import app as market_app
+from app import UpstreamScheduler
+from circuit_breaker import CircuitBreaker
+from fake_openrouter import FakeOpenRouter
+from llm_client import OpenRouterClient
+from load_test import ClientTarget, build_plan, parse_mix, percentile, run, summarize
+
+MIX = parse_mix('search=60,portfolio=10,trending=20,chat=10')
+
+def test_plan_is_reproducible_from_its_seed():
+    assert build_plan(200, MIX, 50, seed=3) == build_plan(200, MIX, 50, seed=3)
+    assert build_plan(200, MIX, 50, seed=3) != build_plan(200, MIX, 50, seed=4)
+    assert {kind for kind, _, _, _ in build_plan(200, MIX, 50, seed=3)} == set(MIX)
+
+def test_percentile_picks_the_nearest_rank():
+    values = list(range(101))
+    assert (percentile(values, 0.5), percentile(values, 0.99), percentile([], 0.5)) == (50, 99, 0.0)
+
+def test_mixed_traffic_runs_clean_against_the_fakes(monkeypatch):
+    fake = FakeOpenRouter(latency=0.0, token_interval=0.0).start()
+    try:
+        monkeypatch.setattr(market_app, 'yahoo_scheduler', UpstreamScheduler('test', rate_per_second=1000.0, burst=50))
+        monkeypatch.setattr(market_app, 'yahoo_breaker', CircuitBreaker('test'))
+        monkeypatch.setattr(market_app.analyzer, 'llm', OpenRouterClient('test-key', base_url=fake.base_url, models=['model-a']))
+        market_app.cache.clear()
+        results, elapsed = run(ClientTarget(), build_plan(60, MIX, 30, seed=1), concurrency=4, duration=None)
+        report = summarize(results, elapsed)
+        assert report['requests'] == 60
+        assert report['kinds']['all']['ok'] == 60
+        assert fake.stats()['calls'] > 0
+    finally:
+        fake.stop()
+        market_app.cache.clear()
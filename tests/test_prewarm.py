@@ -0,0 +1,62 @@
+import pytest
+
+import app as market_app
+from app import Prewarmer, UpstreamScheduler
+from circuit_breaker import CircuitBreaker
+from providers import BatchingProvider, FakeMarketDataProvider, FakeUpstreamError
+
+class FlakyProvider(FakeMarketDataProvider):
+    """Fake Yahoo that times out on every info call for some symbols"""
+    def __init__(self, failing):
+        super().__init__()
+        self.failing = set(failing)
+
+    def get_info(self, symbol):
+        if symbol in self.failing:
+            raise FakeUpstreamError('Read timed out')
+        return super().get_info(symbol)
+
+@pytest.fixture
+def warm(monkeypatch):
+    monkeypatch.setattr(market_app, 'yahoo_scheduler', UpstreamScheduler('test', rate_per_second=100.0, burst=20))
+    monkeypatch.setattr(market_app, 'yahoo_breaker', CircuitBreaker('test'))
+    monkeypatch.setattr(market_app, 'MAX_INLINE_RETRY_DELAY', 0.0)
+    snapshot_starts = []
+    monkeypatch.setattr(market_app.trending_snapshot, 'start', lambda: snapshot_starts.append(1))
+    market_app.cache.clear()
+
+    def run(symbols, failing=()):
+        provider = BatchingProvider(FlakyProvider(failing), window_seconds=0.0)
+        monkeypatch.setattr(market_app, 'analyzer', market_app.StockAnalyzer(provider=provider))
+        prewarmer = Prewarmer(symbols).start()
+        prewarmer.thread.join(10)
+        return prewarmer, snapshot_starts
+    yield run
+    market_app.cache.clear()
+
+def test_prewarm_fills_the_cache_for_the_configured_symbols(warm):
+    prewarmer, snapshot_starts = warm(['AAPL', 'MSFT', 'IBM'])
+    assert prewarmer.stats()['state'] == 'done'
+    assert prewarmer.stats()['symbols'] == {'AAPL': 'ok', 'MSFT': 'ok', 'IBM': 'ok'}
+    for symbol in ('AAPL', 'MSFT', 'IBM'):
+        assert market_app.cache.peek(f'stock_data_{symbol}', local_only=True)['symbol'] == symbol
+    assert snapshot_starts == [1]
+
+def test_upstream_failures_do_not_stop_the_prewarm(warm):
+    prewarmer, snapshot_starts = warm(['AAPL', 'IBM'], failing={'IBM'})
+    assert prewarmer.stats()['state'] == 'done'
+    assert prewarmer.stats()['symbols']['AAPL'] == 'ok'
+    assert prewarmer.stats()['symbols']['IBM'] != 'ok'
+    assert market_app.cache.peek('stock_data_AAPL', local_only=True) is not None
+    assert market_app.cache.peek('stock_data_IBM', stale=True) is None
+    # The trending snapshot still starts after a partial warm-up
+    assert snapshot_starts == [1]
+
+def test_a_failing_warm_up_is_recorded_not_raised(warm, monkeypatch):
+    def broken():
+        raise ImportError('yfinance is missing')
+    monkeypatch.setattr(market_app, 'preload_data_stack', broken)
+    prewarmer, snapshot_starts = warm(['AAPL'])
+    assert prewarmer.stats()['state'] == 'failed'
+    assert prewarmer.seconds is not None
+    assert snapshot_starts == []
@@ -0,0 +1,145 @@
+import threading
+
+import pandas as pd
+import pytest
+import yfinance
+from yfinance import shared
+
+import app as market_app
+from app import UpstreamScheduler
+from circuit_breaker import CircuitBreaker
+from providers import BatchingProvider, FakeMarketDataProvider, FakeUpstreamError, UpstreamFetchError, YahooProvider
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    """A StockAnalyzer on its own fake provider, with a roomy Yahoo budget and no inline retries"""
+    monkeypatch.setattr(market_app, 'yahoo_scheduler', UpstreamScheduler('test', rate_per_second=100.0, burst=20))
+    monkeypatch.setattr(market_app, 'yahoo_breaker', CircuitBreaker('test'))
+    monkeypatch.setattr(market_app, 'MAX_INLINE_RETRY_DELAY', 0.0)
+    market_app.cache.clear()
+    analyzer = market_app.StockAnalyzer(provider=BatchingProvider(FakeMarketDataProvider(known_symbols={'AAPL', 'MSFT', 'IBM'}), window_seconds=0.0))
+    yield analyzer
+    market_app.cache.clear()
+
+def test_fake_history_is_deterministic_per_symbol():
+    first = FakeMarketDataProvider().download(['AAPL', 'MSFT'], '1mo')
+    second = FakeMarketDataProvider(seed=7).download(['AAPL'], '1mo')
+    assert first['AAPL'].equals(second['AAPL'])
+    assert not first['AAPL']['Close'].equals(first['MSFT']['Close'])
+
+def test_rate_limit_bursts_repeat_on_schedule():
+    provider = FakeMarketDataProvider(rate_limit_every=4, rate_limit_burst=2)
+    outcomes = []
+    for _ in range(8):
+        try:
+            provider.get_info('AAPL')
+            outcomes.append('ok')
+        except FakeUpstreamError as e:
+            assert '429' in str(e)
+            outcomes.append('429')
+    assert outcomes == ['ok', '429', '429', 'ok'] * 2
+    assert provider.stats()['injected_rate_limits'] == 4
+
+def test_concurrent_history_requests_share_one_download():
+    fake = FakeMarketDataProvider(latency_seconds=0.05)
+    provider = BatchingProvider(fake, window_seconds=0.05)
+    symbols = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA']
+    results = {}
+    threads = [threading.Thread(target=lambda s=s: results.__setitem__(s, provider.get_history(s, '1mo'))) for s in symbols]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == sorted(symbols)
+    assert fake.stats()['download_calls'] == 1
+    assert provider.stats()['symbols_per_batch'] == 5
+
+def test_unknown_symbol_is_negative_cached(analyzer):
+    assert 'No data found' in analyzer.get_stock_data('ZZZZ')['error']
+    calls = analyzer.provider.provider.stats()['info_calls']
+    assert 'No data found' in analyzer.get_stock_data('ZZZZ')['error']
+    assert analyzer.provider.provider.stats()['info_calls'] == calls
+
+def test_upstream_429_serves_demo_data_without_caching_it(analyzer):
+    analyzer.provider.provider.rate_limit_every = 1
+    analyzer.provider.provider.rate_limit_burst = 1
+    result = analyzer.get_stock_data('AAPL')
+    assert result['demo_mode']
+    assert market_app.cache.peek('stock_data_AAPL', stale=True) is None
+
+def test_upstream_429_without_demo_data_asks_to_retry(analyzer):
+    analyzer.provider.provider.rate_limit_every = 1
+    analyzer.provider.provider.rate_limit_burst = 1
+    result = analyzer.get_stock_data('IBM')
+    assert 'error' in result and result['retry_after'] >= 1 and not result.get('demo_mode')
+
+def test_injected_errors_are_retried(analyzer, monkeypatch):
+    fake = analyzer.provider.provider
+    fake.rate_limit_every, fake.rate_limit_burst = 3, 1
+    monkeypatch.setattr(market_app, 'MAX_INLINE_RETRY_DELAY', 10.0)
+    market_app.yahoo_scheduler.base_delay = 0.01
+    result = analyzer.get_stock_data('IBM')
+    assert result['current_price'] > 0 and not result.get('demo_mode')
+    assert fake.stats()['injected_rate_limits'] >= 1
+
+def yahoo_frame(symbols, failed=()):
+    """yf.download(group_by='ticker') output, with all-NaN columns for the failed tickers"""
+    frames = FakeMarketDataProvider().download(list(symbols), '1mo')
+    for symbol in failed:
+        frames[symbol] = frames[symbol] * float('nan')
+    return pd.concat(frames, axis=1)
+
+def test_yahoo_per_ticker_failures_are_raised_not_returned_empty(monkeypatch):
+    def download(symbols, **kwargs):
+        monkeypatch.setattr(shared, '_ERRORS', {'MSFT': "HTTPError('429 Client Error: Too Many Requests')",
+                                                'ZZZZ': 'No data found, symbol may be delisted'}, raising=False)
+        return yahoo_frame(symbols, failed=['MSFT', 'ZZZZ'])
+    monkeypatch.setattr(yfinance, 'download', download)
+    histories = YahooProvider().download(['AAPL', 'MSFT', 'ZZZZ'], '1mo')
+    assert len(histories['AAPL']) == 21
+    assert isinstance(histories['MSFT'], UpstreamFetchError) and '429' in str(histories['MSFT'])
+    # Yahoo answered that it has nothing, so the symbol can still be negative-cached
+    assert len(histories['ZZZZ']) == 0
+
+class PartlyFailingProvider(FakeMarketDataProvider):
+    """Batch downloads where one ticker timed out, the way YahooProvider reports it"""
+    def __init__(self, failing, **kwargs):
+        super().__init__(**kwargs)
+        self.failing = set(failing)
+
+    def download(self, symbols, period):
+        histories = super().download(symbols, period)
+        for symbol in self.failing & set(symbols):
+            histories[symbol] = UpstreamFetchError(f'{symbol}: Read timed out')
+        return histories
+
+def test_failed_ticker_fails_only_its_own_caller():
+    provider = BatchingProvider(PartlyFailingProvider({'MSFT'}), window_seconds=0.05)
+    results = {}
+
+    def fetch(symbol):
+        try:
+            results[symbol] = len(provider.get_history(symbol, '1mo'))
+        except UpstreamFetchError as e:
+            results[symbol] = e
+    threads = [threading.Thread(target=fetch, args=(symbol,)) for symbol in ('AAPL', 'MSFT')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results['AAPL'] == 21
+    assert isinstance(results['MSFT'], UpstreamFetchError)
+
+def test_failed_ticker_is_retried_and_never_cached(monkeypatch):
+    monkeypatch.setattr(market_app, 'yahoo_scheduler', UpstreamScheduler('test', rate_per_second=100.0, burst=20))
+    monkeypatch.setattr(market_app, 'yahoo_breaker', CircuitBreaker('test'))
+    monkeypatch.setattr(market_app, 'MAX_INLINE_RETRY_DELAY', 0.0)
+    market_app.cache.clear()
+    analyzer = market_app.StockAnalyzer(provider=BatchingProvider(PartlyFailingProvider({'IBM'}, known_symbols={'IBM'}), window_seconds=0.0))
+    result = analyzer.get_stock_data('IBM')
+    assert 'error' in result and result['retry_after'] >= 1
+    assert market_app.yahoo_scheduler.stats()['consecutive_failures'] == 1
+    assert market_app.yahoo_breaker.stats()['window_failures'] == 1
+    assert market_app.cache.peek('stock_data_IBM', stale=True) is None
+    assert market_app.cache.peek('not_found_IBM', stale=True) is None
+    market_app.cache.clear()
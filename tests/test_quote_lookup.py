@@ -0,0 +1,77 @@
+import pytest
+
+import app as market_app
+from app import UpstreamScheduler
+from circuit_breaker import CircuitBreaker
+
+@pytest.fixture
+def fresh(monkeypatch):
+    monkeypatch.setattr(market_app, 'yahoo_scheduler', UpstreamScheduler('test', rate_per_second=50.0, burst=5))
+    monkeypatch.setattr(market_app, 'yahoo_breaker', CircuitBreaker('test'))
+    market_app.cache.clear()
+    yield market_app.cache
+    market_app.cache.clear()
+
+def counters(cache):
+    stats = cache.stats()
+    return stats['hits'], stats['misses']
+
+def test_cached_quote_is_one_hit_and_no_miss(fresh):
+    market_app.analyzer.get_stock_data('AAPL')
+    before = counters(fresh)
+    market_app.analyzer.get_stock_data('AAPL')
+    hits, misses = counters(fresh)
+    assert (hits - before[0], misses - before[1]) == (1, 0)
+
+def test_known_missing_symbol_is_answered_from_the_negative_cache(fresh, monkeypatch):
+    fresh.set('not_found_ZZZZ', {'error': 'No data found for symbol ZZZZ.'})
+    monkeypatch.setattr(market_app.analyzer.provider, 'get_info', lambda symbol: pytest.fail('went upstream'))
+    assert market_app.analyzer.get_stock_data('ZZZZ') == {'error': 'No data found for symbol ZZZZ.'}
+
+def test_peek_counts_nothing(fresh):
+    fresh.set('stock_data_AAPL', {'symbol': 'AAPL'})
+    before = counters(fresh)
+    assert fresh.peek('stock_data_AAPL') == {'symbol': 'AAPL'}
+    assert fresh.peek('stock_data_MSFT') is None
+    assert counters(fresh) == before
+
+def test_rejected_probe_hands_the_slot_back(fresh, monkeypatch):
+    breaker = CircuitBreaker('test', cooldown_seconds=0.0)
+    breaker.trip('test')
+    monkeypatch.setattr(market_app, 'yahoo_breaker', breaker)
+    scheduler = market_app.yahoo_scheduler
+    while scheduler.try_acquire():
+        pass
+    result = market_app.analyzer.get_stock_data('AAPL', max_wait=0)
+    assert 'retry_after' in result
+    # Without the release the breaker would refuse every caller until a full cooldown passed
+    breaker.cooldown_seconds = 60.0
+    assert breaker.allow()
+
+def test_bulk_quotes_count_one_lookup_per_cached_symbol(fresh):
+    symbols = ['AAPL', 'MSFT', 'GOOGL']
+    for symbol in symbols:
+        market_app.analyzer.get_stock_data(symbol)
+    before = counters(fresh)
+    lines = market_app.app.test_client().get('/api/quotes?symbols=' + ','.join(symbols)).get_data(as_text=True).splitlines()
+    assert len(lines) == len(symbols) + 1
+    hits, misses = counters(fresh)
+    assert (hits - before[0], misses - before[1]) == (len(symbols), 0)
+
+def test_bulk_quotes_accept_a_posted_object(fresh):
+    response = market_app.app.test_client().post('/api/quotes', json={'symbols': ['AAPL', 'MSFT']})
+    lines = response.get_data(as_text=True).splitlines()
+    assert response.status_code == 200 and len(lines) == 3
+
+@pytest.mark.parametrize('body', [['AAPL', 'MSFT'], 'AAPL', 42])
+def test_bulk_quotes_reject_a_body_that_is_not_an_object(fresh, body):
+    response = market_app.app.test_client().post('/api/quotes', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_stale_quote_still_counts_as_cached(fresh):
+    now = market_app.time.time()
+    with fresh.lock:
+        fresh._store('stock_data_AAPL', {'symbol': 'AAPL'}, now - 1000, now - 100)
+    assert market_app.quote_is_cached('AAPL')
+    assert not market_app.quote_is_cached('MSFT')
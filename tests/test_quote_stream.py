@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+import app as market_app
+from app import UpstreamScheduler
+from quote_stream import FakeTicker, QuoteHub, SubscriberLimitError
+
+def drain(subscription, until, timeout=2.0):
+    """Read updates until until(updates so far) holds or timeout passes"""
+    updates = []
+    deadline = time.monotonic() + timeout
+    while not until(updates) and time.monotonic() < deadline:
+        updates += subscription.next(0.05)
+    return updates
+
+def test_subscribers_get_a_snapshot_then_changes():
+    hub = QuoteHub(FakeTicker(), interval_seconds=0.05)
+    subscription = hub.subscribe(['AAPL'])
+    updates = drain(subscription, lambda updates: len(updates) >= 2)
+    assert updates[0][0] == 'snapshot' and updates[0][1]['quote']['current_price'] > 0
+    assert updates[1][0] == 'quote' and 'current_price' in updates[1][1]['changes']
+    hub.unsubscribe(subscription)
+
+def test_one_poll_serves_every_viewer_of_a_symbol():
+    ticker = FakeTicker()
+    hub = QuoteHub(ticker, interval_seconds=0.2)
+    viewers = [hub.subscribe(['AAPL']) for _ in range(5)]
+    time.sleep(0.5)
+    assert ticker.calls <= 3
+    assert all(drain(viewer, bool)[0][0] == 'snapshot' for viewer in viewers)
+    late = hub.subscribe(['AAPL'])
+    assert late.next(0)[0][0] == 'snapshot'
+
+def test_slow_reader_gets_coalesced_updates():
+    hub = QuoteHub(FakeTicker(), interval_seconds=0.02)
+    subscription = hub.subscribe(['AAPL', 'MSFT'])
+    time.sleep(0.3)
+    updates = subscription.next(0)
+    assert len(updates) <= 2
+    assert hub.stats()['coalesced'] > 0
+
+def test_subscriber_limit():
+    hub = QuoteHub(FakeTicker(), interval_seconds=60, max_subscribers=2)
+    hub.subscribe(['AAPL'])
+    hub.subscribe(['MSFT'])
+    with pytest.raises(SubscriberLimitError):
+        hub.subscribe(['GOOGL'])
+
+def test_failing_symbol_backs_off():
+    calls = []
+
+    def fetch(symbol):
+        calls.append(time.monotonic())
+        return None
+    hub = QuoteHub(fetch, interval_seconds=0.05, max_backoff_seconds=0.4)
+    hub.subscribe(['AAPL'])
+    time.sleep(1.0)
+    gaps = [later - earlier for earlier, later in zip(calls, calls[1:])]
+    # 0.1, 0.2, 0.4, 0.4 ... rather than a poll every 0.05s
+    assert len(calls) <= 6 and gaps[1] > gaps[0]
+    assert hub.stats()['backing_off'] == 1
+
+def test_background_fetch_leaves_the_reserve_for_requests():
+    scheduler = UpstreamScheduler('test', rate_per_second=0.01, burst=3)
+    assert scheduler.acquire(0, reserve=2)
+    assert not scheduler.acquire(0, reserve=2)
+    assert scheduler.try_acquire() and scheduler.try_acquire()
+
+def test_poller_refresh_yields_to_interactive_requests(monkeypatch):
+    scheduler = UpstreamScheduler('test', rate_per_second=0.01, burst=2)
+    monkeypatch.setattr(market_app, 'yahoo_scheduler', scheduler)
+    monkeypatch.setattr(market_app, 'YAHOO_BACKGROUND_RESERVE', 2)
+    market_app.cache.clear()
+    assert market_app.analyzer.refresh_stock_data('AAPL') is None
+    assert 'error' not in market_app.analyzer.get_stock_data('AAPL')
+    market_app.cache.clear()
@@ -0,0 +1,62 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import SingleFlight
+
+CALLERS = 8
+
+def run_together(flight, fn):
+    """Call flight.do('AAPL', fn) from CALLERS threads; fn is held until all of them are waiting"""
+    release = threading.Event()
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        release.wait(5)
+        return fn()
+
+    def caller():
+        try:
+            return flight.do('AAPL', upstream)
+        except Exception as e:
+            return e
+    with ThreadPoolExecutor(CALLERS) as pool:
+        futures = [pool.submit(caller) for _ in range(CALLERS)]
+        deadline = time.monotonic() + 5
+        while flight.stats()['coalesced'] < CALLERS - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        return len(calls), [future.result() for future in futures]
+
+def test_concurrent_callers_share_one_call_and_its_result():
+    flight = SingleFlight()
+    result = {'price': 1.0}
+    calls, results = run_together(flight, lambda: result)
+    assert calls == 1
+    assert all(r is result for r in results)
+    assert flight.stats()['originating'] == 1 and flight.stats()['coalesced'] == CALLERS - 1
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+    error = ValueError('upstream down')
+
+    def fail():
+        raise error
+    calls, results = run_together(flight, fail)
+    assert calls == 1
+    assert all(r is error for r in results)
+
+def test_key_is_cleared_so_the_next_call_fetches_again():
+    flight = SingleFlight()
+    calls = []
+    assert flight.do('AAPL', lambda: calls.append(1) or 'first') == 'first'
+    assert flight.do('AAPL', lambda: calls.append(1) or 'second') == 'second'
+    assert len(calls) == 2
+
+    with pytest.raises(ValueError):
+        flight.do('AAPL', lambda: int('x'))
+    assert flight.do('AAPL', lambda: 'recovered') == 'recovered'
+    assert flight.calls == {}
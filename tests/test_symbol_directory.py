@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+import app as market_app
+from symbol_directory import SymbolDirectory
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+@pytest.fixture(scope='module')
+def bundled():
+    return SymbolDirectory.load(os.path.join(ROOT, 'symbols.csv'))
+
+def test_lookup_and_name(bundled):
+    assert 'aapl' in bundled and 'ZZZZZ' not in bundled
+    assert bundled.name('AAPL') == market_app.symbol_directory.name('AAPL')
+
+def test_search_ranks_exact_prefix_name_then_typo(bundled):
+    assert bundled.search('MSFT')[0]['symbol'] == 'MSFT'
+    assert all(entry['symbol'].startswith('MS') for entry in bundled.search('MS', limit=2))
+    assert 'Microsoft' in bundled.search('micro')[0]['name']
+    assert bundled.search('APPL')[0]['symbol'] == 'AAPL'
+    assert bundled.search('') == []
+
+def test_auto_strict_needs_a_full_listing(monkeypatch, bundled):
+    monkeypatch.setattr(market_app, 'symbol_directory', bundled)
+    assert not market_app.strict_symbol_checking('auto')
+    full = SymbolDirectory([(f'T{i:05d}', f'Company {i}', 'NYSE') for i in range(market_app.SYMBOL_DIRECTORY_FULL_LISTING)])
+    monkeypatch.setattr(market_app, 'symbol_directory', full)
+    assert market_app.strict_symbol_checking('auto')
+    assert not market_app.strict_symbol_checking('0')
+    monkeypatch.setattr(market_app, 'symbol_directory', None)
+    assert not market_app.strict_symbol_checking('auto')
+    assert market_app.strict_symbol_checking('1')
+
+def test_strict_mode_answers_unlisted_symbols_locally(monkeypatch, bundled):
+    monkeypatch.setattr(market_app, 'symbol_directory', bundled)
+    monkeypatch.setattr(market_app, 'SYMBOL_DIRECTORY_STRICT', True)
+    monkeypatch.setattr(market_app.analyzer.provider, 'get_info', lambda symbol: pytest.fail('went upstream'))
+    result = market_app.analyzer.get_stock_data('APPL')
+    assert 'AAPL' in result['suggestions'] and 'Did you mean' in result['error']
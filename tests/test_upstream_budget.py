@@ -0,0 +1,67 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app as market_app
+from app import UpstreamScheduler
+from circuit_breaker import CircuitBreaker
+
+KEY = 'stock_data_AAPL'
+
+@pytest.fixture
+def drained(monkeypatch):
+    """A Yahoo budget with no token for the next half second"""
+    scheduler = UpstreamScheduler('test', rate_per_second=2.0, burst=1)
+    assert scheduler.try_acquire()
+    monkeypatch.setattr(market_app, 'yahoo_scheduler', scheduler)
+    monkeypatch.setattr(market_app, 'yahoo_breaker', CircuitBreaker('test'))
+    market_app.cache.clear()
+    yield scheduler
+    market_app.cache.clear()
+
+def test_acquire_waits_for_the_next_token():
+    scheduler = UpstreamScheduler('test', rate_per_second=20.0, burst=1)
+    assert scheduler.try_acquire()
+    started = time.monotonic()
+    assert scheduler.acquire(1.0)
+    assert 0.03 <= time.monotonic() - started < 0.5
+    assert scheduler.stats()['waited'] == 1
+
+def test_acquire_rejects_a_wait_longer_than_its_timeout():
+    scheduler = UpstreamScheduler('test', rate_per_second=1.0, burst=1)
+    assert scheduler.try_acquire()
+    assert not scheduler.acquire(0.1)
+    assert scheduler.stats()['rejected'] == 1
+
+def test_waiters_are_admitted_at_the_bucket_rate():
+    scheduler = UpstreamScheduler('test', rate_per_second=10.0, burst=1)
+    assert scheduler.try_acquire()
+    started = time.monotonic()
+    with ThreadPoolExecutor(3) as pool:
+        admitted = sorted(pool.map(lambda _: scheduler.acquire(1.0) and time.monotonic() - started, range(3)))
+    assert all(admitted)
+    assert admitted[-1] >= 0.25
+
+def test_a_short_wait_fetches_instead_of_failing(drained):
+    result = market_app.analyzer.get_stock_data('AAPL', max_wait=1.0)
+    assert 'error' not in result and not result.get('demo_mode')
+
+def test_local_rate_limit_is_not_an_outage(drained):
+    result = market_app.analyzer.get_stock_data('AAPL', max_wait=0)
+    assert 'Please retry' in result['error'] and result['retry_after'] >= 1
+    assert not result.get('demo_mode')
+    assert market_app.cache.get_stale(KEY) == (None, None)
+
+def test_local_rate_limit_serves_a_stale_copy(drained):
+    now = time.time()
+    with market_app.cache.lock:
+        market_app.cache._store(KEY, {'symbol': 'AAPL', 'current_price': 1.0}, now - 3600, now - 3000)
+    result = market_app.analyzer._over_budget_response('AAPL', KEY)
+    assert result['stale'] and result['current_price'] == 1.0
+
+def test_open_breaker_shows_demo_data_without_caching_it(drained):
+    market_app.yahoo_breaker.trip('test')
+    result = market_app.analyzer.get_stock_data('AAPL')
+    assert result['demo_mode']
+    assert market_app.cache.get_stale(KEY) == (None, None)